@@ -0,0 +1,148 @@
+"""
+Model routing benchmark.
+
+Calls every AIService method against the fake Groq server, once with every
+method on the large model (LLM_ROUTES "*=default") and once with the routes
+under test, and reports latency and tokens per method side by side. The fake
+answers the fast model (LLM_FAST_MODEL) with its own, lower latency and
+per-token delay, so the numbers approximate Groq's large vs small models;
+methods routed to the local tier make no model call at all.
+
+Usage (from backend/):
+    python -m benchmarks.bench_model_routing --calls 10
+    python -m benchmarks.bench_model_routing --routes "parse_attendance_text=fast,analyze_syllabus=fast" --output routing.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from typing import Any, Callable, Dict, List
+
+from benchmarks.bench_routes import SYLLABUS_TEXT, git_revision, percentile
+from benchmarks.fakes import FakeGroq, Latency, SAMPLE_TRANSCRIPT
+
+MARKS_SUMMARY = ("Average Score: 61.40. Total Students: 32. Risk Students: 5. Topic averages: quadratics 48%, "
+                 "polynomials 66%, sequences 71%. Topics tested: Quadratics, Polynomials, Sequences")
+STUDENTS = [{"student_name": f"Student {i}", "score": 35 + 9 * i, "weak_topics": ["Quadratic formula", "Sequences"][:i % 3]}
+            for i in range(1, 6)]
+TOPIC_RESULTS = [
+    {"topic": "Quadratic equations", "score": 48.0, "status": "gap"},
+    {"topic": "Polynomials", "score": 66.0, "status": "on track"},
+    {"topic": "Sequences", "score": 38.0, "status": "at risk"},
+]
+ATTENDANCE_TEXT = "\n".join(f"Student {i}  2024-02-10  {'Absent' if i % 4 == 0 else 'Present'}" for i in range(1, 31))
+CLASS_SUMMARY = ("Subject: Mathematics. Attendance: 412 records, 37 absences. Average score 61.4 across 3 assessments. "
+                 "Performance summaries: moderate average with a small group at risk.")
+
+
+def cases(ai: Any) -> Dict[str, Callable[[], Any]]:
+    """AIService purpose -> a call exercising it with representative input."""
+    return {
+        "analyze_marks": lambda: ai.analyze_marks(MARKS_SUMMARY),
+        "generate_assessment": lambda: ai.generate_assessment("Mathematics", "Quadratics", "Medium", 5),
+        "generate_assessment_from_content": lambda: ai.generate_assessment_from_content(
+            SYLLABUS_TEXT, "Mathematics", "Quadratics", "Medium", 5),
+        "generate_feedback": lambda: ai.generate_feedback("Student 1", 58, ["Quadratic formula"]),
+        "generate_feedback_batch": lambda: ai.generate_feedback_batch(STUDENTS),
+        "analyze_syllabus": lambda: ai.analyze_syllabus(SYLLABUS_TEXT),
+        "analyze_attendance": lambda: ai.analyze_attendance(
+            "Total records analyzed for Mathematics: 40. Absences: 3.", 40, 3),
+        "analyze_lecture": lambda: ai.analyze_lecture(SAMPLE_TRANSCRIPT),
+        "detect_learning_gaps": lambda: ai.detect_learning_gaps(
+            MARKS_SUMMARY, [t["topic"] for t in TOPIC_RESULTS], TOPIC_RESULTS),
+        "parse_attendance_text": lambda: ai.parse_attendance_text(ATTENDANCE_TEXT),
+        "analyze_engagement": lambda: ai.analyze_engagement(CLASS_SUMMARY),
+    }
+
+
+async def run_config(ai: Any, calls: int) -> Dict[str, Dict[str, Any]]:
+    results = {}
+    for purpose, call in cases(ai).items():
+        await call()  # warm-up: connection setup, first prompt build
+        before = ai.router.stats().get(purpose, {})
+        latencies: List[float] = []
+        for _ in range(calls):
+            start = time.perf_counter()
+            await call()
+            latencies.append((time.perf_counter() - start) * 1000)
+        latencies.sort()
+        after = ai.router.stats().get(purpose, {})
+
+        def delta(key: str) -> float:
+            return sum(t.get(key, 0) for t in after.values()) - sum(t.get(key, 0) for t in before.values())
+
+        results[purpose] = {
+            "tier": ai.router.route(purpose),
+            "latency_ms": {"p50": round(percentile(latencies, 50), 2), "mean": round(sum(latencies) / len(latencies), 2),
+                           "max": round(latencies[-1], 2)},
+            "model_requests_per_call": round(delta("requests") / calls, 2),
+            "prompt_tokens_per_call": round(delta("prompt_tokens") / calls, 1),
+            "completion_tokens_per_call": round(delta("completion_tokens") / calls, 1),
+        }
+    return results
+
+
+async def run(args) -> Dict[str, Any]:
+    from services.ai_service import AIService
+    from services.routing_service import ModelRouter, LLM_ROUTES
+
+    ai = AIService()
+    tiers = ai.router.tiers
+    routes = args.routes if args.routes is not None else LLM_ROUTES
+    report = {}
+    for name, spec in (("baseline", "*=default"), ("routed", routes)):
+        ai.router = ModelRouter(tiers, spec)
+        report[name] = await run_config(ai, args.calls)
+
+    print(f"{'method':<34}{'tier':>8}{'p50 before':>12}{'p50 after':>11}{'tokens before':>15}{'tokens after':>14}",
+          file=sys.stderr)
+    for purpose, routed in report["routed"].items():
+        base = report["baseline"][purpose]
+        tokens = lambda r: r["prompt_tokens_per_call"] + r["completion_tokens_per_call"]
+        print(f"{purpose:<34}{routed['tier']:>8}{base['latency_ms']['p50']:>10.1f}ms{routed['latency_ms']['p50']:>9.1f}ms"
+              f"{tokens(base):>15.0f}{tokens(routed):>14.0f}", file=sys.stderr)
+    return {"routes": routes, **report}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare AIService latency and tokens per method with and without routing")
+    parser.add_argument("--calls", type=int, default=10, help="measured calls per method and configuration")
+    parser.add_argument("--routes", help="LLM_ROUTES spec to compare against the baseline (default: the configured one)")
+    parser.add_argument("--latency", type=float, default=300.0, help="large model time to first token, ms")
+    parser.add_argument("--token-ms", type=float, default=3.6, help="large model per-token delay, ms")
+    parser.add_argument("--fast-latency", type=float, default=150.0, help="fast model time to first token, ms")
+    parser.add_argument("--fast-token-ms", type=float, default=1.3, help="fast model per-token delay, ms")
+    parser.add_argument("--output", help="write JSON here instead of stdout")
+    args = parser.parse_args()
+
+    os.environ["GROQ_API_KEY"] = "bench"
+    from services.routing_service import LLM_FAST_MODEL
+    groq = FakeGroq(Latency(args.latency), token_ms=args.token_ms,
+                    model_latency={LLM_FAST_MODEL: Latency(args.fast_latency)},
+                    model_token_ms={LLM_FAST_MODEL: args.fast_token_ms}).start()
+    os.environ["GROQ_BASE_URL"] = groq.url
+    try:
+        report = asyncio.run(run(args))
+    finally:
+        groq.stop()
+
+    report["meta"] = {
+        "git_revision": git_revision(),
+        "calls_per_method": args.calls,
+        "large_model": {"latency_ms": args.latency, "token_ms": args.token_ms},
+        "fast_model": {"model": LLM_FAST_MODEL, "latency_ms": args.fast_latency, "token_ms": args.fast_token_ms},
+        "model_requests": groq.model_requests,
+    }
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+        print(f"Wrote {args.output}", file=sys.stderr)
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""
+Login throughput benchmark for the password hashing pool.
+
+Simulates N concurrent logins against a pre-hashed password and reports
+verifications per second for a given cost factor and pool size.
+
+Usage (from backend/):
+    python -m benchmarks.bench_password_hashing --rounds 12 --workers 4 --logins 200
+"""
+import argparse
+import asyncio
+import hashlib
+import time
+
+from services.password_service import PasswordService
+
+
+async def run_logins(service: PasswordService, stored_hash: str, logins: int, concurrency: int) -> float:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one_login():
+        async with semaphore:
+            valid, _ = await service.verify_and_update_async("correct horse battery staple", stored_hash)
+            assert valid
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one_login() for _ in range(logins)))
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark login throughput at a given KDF cost")
+    parser.add_argument("--scheme", default="bcrypt", choices=["bcrypt", "argon2"])
+    parser.add_argument("--rounds", type=int, default=12, help="bcrypt cost factor (log2 iterations)")
+    parser.add_argument("--workers", type=int, default=4, help="password hashing thread pool size")
+    parser.add_argument("--logins", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=50, help="simultaneous in-flight logins")
+    args = parser.parse_args()
+
+    service = PasswordService(scheme=args.scheme, bcrypt_rounds=args.rounds, max_workers=args.workers)
+    password = "correct horse battery staple"
+
+    start = time.perf_counter()
+    stored_hash = service.hash(password)
+    single_hash_ms = (time.perf_counter() - start) * 1000
+
+    elapsed = asyncio.run(run_logins(service, stored_hash, args.logins, args.concurrency))
+
+    # Legacy path for comparison: one rehash per migrated account
+    legacy_hash = hashlib.sha256(password.encode()).hexdigest()
+    start = time.perf_counter()
+    valid, new_hash = service.verify_and_update(password, legacy_hash)
+    migrate_ms = (time.perf_counter() - start) * 1000
+    assert valid and new_hash
+
+    print(f"scheme={args.scheme} rounds={args.rounds} workers={args.workers}")
+    print(f"single hash:          {single_hash_ms:8.1f} ms")
+    print(f"legacy migrate login: {migrate_ms:8.1f} ms")
+    print(f"{args.logins} logins:          {elapsed:8.2f} s  ({args.logins / elapsed:.1f} logins/s)")
+    service.shutdown()
+
+
+if __name__ == "__main__":
+    main()
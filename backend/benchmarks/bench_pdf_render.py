@@ -0,0 +1,74 @@
+"""
+Lecture notes PDF rendering benchmark.
+
+Renders a realistic notes document repeatedly in memory and reports
+documents per second and average output size, for the ASCII-only core
+font path and the embedded (subsetted, cached) Unicode font path.
+
+Usage (from backend/):
+    python -m benchmarks.bench_pdf_render --documents 1000 --mode both
+"""
+import argparse
+import time
+
+from services.pdf_service import PDFService
+
+SAMPLE_NOTES = {
+    "title": "Quadratic Equations and the Discriminant",
+    "summary": (
+        "The lecture introduced quadratic equations in standard form, derived the quadratic "
+        "formula by completing the square, and used the discriminant to classify roots. "
+        "Worked examples covered projectile motion and area problems. "
+    ) * 4,
+    "topics": ["Standard form", "Completing the square", "Quadratic formula", "Discriminant", "Applications"],
+    "concepts": [
+        "A quadratic has at most two real roots",
+        "The discriminant b² - 4ac determines the nature of the roots",
+        "Vertex form reveals the turning point of the parabola",
+    ],
+    "formulas": ["x = (-b ± √(b² - 4ac)) / 2a", "D = b² - 4ac", "y = a(x - h)² + k"],
+    "definitions": {
+        "Discriminant": "The expression b² - 4ac under the square root in the quadratic formula.",
+        "Vertex": "The highest or lowest point of a parabola.",
+        "Root": "A value of x that makes the quadratic equal to zero.",
+    },
+    "examples": [
+        "A ball thrown upward follows h = -5t² + 20t + 1",
+        "Fencing a rectangular garden with a fixed perimeter to maximise area",
+    ],
+}
+
+
+def bench(label: str, service: PDFService, documents: int):
+    # Warm up font parsing and code paths; the first Unicode render pays the one-off font load
+    start = time.perf_counter()
+    service.render_lecture_notes(SAMPLE_NOTES)
+    first_ms = (time.perf_counter() - start) * 1000
+
+    total_bytes = 0
+    start = time.perf_counter()
+    for _ in range(documents):
+        total_bytes += len(service.render_lecture_notes(SAMPLE_NOTES))
+    elapsed = time.perf_counter() - start
+
+    print(f"[{label}] {documents} documents in {elapsed:.2f} s")
+    print(f"  first render: {first_ms:.1f} ms")
+    print(f"  throughput:   {documents / elapsed:.1f} docs/s")
+    print(f"  avg latency:  {elapsed / documents * 1000:.2f} ms/doc")
+    print(f"  avg size:     {total_bytes / documents / 1024:.1f} KiB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark lecture notes PDF rendering")
+    parser.add_argument("--documents", type=int, default=1000)
+    parser.add_argument("--mode", choices=["ascii", "unicode", "both"], default="both")
+    args = parser.parse_args()
+
+    if args.mode in ("ascii", "both"):
+        bench("ascii", PDFService(unicode_fonts=False), args.documents)
+    if args.mode in ("unicode", "both"):
+        bench("unicode", PDFService(unicode_fonts=True), args.documents)
+
+
+if __name__ == "__main__":
+    main()
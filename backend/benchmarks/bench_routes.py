@@ -0,0 +1,423 @@
+"""
+Offline benchmark of every API route.
+
+Groq, Supabase (PostgREST), SMTP and Whisper are replaced by the local fakes
+in benchmarks/fakes.py, with optional latency injection. The app is driven
+in-process over ASGI, so results measure our own code plus the simulated
+upstream delays. The output is JSON for regression tracking:
+
+    {"meta": {...}, "routes": {"POST /analytics/analyze-marks": {"throughput_rps": ..,
+        "latency_ms": {"p50": .., "p95": .., "p99": .., "mean": .., "max": ..}, ...}}}
+
+Usage (from backend/):
+    python -m benchmarks.bench_routes --requests 50 --concurrency 8 --output bench.json
+    python -m benchmarks.bench_routes --groq-latency 800 --supabase-latency 40 --only analytics
+"""
+import argparse
+import asyncio
+import datetime
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from benchmarks.fakes import FakeGroq, FakePostgrest, FakeSMTP, FakeWhisper, Latency, SAMPLE_LECTURE_NOTES
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+TEACHER_ID = "00000000-0000-4000-8000-000000000001"
+TEACHER_EMAIL = "bench.teacher@example.com"
+STUDENT_EMAIL = "bench.student@example.com"
+PASSWORD = "correct horse battery staple"
+MATERIAL_ID = "00000000-0000-4000-8000-0000000000aa"
+STUDENT_ID = "00000000-0000-4000-8000-0000000000bb"
+
+SYLLABUS_TEXT = (
+    "Unit 1: Quadratic equations. Standard form, factoring, completing the square, the quadratic formula and the "
+    "discriminant. Unit 2: Polynomials. Remainder and factor theorems. Unit 3: Sequences and series. Arithmetic and "
+    "geometric progressions, sums of finite series. Unit 4: Linear inequalities and their graphical solution. "
+) * 6
+
+
+def configure_environment(groq: FakeGroq, postgrest: FakePostgrest, smtp: FakeSMTP, whisper: FakeWhisper, scratch_dir: str):
+    """Point every service at the fakes. Must run before `main` is imported."""
+    os.environ.update({
+        "GROQ_API_KEY": "bench",
+        "GROQ_BASE_URL": groq.url,
+        "SUPABASE_URL": postgrest.url,
+        "SUPABASE_SERVICE_ROLE_KEY": "bench",
+        "SMTP_SERVER": smtp.host,
+        "SMTP_PORT": str(smtp.port),
+        "EMAIL_SENDER": "alerts@example.com",
+        "EMAIL_PASSWORD": "bench",
+        "WHISPER_ENDPOINT": f"{whisper.url}/transcribe",
+        "SCRATCH_DIR": scratch_dir,
+        # The benchmark hammers a handful of accounts from one IP
+        "LOGIN_IP_BURST": str(10 ** 9),
+        "LOGIN_ACCOUNT_BURST": str(10 ** 9),
+    })
+    os.environ.pop("RATE_LIMIT_REDIS_URL", None)
+
+
+def seed_tables(password_hash: str, low_attendance_students: int) -> Dict[str, List[Dict[str, Any]]]:
+    now = datetime.datetime.utcnow()
+
+    def ts(days: int) -> str:
+        return (now - datetime.timedelta(days=days)).isoformat()
+
+    students = [{"id": str(uuid.uuid4()), "name": f"Student {i}", "email": f"student{i}@example.com",
+                 "password_hash": password_hash, "created_at": ts(30)} for i in range(1, 41)]
+    students.append({"id": STUDENT_ID, "name": "Bench Student", "email": STUDENT_EMAIL,
+                     "password_hash": password_hash, "created_at": ts(30)})
+
+    attendance = []
+    for i in range(1, 41):
+        # The first few students miss most classes so the alert route has emails to send
+        absent_every = 2 if i <= low_attendance_students else 10
+        for day in range(20):
+            attendance.append({"id": str(uuid.uuid4()), "student_name": f"Student {i}", "subject": "Mathematics",
+                               "attendance_date": (now - datetime.timedelta(days=day)).date().isoformat(),
+                               "status": "Absent" if day % absent_every == 0 else "Present",
+                               "teacher_id": TEACHER_ID, "created_at": ts(day)})
+
+    assessment = {"assessment_title": "Mathematics - Quadratics Assessment", "questions": [
+        {"question_number": i, "question_text": f"Question {i}", "question_type": "Short Answer",
+         "bloom_level": "Apply", "marks": 5} for i in range(1, 11)]}
+
+    return {
+        "teachers": [{"id": TEACHER_ID, "name": "Bench Teacher", "email": TEACHER_EMAIL, "subject": "Mathematics",
+                      "password_hash": password_hash, "created_at": ts(60)}],
+        "students": students,
+        "attendance": attendance,
+        "marks_analysis": [{"id": str(uuid.uuid4()), "average_score": 61.5 + i, "risk_students_count": 4,
+                            "performance_summary": "Average Score: 61.50. Total Students: 40. Risk Students: 4.",
+                            "subject": "Mathematics", "topic_scores": {"Quadratics": 72.0, "Sequences": 38.5},
+                            "teacher_id": TEACHER_ID, "created_at": ts(i)} for i in range(5)],
+        "syllabus_analysis": [{"id": str(uuid.uuid4()), "major_topics": ["Quadratic equations", "Sequences"],
+                               "assessment_focus": ["Problem solving"], "subject": "Mathematics", "teacher_id": TEACHER_ID, "created_at": ts(1)}],
+        "study_materials": [{"id": MATERIAL_ID, "subject": "Mathematics", "unit": "Quadratics", "title": "Syllabus",
+                             "content_text": SYLLABUS_TEXT, "file_name": "syllabus.pdf",
+                             "word_count": len(SYLLABUS_TEXT.split()), "teacher_id": TEACHER_ID, "created_at": ts(2)}],
+        "feedback": [{"id": str(uuid.uuid4()), "student_name": "Bench Student", "student_id": STUDENT_ID, "score": 72,
+                      "feedback_data": {"strengths": "Algebra", "weak_areas": "Sequences",
+                                        "improvement_plan": "Practice", "motivational_message": "Keep going"},
+                      "teacher_id": TEACHER_ID, "created_at": ts(1)}],
+        "lecture_notes": [dict(SAMPLE_LECTURE_NOTES, id=str(uuid.uuid4()), teacher_id=TEACHER_ID, created_at=ts(i))
+                          for i in range(10)],
+        "assessments": [{"id": str(uuid.uuid4()), "subject": "Mathematics", "unit": "Quadratics", "data": assessment,
+                         "teacher_id": TEACHER_ID, "created_at": ts(i)} for i in range(10)],
+    }
+
+
+def build_fixtures() -> Dict[str, bytes]:
+    from fpdf import FPDF
+
+    def text_pdf(text: str) -> bytes:
+        pdf = FPDF()
+        pdf.add_page()
+        pdf.set_font("Helvetica", size=11)
+        pdf.multi_cell(0, 6, text)
+        return bytes(pdf.output())
+
+    def register_pdf(students: int, days: List[str]) -> bytes:
+        # Ruled register table spanning several pages; fpdf2 repeats the heading row on each page
+        pdf = FPDF()
+        pdf.add_page()
+        pdf.set_font("Helvetica", size=9)
+        pdf.cell(0, 8, "Attendance register - Mathematics", new_x="LMARGIN", new_y="NEXT")
+        with pdf.table() as table:
+            table.row(["Student Name"] + days)
+            for i in range(1, students + 1):
+                table.row([f"Student {i}"] + ["A" if (i + d) % 7 == 0 else "P" for d in range(len(days))])
+        return bytes(pdf.output())
+
+    marks_csv = "student_name,score\n" + "\n".join(f"Student {i},{(i * 37) % 100}" for i in range(1, 61))
+    attendance_text = "\n".join(f"Student {i}  2024-02-10  {'Absent' if i % 4 == 0 else 'Present'}" for i in range(1, 31))
+    with open(os.path.join(BACKEND_DIR, "attendance_sample.csv"), "rb") as f:
+        attendance_csv = f.read()
+    return {
+        "marks_csv": marks_csv.encode(),
+        "attendance_csv": attendance_csv,
+        "syllabus_pdf": text_pdf(SYLLABUS_TEXT),
+        "attendance_pdf": text_pdf("Attendance register - Mathematics\n" + attendance_text),
+        "attendance_register_pdf": register_pdf(120, [f"{day:02d}/02/2024" for day in range(5, 10)]),
+        # Whisper is faked, so any bytes will do; size matches a short voice memo
+        "lecture_audio": os.urandom(512 * 1024),
+    }
+
+
+def build_scenarios(fixtures: Dict[str, bytes]) -> List[Dict[str, Any]]:
+    """One entry per route: (method, path, request kwargs factory, auth role)."""
+
+    def upload(name: str, fixture: str, content_type: str, **params) -> Callable[[int], Dict[str, Any]]:
+        return lambda i: {"files": {"file": (name, fixtures[fixture], content_type)}, "params": params}
+
+    def unique_user(prefix: str, teacher: bool) -> Callable[[int], Dict[str, Any]]:
+        def build(i: int) -> Dict[str, Any]:
+            body = {"name": f"{prefix} {i}", "email": f"{prefix}-{uuid.uuid4().hex}@example.com", "password": PASSWORD}
+            if teacher:
+                body["subject"] = "Mathematics"
+            return {"json": body}
+        return build
+
+    return [
+        {"method": "POST", "path": "/analytics/analyze-marks", "role": "teacher",
+         "build": upload("marks.csv", "marks_csv", "text/csv", topics_covered="Quadratics")},
+        {"method": "POST", "path": "/analytics/upload-text-material", "role": "teacher",
+         "build": lambda i: {"json": {"subject": "Mathematics", "unit": "Quadratics"}, "params": {"content": SYLLABUS_TEXT}}},
+        {"method": "POST", "path": "/analytics/analyze-syllabus", "role": "teacher",
+         "build": upload("syllabus.pdf", "syllabus_pdf", "application/pdf", subject="Mathematics", unit="Quadratics")},
+        {"method": "POST", "path": "/analytics/analyze-attendance", "label": "csv", "role": "teacher",
+         "build": upload("attendance.csv", "attendance_csv", "text/csv", subject="Mathematics")},
+        {"method": "POST", "path": "/analytics/analyze-attendance", "label": "pdf", "role": "teacher",
+         "build": upload("attendance.pdf", "attendance_pdf", "application/pdf", subject="Mathematics")},
+        {"method": "POST", "path": "/analytics/analyze-attendance", "label": "pdf-register", "role": "teacher",
+         "build": upload("register.pdf", "attendance_register_pdf", "application/pdf", subject="Mathematics")},
+        {"method": "POST", "path": "/analytics/lecture-to-pdf", "role": "teacher",
+         "build": upload("lecture.mp3", "lecture_audio", "audio/mpeg")},
+        {"method": "GET", "path": "/analytics/export-pdfs", "role": "teacher", "build": lambda i: {}},
+        {"method": "GET", "path": "/analytics/engagement", "role": "teacher", "build": lambda i: {}},
+        {"method": "POST", "path": "/academic/generate-assessment-from-pdf", "role": "teacher",
+         "build": lambda i: {"json": {"material_id": MATERIAL_ID, "num_questions": 10}}},
+        {"method": "POST", "path": "/academic/generate-assessment", "role": "teacher",
+         "build": lambda i: {"json": {"subject": "Mathematics", "unit": "Quadratics", "num_questions": 10, "reuse_questions": False}}},
+        {"method": "POST", "path": "/academic/generate-assessment", "label": "50 questions", "role": "teacher",
+         "build": lambda i: {"json": {"subject": "Mathematics", "unit": "Quadratics", "num_questions": 50, "reuse_questions": False}}},
+        {"method": "POST", "path": "/academic/generate-assessment", "label": "question bank", "role": "teacher",
+         "build": lambda i: {"json": {"subject": "Mathematics", "unit": "Quadratics", "num_questions": 10}}},
+        {"method": "POST", "path": "/academic/generate-assessment-from-pdf/stream", "role": "teacher", "first_event": "question",
+         "build": lambda i: {"json": {"material_id": MATERIAL_ID, "num_questions": 10}}},
+        {"method": "POST", "path": "/academic/generate-assessment/stream", "role": "teacher", "first_event": "question",
+         "build": lambda i: {"json": {"subject": "Mathematics", "unit": "Quadratics", "num_questions": 10, "reuse_questions": False}}},
+        {"method": "POST", "path": "/academic/generate-feedback", "role": "teacher",
+         "build": lambda i: {"json": {"student_name": f"Student {i % 40 + 1}", "score": 55, "weak_topics": ["Sequences"]}}},
+        {"method": "POST", "path": "/academic/generate-feedback/bulk", "role": "teacher", "first_event": "student",
+         "build": lambda i: {"json": {"students": [{"student_name": f"Student {n}", "score": (n * 37) % 100,
+                                                    "weak_topics": ["Sequences"] if n % 3 else []} for n in range(1, 61)]}}},
+        {"method": "POST", "path": "/academic/generate-feedback/bulk-csv", "role": "teacher",
+         "build": upload("marks.csv", "marks_csv", "text/csv")},
+        {"method": "POST", "path": "/academic/detect-learning-gaps", "role": "teacher",
+         "build": lambda i: {"json": {"subject": "Mathematics"}}},
+        {"method": "GET", "path": "/academic/my-feedback", "role": "student", "build": lambda i: {}},
+        {"method": "GET", "path": "/history/assessments", "role": "teacher", "build": lambda i: {"params": {"limit": 5}}},
+        {"method": "POST", "path": "/auth/register", "role": None, "build": unique_user("teacher", teacher=True)},
+        {"method": "POST", "path": "/auth/login", "role": None,
+         "build": lambda i: {"data": {"username": TEACHER_EMAIL, "password": PASSWORD}}},
+        {"method": "POST", "path": "/auth/student-register", "role": None, "build": unique_user("student", teacher=False)},
+        {"method": "POST", "path": "/auth/student-login", "role": None,
+         "build": lambda i: {"json": {"email": STUDENT_EMAIL, "password": PASSWORD}}},
+        {"method": "POST", "path": "/notifications/send-attendance-alerts", "role": "teacher",
+         "build": lambda i: {"json": {"threshold": 75}}},
+    ]
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """Nearest-rank percentile; works for any sample size."""
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, int(round(pct / 100 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[rank]
+
+
+async def asgi_stream(app, method: str, path: str, headers: Dict[str, str], body: bytes, event: str) -> Tuple[int, Optional[float]]:
+    """
+    Drive the ASGI app directly (httpx's ASGITransport buffers whole responses) and return
+    (status, ms until the first SSE event of the given name was sent).
+    """
+    start = time.perf_counter()
+    marker = f"event: {event}\n".encode()
+    result = {"status": 0, "first_ms": None}
+    delivered = False
+
+    async def receive():
+        nonlocal delivered
+        if not delivered:
+            delivered = True
+            return {"type": "http.request", "body": body, "more_body": False}
+        await asyncio.sleep(3600)  # the client never disconnects early
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            result["status"] = message["status"]
+        elif message["type"] == "http.response.body" and result["first_ms"] is None and marker in message.get("body", b""):
+            result["first_ms"] = (time.perf_counter() - start) * 1000
+
+    raw_headers = [(k.lower().encode(), v.encode()) for k, v in headers.items()]
+    raw_headers += [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())]
+    scope = {"type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": method, "scheme": "http",
+             "path": path, "raw_path": path.encode(), "root_path": "", "query_string": b"", "headers": raw_headers,
+             "client": ("127.0.0.1", 50000), "server": ("bench", 80)}
+    await app(scope, receive, send)
+    return result["status"], result["first_ms"]
+
+
+async def run_scenario(client, scenario: Dict[str, Any], headers: Dict[str, str], requests: int, concurrency: int,
+                       app=None) -> Dict[str, Any]:
+    method, path, build = scenario["method"], scenario["path"], scenario["build"]
+    latencies: List[float] = []
+    first_events: List[float] = []
+    status_codes: Dict[str, int] = {}
+    counter = iter(range(requests))
+
+    async def send(i: int) -> int:
+        if scenario.get("first_event"):
+            body = json.dumps(build(i)["json"]).encode()
+            status, first_ms = await asgi_stream(app, method, path, headers, body, scenario["first_event"])
+            if first_ms is not None and i >= 0:
+                first_events.append(first_ms)
+            return status
+        response = await client.request(method, path, headers=headers, **build(i))
+        await response.aread()
+        return response.status_code
+
+    # Warm-up: first use constructs the services and fills caches
+    await send(-1)
+
+    async def worker():
+        for i in counter:
+            start = time.perf_counter()
+            try:
+                status = str(await send(i))
+            except Exception as e:
+                status = type(e).__name__
+            latencies.append((time.perf_counter() - start) * 1000)
+            status_codes[status] = status_codes.get(status, 0) + 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    first_events.sort()
+    extra = {}
+    if first_events:
+        extra["first_event_ms"] = {"p50": round(percentile(first_events, 50), 2), "p95": round(percentile(first_events, 95), 2),
+                                   "p99": round(percentile(first_events, 99), 2)}
+    return {
+        "requests": requests,
+        "concurrency": concurrency,
+        "duration_s": round(elapsed, 3),
+        "throughput_rps": round(requests / elapsed, 2),
+        "latency_ms": {
+            "p50": round(percentile(latencies, 50), 2),
+            "p95": round(percentile(latencies, 95), 2),
+            "p99": round(percentile(latencies, 99), 2),
+            "mean": round(sum(latencies) / len(latencies), 2),
+            "max": round(latencies[-1], 2),
+        },
+        "status_codes": status_codes,
+        "errors": sum(n for code, n in status_codes.items() if not code.startswith("2")),
+        **extra,
+    }
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+async def run(args, fakes: Dict[str, Any]) -> Dict[str, Any]:
+    import httpx
+    import main
+    from services.auth_service import auth_service
+    from services.export_service import export_service
+
+    tokens = {
+        "teacher": auth_service.create_access_token({"sub": TEACHER_ID, "email": TEACHER_EMAIL, "role": "teacher"}),
+        "student": auth_service.create_access_token({"sub": STUDENT_ID, "email": STUDENT_EMAIL, "role": "student"}),
+    }
+    scenarios = build_scenarios(build_fixtures())
+    if args.only:
+        scenarios = [s for s in scenarios if any(f in s["path"] for f in args.only.split(","))]
+
+    results = {}
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=600) as client:
+        for scenario in scenarios:
+            name = f"{scenario['method']} {scenario['path']}" + (f" [{scenario['label']}]" if scenario.get("label") else "")
+            headers = {"Authorization": f"Bearer {tokens[scenario['role']]}"} if scenario["role"] else {}
+            results[name] = await run_scenario(client, scenario, headers, args.requests, args.concurrency, app=main.app)
+            first = results[name].get("first_event_ms")
+            print(f"{name:<55} p50 {results[name]['latency_ms']['p50']:>9.1f} ms  "
+                  f"p99 {results[name]['latency_ms']['p99']:>9.1f} ms  {results[name]['throughput_rps']:>8.1f} req/s  "
+                  f"errors {results[name]['errors']}" + (f"  first {scenario['first_event']} p50 {first['p50']:.1f} ms" if first else ""),
+                  file=sys.stderr)
+    export_service.shutdown()
+
+    return {
+        "meta": {
+            "timestamp": datetime.datetime.utcnow().isoformat() + "Z",
+            "git_revision": git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "requests_per_route": args.requests,
+            "concurrency": args.concurrency,
+            "latency": {name: fake.latency.describe() for name, fake in fakes.items()},
+            "groq_token_ms": args.groq_token_ms,
+            "groq_defect_rate": args.groq_defect_rate,
+            "upstream_calls": {name: getattr(fake, "requests", getattr(fake, "delivered", 0)) for name, fake in fakes.items()},
+            "groq_model_calls": fakes["groq"].model_requests,
+        },
+        "routes": results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark every API route against local fakes")
+    parser.add_argument("--requests", type=int, default=30, help="measured requests per route")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--only", help="comma-separated path substrings to select routes, e.g. analytics,/auth/login")
+    parser.add_argument("--output", help="write JSON here instead of stdout")
+    parser.add_argument("--jitter", type=float, default=0.0, help="uniform jitter added to every fake, in ms")
+    for name, default in (("groq", 0.0), ("supabase", 0.0), ("smtp", 0.0), ("whisper", 0.0)):
+        parser.add_argument(f"--{name}-latency", type=float, default=default, help=f"base {name} latency in ms")
+    parser.add_argument("--groq-token-ms", type=float, default=0.0, help="per-token generation delay for streamed Groq replies")
+    parser.add_argument("--groq-defect-rate", type=float, default=0.0,
+                        help="fraction of Groq replies sent as malformed JSON (fences, prose, trailing comma)")
+    args = parser.parse_args()
+
+    # Same settings the app would see (e.g. BCRYPT_ROUNDS); the fakes' endpoints override the rest
+    from dotenv import load_dotenv
+    load_dotenv()
+
+    fakes = {
+        "groq": FakeGroq(Latency(args.groq_latency, args.jitter), token_ms=args.groq_token_ms,
+                         defect_rate=args.groq_defect_rate).start(),
+        "supabase": FakePostgrest(Latency(args.supabase_latency, args.jitter)).start(),
+        "smtp": FakeSMTP(Latency(args.smtp_latency, args.jitter)).start(),
+        "whisper": FakeWhisper(Latency(args.whisper_latency, args.jitter)).start(),
+    }
+    scratch = tempfile.TemporaryDirectory(prefix="mentorai-bench-")
+    configure_environment(fakes["groq"], fakes["supabase"], fakes["smtp"], fakes["whisper"], scratch.name)
+
+    # Hash with the configured KDF so login numbers reflect production cost
+    from services.password_service import password_service
+    fakes["supabase"].tables.update(seed_tables(password_service.hash(PASSWORD), low_attendance_students=5))
+
+    try:
+        report = asyncio.run(run(args, fakes))
+    finally:
+        for fake in fakes.values():
+            fake.stop()
+        scratch.cleanup()
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+        print(f"Wrote {args.output}", file=sys.stderr)
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
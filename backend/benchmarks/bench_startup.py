@@ -0,0 +1,67 @@
+"""
+Cold start benchmark for the API process.
+
+Imports `main` in fresh interpreters, reports wall time to import, and lists
+the most expensive modules from `python -X importtime`. Optionally also times
+constructing every service through the container.
+
+Usage (from backend/):
+    python -m benchmarks.bench_startup --runs 5 --warm
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def cold_import_seconds(warm: bool) -> float:
+    code = "import main"
+    if warm:
+        code += "; main.container.warm()"
+    start = time.perf_counter()
+    subprocess.run([sys.executable, "-c", code], cwd=BACKEND_DIR, check=True, capture_output=True)
+    return time.perf_counter() - start
+
+
+def top_imports(limit: int):
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        cwd=BACKEND_DIR, check=True, capture_output=True, text=True,
+    )
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, module = line.split("|")
+        if not cumulative.strip().isdigit():
+            continue  # header row
+        # importtime nests children by two spaces; keep top-level imports and their direct children
+        depth = (len(module) - len(module.lstrip()) - 1) // 2
+        if depth <= 1:
+            rows.append((int(cumulative), module.strip()))
+    return sorted(rows, reverse=True)[:limit]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark API cold start")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--warm", action="store_true", help="also construct every service after import")
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+
+    timings = [cold_import_seconds(args.warm) for _ in range(args.runs)]
+    label = "import main + warm services" if args.warm else "import main"
+    print(f"{label}: median {statistics.median(timings) * 1000:.0f} ms over {args.runs} runs "
+          f"(min {min(timings) * 1000:.0f}, max {max(timings) * 1000:.0f})")
+
+    print("\nmost expensive imports (cumulative):")
+    for micros, module in top_imports(args.top):
+        print(f"  {micros / 1000:8.1f} ms  {module}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,630 @@
+"""
+Local stand-ins for the external services the API talks to, so the route
+benchmarks run with no network access.
+
+    FakeGroq      POST /openai/v1/chat/completions (canned JSON per AIService prompt, plain or streamed)
+    FakePostgrest /rest/v1/<table> GET/POST/PATCH/DELETE over in-memory tables
+    FakeWhisper   POST /transcribe
+    FakeSMTP      EHLO/STARTTLS/AUTH/MAIL/RCPT/DATA with a throwaway self-signed cert
+
+Every fake takes a Latency so slow upstreams can be simulated.
+
+FakeGroq also runs on its own as an OpenAI-compatible stand-in LLM server (it
+answers /v1/chat/completions as well as Groq's /openai/v1 path), e.g. for the
+fast tier of the model router:
+
+    python -m benchmarks.fakes --port 8800 --latency 600 --model-latency llama-3.1-8b-instant=150
+    LLM_FAST_BASE_URL=http://127.0.0.1:8800 GROQ_BASE_URL=http://127.0.0.1:8800 uvicorn main:app
+"""
+import argparse
+import datetime
+import json
+import random
+import re
+import socketserver
+import ssl
+import tempfile
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+from urllib.parse import parse_qsl, urlparse
+
+
+class Latency:
+    """Fixed delay plus uniform jitter, in milliseconds."""
+
+    def __init__(self, base_ms: float = 0, jitter_ms: float = 0):
+        self.base_ms = base_ms
+        self.jitter_ms = jitter_ms
+
+    def sleep(self):
+        delay = self.base_ms + random.uniform(0, self.jitter_ms)
+        if delay > 0:
+            time.sleep(delay / 1000)
+
+    def describe(self) -> Dict[str, float]:
+        return {"base_ms": self.base_ms, "jitter_ms": self.jitter_ms}
+
+
+class _FakeHTTPServer:
+    """Runs a BaseHTTPRequestHandler subclass on 127.0.0.1 in a daemon thread."""
+
+    handler_class = BaseHTTPRequestHandler
+
+    def __init__(self, latency: Optional[Latency] = None, port: int = 0):
+        self.latency = latency or Latency()
+        self.requests = 0
+        handler = type(self.handler_class.__name__, (self.handler_class,), {"fake": self})
+        self._server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+class _JSONHandler(BaseHTTPRequestHandler):
+    fake: Any = None
+
+    def log_message(self, format, *args):
+        pass  # Keep benchmark output clean
+
+    def read_body(self) -> bytes:
+        length = int(self.headers.get("Content-Length") or 0)
+        return self.rfile.read(length) if length else b""
+
+    def send_json(self, status: int, payload: Any, headers: Optional[Dict[str, str]] = None):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def begin(self):
+        self.fake.requests += 1
+        self.fake.latency.sleep()
+
+
+# --- Groq -------------------------------------------------------------------
+
+SAMPLE_LECTURE_NOTES = {
+    "title": "Introduction to Quadratic Equations",
+    "summary": "The lecture covered the standard form of quadratic equations, factoring, completing the square and the quadratic formula.",
+    "topics": ["Standard form", "Factoring", "Completing the square", "Quadratic formula", "Discriminant"],
+    "concepts": ["Roots of a polynomial", "Vertex form", "Symmetry of parabolas"],
+    "formulas": ["x = (-b ± √(b² - 4ac)) / 2a", "D = b² - 4ac"],
+    "definitions": {"Quadratic": "A polynomial of degree two.", "Discriminant": "b² - 4ac, which determines the nature of the roots."},
+    "examples": ["Projectile motion of a ball", "Maximising the area of a fenced field"],
+}
+
+
+_QUESTION_STEMS = [
+    "Explain how {} is used", "Give an example of {}", "What is the role of {}", "Describe a common mistake with {}",
+    "Compare {} with a linear approach", "Derive the key result about {}", "Why does {} matter in practice",
+    "Solve a word problem involving {}", "Evaluate a student's claim about {}", "Design an exercise on {}",
+    "Summarise what {} tells us", "Identify the assumptions behind {}",
+]
+_QUESTION_CONCEPTS = [
+    "the discriminant", "completing the square", "the quadratic formula", "vertex form", "factoring by grouping",
+    "the axis of symmetry", "complex roots", "the sum of roots", "the product of roots", "parabola intercepts",
+    "maximum area problems", "projectile height", "nature of roots", "perfect square trinomials", "difference of squares",
+    "graph transformations", "the leading coefficient", "quadratic inequalities", "simultaneous equations",
+    "rational roots", "arithmetic sequences", "geometric sequences", "polynomial division", "the remainder theorem",
+    "the factor theorem", "domain and range", "function composition", "inverse functions", "rate of change", "turning points",
+]
+
+
+def _assessment(num_questions: int) -> Dict[str, Any]:
+    # Distinct (stem, concept) pairs within a reply; separate replies can repeat one, like a real model
+    pairs = random.sample([(s, c) for s in _QUESTION_STEMS for c in _QUESTION_CONCEPTS], num_questions)
+    questions = []
+    for i, (stem, concept) in enumerate(pairs, 1):
+        question = {
+            "question_number": i,
+            "question_text": stem.format(concept) + "?",
+            "question_type": "MCQ" if i % 2 else "Short Answer",
+            "bloom_level": ["Remember", "Understand", "Apply", "Analyze", "Evaluate", "Create"][i % 6],
+            "marks": 2 if i % 2 else 5,
+        }
+        if i % 2:
+            question["options"] = ["A) Two real roots", "B) One real root", "C) No real roots", "D) Infinite roots"]
+            question["correct_answer"] = "A"
+        questions.append(question)
+    return {"assessment_title": "Mathematics - Quadratics Assessment", "total_questions": num_questions, "questions": questions}
+
+
+_FEEDBACK = {
+    "strengths": "Consistent effort and strong algebraic manipulation.",
+    "weak_areas": "Word problems and interpreting the discriminant.",
+    "improvement_plan": "Practise two word problems daily and review worked solutions.",
+    "motivational_message": "You are close - keep going!",
+}
+
+# (prompt marker, response builder). First match wins; keep markers in sync with AIService prompts.
+GROQ_RESPONSES = [
+    ("Extract student attendance records", lambda prompt: {"records": [
+        {"student_name": f"Student {i}", "attendance_date": "2024-02-10", "status": "Present" if i % 4 else "Absent"}
+        for i in range(1, 31)
+    ]}),
+    ("engagement insights", lambda prompt: {
+        "stats": {"engagementScore": 78, "questionsAsked": 42, "avgAttention": 81, "participationRate": 76},
+        "charts": {
+            "questionFrequency": [{"name": f"Week {i}", "value": 10 + i} for i in range(1, 9)],
+            "topicEngagement": [{"name": "Algebra", "value": 80}, {"name": "Geometry", "value": 65}],
+            "behaviorBreakdown": [{"name": "Active Participation", "value": 40}, {"name": "Passive Listening", "value": 60}],
+            "skillRadar": [{"name": "Problem Solving", "value": 70}, {"name": "Conceptual", "value": 75}],
+        },
+        "pedagogicalInsight": "Participation dips mid-term; introduce think-pair-share activities.",
+    }),
+    ("Bloom's Taxonomy", lambda prompt: _assessment(int((re.search(r"generate (\d+) questions", prompt, re.IGNORECASE) or [0, 5])[1]))),
+    ("marks summary", lambda prompt: {
+        "performance_summary": "The class average is moderate with a small group of students at risk.",
+        "teaching_strategy": "Revisit factoring with worked examples and add weekly low-stakes quizzes.",
+    }),
+    ("feedback for each of the following students", lambda prompt: {"feedback": [
+        {"student_name": name, **_FEEDBACK} for name in re.findall(r"- Student: (.+?) \| Score", prompt)
+    ]}),
+    ("personalized feedback", lambda prompt: _FEEDBACK),
+    ("syllabus text", lambda prompt: {
+        "major_topics": ["Quadratic equations", "Polynomials", "Linear inequalities", "Sequences"],
+        "assessment_focus": ["Problem solving", "Graph interpretation"],
+    }),
+    ("attendance summary", lambda prompt: {
+        "risk_analysis": "A handful of students have missed more than a quarter of classes.",
+        "engagement_score": 72,
+        "suggestions": ["Contact guardians of frequently absent students", "Share recorded lectures"],
+    }),
+    ("lecture transcript", lambda prompt: SAMPLE_LECTURE_NOTES),
+    ("Compare student performance with syllabus topics", lambda prompt: {
+        "detected_gaps": ["Quadratic formula", "Sequences"],
+        "pedagogical_advice": "Use visual parabola demos before formal derivations.",
+        "at_risk_topics": ["Sequences"],
+    }),
+]
+
+
+def _with_defects(text: str) -> str:
+    """The formatting slips models make most often: a markdown fence, prose and a trailing comma."""
+    return "Here is the JSON you asked for:\n```json\n" + text[:-1] + ",\n}\n```"
+
+
+class _GroqHandler(_JSONHandler):
+    def do_POST(self):
+        if not self.path.endswith("/chat/completions"):
+            self.begin()
+            return self.send_json(404, {"error": {"message": "not found"}})
+        request = json.loads(self.read_body() or b"{}")
+        model = request.get("model", "fake")
+        # Latency depends on the model asked for, so it is applied once the body has been read
+        with self.fake.lock:
+            self.fake.requests += 1
+            self.fake.model_requests[model] = self.fake.model_requests.get(model, 0) + 1
+        self.fake.model_latency.get(model, self.fake.latency).sleep()
+        prompt = "\n".join(m.get("content", "") for m in request.get("messages", []))
+        content = {}
+        for marker, build in GROQ_RESPONSES:
+            if marker in prompt:
+                content = build(prompt)
+                break
+        text = json.dumps(content)
+        if content and random.random() < self.fake.defect_rate:
+            text = _with_defects(text)
+        usage = {"prompt_tokens": len(prompt) // 4, "completion_tokens": len(text) // 4,
+                 "total_tokens": (len(prompt) + len(text)) // 4}
+        completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+        if request.get("stream"):
+            return self.send_stream(completion_id, model, text, usage)
+        self.send_json(200, {
+            "id": completion_id,
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+            "usage": usage,
+        })
+
+    def send_stream(self, completion_id: str, model: str, text: str, usage: Dict[str, int]):
+        """Server-sent chat.completion.chunk events, ~4 characters per token, like Groq's stream."""
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Connection", "close")
+        self.end_headers()
+
+        def event(delta: Dict[str, Any], finish_reason: Optional[str] = None, extra: Optional[Dict[str, Any]] = None):
+            chunk = {"id": completion_id, "object": "chat.completion.chunk", "created": int(time.time()), "model": model,
+                     "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}]}
+            chunk.update(extra or {})
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+            self.wfile.flush()
+
+        event({"role": "assistant", "content": ""})
+        step = 4 * self.fake.tokens_per_chunk
+        token_ms = self.fake.model_token_ms.get(model, self.fake.token_ms)
+        for start in range(0, len(text), step):
+            if token_ms:
+                time.sleep(token_ms * self.fake.tokens_per_chunk / 1000)
+            event({"content": text[start:start + step]})
+        event({}, "stop", {"x_groq": {"id": completion_id, "usage": usage}})
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+        self.close_connection = True
+
+
+class FakeGroq(_FakeHTTPServer):
+    """
+    token_ms paces streamed replies like real generation; defect_rate is the fraction of
+    replies sent with markdown fences, prose and a trailing comma, to exercise local repair.
+    model_latency and model_token_ms override latency and token_ms for the models named, so
+    smaller models can answer faster; model_requests counts the calls each model received.
+    """
+
+    handler_class = _GroqHandler
+
+    def __init__(self, latency: Optional[Latency] = None, token_ms: float = 0, defect_rate: float = 0.0,
+                 tokens_per_chunk: int = 4, model_latency: Optional[Dict[str, Latency]] = None,
+                 model_token_ms: Optional[Dict[str, float]] = None, port: int = 0):
+        super().__init__(latency, port)
+        self.token_ms = token_ms
+        self.defect_rate = defect_rate
+        self.tokens_per_chunk = tokens_per_chunk
+        self.model_latency = model_latency or {}
+        self.model_token_ms = model_token_ms or {}
+        self.model_requests: Dict[str, int] = {}
+        self.lock = threading.Lock()
+
+
+# --- Supabase PostgREST -----------------------------------------------------
+
+_RESERVED_PARAMS = {"select", "order", "limit", "offset", "on_conflict", "columns"}
+
+
+def _like(pattern: str, value: Any, flags: int = 0) -> bool:
+    regex = "^" + re.escape(pattern).replace("%", ".*").replace(r"\*", ".*") + "$"
+    return re.match(regex, str(value), flags) is not None
+
+
+def _matches(row: Dict[str, Any], column: str, expression: str) -> bool:
+    if column in ("or", "and"):
+        return _matches_group(row, column, expression.strip()[1:-1])
+    op, _, operand = expression.partition(".")
+    if len(operand) > 1 and operand[0] == operand[-1] == '"':
+        operand = operand[1:-1]
+    value = row.get(column)
+    if op == "eq":
+        return str(value) == operand or (isinstance(value, bool) and str(value).lower() == operand)
+    if op == "neq":
+        return str(value) != operand
+    if op in ("gt", "gte", "lt", "lte"):
+        if value is None:
+            return False
+        left, right = (float(value), float(operand)) if isinstance(value, (int, float)) else (str(value), operand)
+        return {"gt": left > right, "gte": left >= right, "lt": left < right, "lte": left <= right}[op]
+    if op == "ilike":
+        return _like(operand, value, re.IGNORECASE)
+    if op == "like":
+        return _like(operand, value)
+    if op == "in":
+        return str(value) in operand.strip("()").split(",")
+    if op == "is":
+        return (value is None) if operand == "null" else str(value).lower() == operand
+    return True
+
+
+def _split_conditions(text: str) -> List[str]:
+    """Top-level comma-separated conditions of an or=(...) / and(...) group."""
+    parts, depth, quoted, start = [], 0, False, 0
+    for i, char in enumerate(text):
+        if char == '"':
+            quoted = not quoted
+        elif not quoted and char in "()":
+            depth += 1 if char == "(" else -1
+        elif not quoted and char == "," and depth == 0:
+            parts.append(text[start:i])
+            start = i + 1
+    parts.append(text[start:])
+    return [p for p in parts if p]
+
+
+def _matches_group(row: Dict[str, Any], op: str, body: str) -> bool:
+    results = []
+    for condition in _split_conditions(body):
+        if condition.startswith(("and(", "or(")):
+            name, _, inner = condition.partition("(")
+            results.append(_matches_group(row, name, inner[:-1]))
+        else:
+            column, _, expression = condition.partition(".")
+            results.append(_matches(row, column, expression))
+    return all(results) if op == "and" else any(results)
+
+
+def _project(row: Dict[str, Any], columns: List[str]) -> Dict[str, Any]:
+    """select=a,alias:b->>key,c->key: plain columns, renames and JSON paths."""
+    projected = {}
+    for column in columns:
+        alias, _, expression = column.rpartition(":")
+        path = re.split(r"->>?", expression)
+        value = row.get(path[0])
+        for key in path[1:]:
+            value = value.get(key) if isinstance(value, dict) else None
+        if "->>" in expression and value is not None and not isinstance(value, str):
+            value = json.dumps(value)
+        projected[alias or path[-1]] = value
+    return projected
+
+
+class _PostgrestHandler(_JSONHandler):
+    def _parse(self):
+        parsed = urlparse(self.path)
+        table = parsed.path.rsplit("/", 1)[-1]
+        params = parse_qsl(parsed.query, keep_blank_values=True)
+        return table, params
+
+    def _filtered(self, table: str, params) -> List[Dict[str, Any]]:
+        rows = self.fake.tables.setdefault(table, [])
+        for column, expression in params:
+            if column not in _RESERVED_PARAMS:
+                rows = [r for r in rows if _matches(r, column, expression)]
+        return rows
+
+    def _wants_object(self) -> bool:
+        return "vnd.pgrst.object" in (self.headers.get("Accept") or "")
+
+    def _respond_rows(self, rows: List[Dict[str, Any]], status: int = 200):
+        if self._wants_object():
+            if len(rows) != 1:
+                return self.send_json(406, {"code": "PGRST116", "message": "JSON object requested, multiple (or no) rows returned",
+                                            "details": f"The result contains {len(rows)} rows", "hint": None})
+            return self.send_json(status, rows[0])
+        self.send_json(status, rows, {"Content-Range": f"0-{max(0, len(rows) - 1)}/*"})
+
+    def do_GET(self):
+        self.begin()
+        table, params = self._parse()
+        with self.fake.lock:
+            rows = self._filtered(table, params)
+            query = dict(params)
+            for order in reversed((query.get("order") or "").split(",")):
+                if order:
+                    column, _, direction = order.partition(".")
+                    rows = sorted(rows, key=lambda r: (r.get(column) is None, str(r.get(column))),
+                                  reverse=direction.startswith("desc"))
+            offset = int(query.get("offset") or 0)
+            range_header = self.headers.get("Range")
+            if range_header and "-" in range_header:
+                start, end = range_header.split("-")
+                offset, limit = int(start), int(end) - int(start) + 1
+            else:
+                limit = int(query["limit"]) if query.get("limit") else None
+            rows = rows[offset: offset + limit if limit is not None else None]
+            select = query.get("select", "*")
+            if select and select != "*":
+                columns = [c.strip() for c in select.split(",")]
+                rows = [_project(r, columns) for r in rows]
+            else:
+                rows = [dict(r) for r in rows]
+        self._respond_rows(rows)
+
+    def do_POST(self):
+        self.begin()
+        table, _ = self._parse()
+        payload = json.loads(self.read_body() or b"[]")
+        created = []
+        with self.fake.lock:
+            for row in payload if isinstance(payload, list) else [payload]:
+                row = dict(row)
+                row.setdefault("id", str(uuid.uuid4()))
+                row.setdefault("created_at", datetime.datetime.utcnow().isoformat())
+                self.fake.tables.setdefault(table, []).append(row)
+                created.append(dict(row))
+        self._respond_rows(created, status=201)
+
+    def do_PATCH(self):
+        self.begin()
+        table, params = self._parse()
+        changes = json.loads(self.read_body() or b"{}")
+        with self.fake.lock:
+            rows = self._filtered(table, params)
+            for row in rows:
+                row.update(changes)
+            rows = [dict(r) for r in rows]
+        self._respond_rows(rows)
+
+    def do_DELETE(self):
+        self.begin()
+        table, params = self._parse()
+        with self.fake.lock:
+            doomed = self._filtered(table, params)
+            ids = {id(r) for r in doomed}
+            self.fake.tables[table] = [r for r in self.fake.tables.get(table, []) if id(r) not in ids]
+            rows = [dict(r) for r in doomed]
+        self._respond_rows(rows)
+
+
+class FakePostgrest(_FakeHTTPServer):
+    """PostgREST subset used by supabase-py: filters (and or/and groups), order, limit/offset/Range, select
+    with renames and JSON paths, single(), insert/update/delete."""
+
+    handler_class = _PostgrestHandler
+
+    def __init__(self, latency: Optional[Latency] = None, tables: Optional[Dict[str, List[Dict[str, Any]]]] = None):
+        super().__init__(latency)
+        self.tables: Dict[str, List[Dict[str, Any]]] = tables or {}
+        self.lock = threading.Lock()
+
+
+# --- Whisper ----------------------------------------------------------------
+
+SAMPLE_TRANSCRIPT = (
+    "Good morning everyone. Today we are looking at quadratic equations. A quadratic is a polynomial of degree two, "
+    "written in standard form as a x squared plus b x plus c equals zero. We can solve it by factoring, by completing "
+    "the square, or with the quadratic formula. The discriminant, b squared minus four a c, tells us how many real "
+    "roots there are. Think of a ball thrown in the air: its height over time is a parabola. "
+) * 8
+
+
+class _WhisperHandler(_JSONHandler):
+    def do_POST(self):
+        self.begin()
+        self.read_body()
+        if not self.path.endswith("/transcribe"):
+            return self.send_json(404, {"detail": "not found"})
+        self.send_json(200, {"text": self.fake.transcript})
+
+
+class FakeWhisper(_FakeHTTPServer):
+    handler_class = _WhisperHandler
+
+    def __init__(self, latency: Optional[Latency] = None, transcript: str = SAMPLE_TRANSCRIPT):
+        super().__init__(latency)
+        self.transcript = transcript
+
+
+# --- SMTP -------------------------------------------------------------------
+
+def _self_signed_cert(directory: str):
+    """Throwaway certificate so smtplib's STARTTLS handshake has something to talk to."""
+    from cryptography import x509
+    from cryptography.hazmat.primitives import hashes, serialization
+    from cryptography.hazmat.primitives.asymmetric import ec
+    from cryptography.x509.oid import NameOID
+
+    key = ec.generate_private_key(ec.SECP256R1())
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, "localhost")])
+    now = datetime.datetime.now(datetime.timezone.utc)
+    cert = (x509.CertificateBuilder().subject_name(name).issuer_name(name).public_key(key.public_key())
+            .serial_number(x509.random_serial_number()).not_valid_before(now)
+            .not_valid_after(now + datetime.timedelta(days=1)).sign(key, hashes.SHA256()))
+    cert_path, key_path = f"{directory}/cert.pem", f"{directory}/key.pem"
+    with open(cert_path, "wb") as f:
+        f.write(cert.public_bytes(serialization.Encoding.PEM))
+    with open(key_path, "wb") as f:
+        f.write(key.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8,
+                                  serialization.NoEncryption()))
+    return cert_path, key_path
+
+
+class _SMTPHandler(socketserver.StreamRequestHandler):
+    fake: Any = None
+
+    def reply(self, line: str):
+        self.wfile.write((line + "\r\n").encode())
+        self.wfile.flush()
+
+    def handle(self):
+        self.reply("220 localhost fake ESMTP")
+        while True:
+            raw = self.rfile.readline()
+            if not raw:
+                return
+            command = raw.decode(errors="replace").strip()
+            verb = command.split(" ", 1)[0].upper()
+            if verb in ("EHLO", "HELO"):
+                self.reply("250-localhost")
+                self.reply("250-AUTH PLAIN LOGIN")
+                self.reply("250 STARTTLS")
+            elif verb == "STARTTLS":
+                self.reply("220 Ready to start TLS")
+                self.request = self.fake.tls.wrap_socket(self.request, server_side=True)
+                self.rfile = self.request.makefile("rb")
+                self.wfile = self.request.makefile("wb")
+            elif verb == "AUTH":
+                self.reply("235 Authentication successful")
+            elif verb in ("MAIL", "RCPT", "RSET", "NOOP"):
+                self.reply("250 OK")
+            elif verb == "DATA":
+                self.reply("354 End data with <CR><LF>.<CR><LF>")
+                while self.rfile.readline() not in (b".\r\n", b".\n", b""):
+                    pass
+                self.fake.latency.sleep()
+                self.fake.delivered += 1
+                self.reply("250 OK: queued")
+            elif verb == "QUIT":
+                self.reply("221 Bye")
+                return
+            else:
+                self.reply("502 Command not implemented")
+
+
+class FakeSMTP:
+    """Accepts and discards mail. Latency is applied per delivered message."""
+
+    def __init__(self, latency: Optional[Latency] = None):
+        self.latency = latency or Latency()
+        self.delivered = 0
+        self._certs = tempfile.TemporaryDirectory()
+        cert_path, key_path = _self_signed_cert(self._certs.name)
+        self.tls = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        self.tls.load_cert_chain(cert_path, key_path)
+        handler = type("_SMTPHandler", (_SMTPHandler,), {"fake": self})
+        self._server = socketserver.ThreadingTCPServer(("127.0.0.1", 0), handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def host(self) -> str:
+        return self._server.server_address[0]
+
+    @property
+    def port(self) -> int:
+        return self._server.server_address[1]
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+        self._certs.cleanup()
+
+
+def _model_values(pairs: List[str]) -> Dict[str, float]:
+    values = {}
+    for pair in pairs:
+        model, _, value = pair.partition("=")
+        values[model] = float(value)
+    return values
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the fake Groq server as a local OpenAI-compatible LLM")
+    parser.add_argument("--port", type=int, default=8800)
+    parser.add_argument("--latency", type=float, default=0.0, help="time to first token in ms")
+    parser.add_argument("--token-ms", type=float, default=0.0, help="per-token delay for streamed replies")
+    parser.add_argument("--model-latency", action="append", default=[], metavar="MODEL=MS",
+                        help="latency for one model (repeatable)")
+    parser.add_argument("--model-token-ms", action="append", default=[], metavar="MODEL=MS",
+                        help="per-token delay for one model (repeatable)")
+    parser.add_argument("--defect-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    server = FakeGroq(Latency(args.latency), token_ms=args.token_ms, defect_rate=args.defect_rate,
+                      model_latency={m: Latency(ms) for m, ms in _model_values(args.model_latency).items()},
+                      model_token_ms=_model_values(args.model_token_ms), port=args.port)
+    print(f"Stand-in LLM on {server.url} (/v1/chat/completions, /openai/v1/chat/completions). Ctrl+C to stop.")
+    try:
+        server._server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server._server.server_close()
+        print(f"Served {server.requests} completions: {server.model_requests}")
+
+
+if __name__ == "__main__":
+    main()
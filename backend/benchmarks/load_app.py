@@ -0,0 +1,24 @@
+"""
+The real API plus unauthenticated CPU-bound routes for load testing.
+
+The routes do the same in-process work as the production handlers (FPDF
+rendering, pandas analysis) without Groq, Supabase or login in the way, so
+worker scaling can be measured offline. Never deploy this module.
+"""
+from main import app
+from benchmarks.bench_pdf_render import SAMPLE_NOTES
+from services.container import parser_service, pdf_service
+
+with open("attendance_sample.csv", "rb") as f:
+    SAMPLE_ATTENDANCE_CSV = f.read()
+
+
+# async like the real handlers: the work blocks this worker's event loop, which is what scaling workers addresses
+@app.get("/_bench/render-notes")
+async def bench_render_notes():
+    return {"bytes": len(pdf_service.render_lecture_notes(SAMPLE_NOTES))}
+
+
+@app.get("/_bench/parse-attendance")
+async def bench_parse_attendance():
+    return parser_service.parse_attendance_csv(SAMPLE_ATTENDANCE_CSV)
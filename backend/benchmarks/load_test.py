@@ -0,0 +1,123 @@
+"""
+Load-test harness: throughput of the API with 1 worker vs N workers.
+
+Starts `serve.py api` once per worker count with the load-test app
+(benchmarks.load_app), drives it with concurrent requests and reports
+requests/second and latency percentiles.
+
+Usage (from backend/):
+    python -m benchmarks.load_test --workers 1,4 --path /_bench/render-notes --requests 400 --concurrency 32
+    python -m benchmarks.load_test --workers 1,4 --path / --requests 5000
+"""
+import argparse
+import asyncio
+import os
+import signal
+import statistics
+import subprocess
+import sys
+import time
+
+import httpx
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def start_server(workers: int, port: int, app: str) -> subprocess.Popen:
+    env = dict(os.environ, ACCESS_LOG="false")
+    return subprocess.Popen(
+        [sys.executable, "serve.py", "api", "--app", app, "--workers", str(workers),
+         "--port", str(port), "--host", "127.0.0.1", "--max-requests", "0"],
+        cwd=BACKEND_DIR, env=env,
+    )
+
+
+def wait_until_ready(base_url: str, process: subprocess.Popen, timeout: float = 60):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"server exited with code {process.returncode}")
+        try:
+            if httpx.get(base_url + "/", timeout=1).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.25)
+    raise RuntimeError("server did not become ready in time")
+
+
+def stop_server(process: subprocess.Popen):
+    # SIGINT/SIGTERM go through uvicorn's graceful shutdown, same as a deploy would
+    process.send_signal(signal.SIGINT)
+    try:
+        process.wait(timeout=30)
+    except subprocess.TimeoutExpired:
+        process.kill()
+
+
+async def drive(url: str, requests: int, concurrency: int) -> dict:
+    latencies = []
+    errors = 0
+    queue = iter(range(requests))
+
+    async def worker(client: httpx.AsyncClient):
+        nonlocal errors
+        for _ in queue:
+            start = time.perf_counter()
+            try:
+                response = await client.get(url)
+                if response.status_code != 200:
+                    errors += 1
+            except httpx.HTTPError:
+                errors += 1
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(limits=limits, timeout=120) as client:
+        # Warm-up: let every worker import and build its services before measuring
+        await asyncio.gather(*(client.get(url) for _ in range(concurrency)))
+        start = time.perf_counter()
+        await asyncio.gather(*(worker(client) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    quantiles = statistics.quantiles(latencies, n=100)
+    return {
+        "rps": requests / elapsed,
+        "p50": quantiles[49],
+        "p95": quantiles[94],
+        "p99": quantiles[98],
+        "errors": errors,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare API throughput across worker counts")
+    parser.add_argument("--workers", default=f"1,{os.cpu_count() or 1}", help="comma-separated worker counts")
+    parser.add_argument("--path", default="/_bench/render-notes")
+    parser.add_argument("--app", default="benchmarks.load_app:app")
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    results = {}
+    for workers in [int(w) for w in args.workers.split(",")]:
+        base_url = f"http://127.0.0.1:{args.port}"
+        process = start_server(workers, args.port, args.app)
+        try:
+            wait_until_ready(base_url, process)
+            results[workers] = asyncio.run(drive(base_url + args.path, args.requests, args.concurrency))
+        finally:
+            stop_server(process)
+
+    baseline = next(iter(results.values()))["rps"]
+    print(f"\n{args.path}: {args.requests} requests, concurrency {args.concurrency}")
+    print(f"{'workers':>8} {'req/s':>9} {'speedup':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'errors':>7}")
+    for workers, r in results.items():
+        print(f"{workers:>8} {r['rps']:>9.1f} {r['rps'] / baseline:>7.2f}x {r['p50']:>9.1f} "
+              f"{r['p95']:>9.1f} {r['p99']:>9.1f} {r['errors']:>7}")
+
+
+if __name__ == "__main__":
+    main()
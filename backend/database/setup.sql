@@ -1,5 +1,7 @@
 -- 1. Enable necessary extensions
 CREATE EXTENSION IF NOT EXISTS "pgcrypto";
+-- Trigram indexes for the ilike '%name%' lookups
+CREATE EXTENSION IF NOT EXISTS "pg_trgm";
 
 -- 2. Drop existing policies safely
 DO $$ 
@@ -11,7 +13,7 @@ BEGIN
         FROM pg_policy p
         JOIN pg_class c ON p.polrelid = c.oid
         WHERE p.polname = 'Enable all for service role'
-        AND c.relname IN ('marks_analysis', 'syllabus_analysis', 'assessments', 'feedback', 'study_materials', 'attendance', 'students')
+        AND c.relname IN ('marks_analysis', 'syllabus_analysis', 'assessments', 'feedback', 'study_materials', 'attendance', 'students', 'learning_gaps', 'student_aliases')
     LOOP
         EXECUTE format('DROP POLICY %I ON %I', pol_record.polname, pol_record.relname);
     END LOOP;
@@ -52,6 +54,23 @@ CREATE TABLE IF NOT EXISTS syllabus_analysis (
     assessment_focus JSONB
 );
 
+-- Learning gaps are scoped per subject; rows from before this default to the upload routes' subject
+ALTER TABLE marks_analysis ADD COLUMN IF NOT EXISTS subject TEXT DEFAULT 'General';
+ALTER TABLE marks_analysis ADD COLUMN IF NOT EXISTS topic_scores JSONB;
+ALTER TABLE syllabus_analysis ADD COLUMN IF NOT EXISTS subject TEXT DEFAULT 'General';
+
+-- One memoized /detect-learning-gaps result per teacher, subject and pair of analyses it was computed from
+CREATE TABLE IF NOT EXISTS learning_gaps (
+    id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    teacher_id UUID REFERENCES teachers(id),
+    created_at TIMESTAMPTZ DEFAULT now(),
+    subject TEXT NOT NULL,
+    marks_analysis_id UUID REFERENCES marks_analysis(id) ON DELETE CASCADE,
+    syllabus_analysis_id UUID REFERENCES syllabus_analysis(id) ON DELETE CASCADE,
+    result JSONB NOT NULL,
+    UNIQUE (teacher_id, subject, marks_analysis_id, syllabus_analysis_id)
+);
+
 CREATE TABLE IF NOT EXISTS assessments (
     id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
     teacher_id UUID REFERENCES teachers(id),
@@ -92,6 +111,30 @@ CREATE TABLE IF NOT EXISTS attendance (
     subject TEXT
 );
 
+-- Student identity: uploaded names are resolved to students.id once per teacher and remembered here
+CREATE TABLE IF NOT EXISTS student_aliases (
+    id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    teacher_id UUID REFERENCES teachers(id) ON DELETE CASCADE,
+    created_at TIMESTAMPTZ DEFAULT now(),
+    alias_key TEXT NOT NULL,
+    student_id UUID NOT NULL REFERENCES students(id) ON DELETE CASCADE,
+    UNIQUE (teacher_id, alias_key)
+);
+
+ALTER TABLE attendance ADD COLUMN IF NOT EXISTS student_id UUID REFERENCES students(id) ON DELETE SET NULL;
+ALTER TABLE feedback ADD COLUMN IF NOT EXISTS student_id UUID REFERENCES students(id) ON DELETE SET NULL;
+
+-- Link existing rows whose name is exactly one student's name. New rows are resolved at ingestion, and
+-- feedback still unresolved is linked when its student reads /my-feedback
+UPDATE attendance a SET student_id = s.id
+FROM students s
+WHERE a.student_id IS NULL AND lower(a.student_name) = lower(s.name)
+  AND (SELECT count(*) FROM students d WHERE lower(d.name) = lower(s.name)) = 1;
+UPDATE feedback f SET student_id = s.id
+FROM students s
+WHERE f.student_id IS NULL AND (lower(f.student_name) = lower(s.name) OR lower(f.student_name) = lower(s.email))
+  AND (SELECT count(*) FROM students d WHERE lower(d.name) = lower(f.student_name) OR lower(d.email) = lower(f.student_name)) = 1;
+
 -- 4. Ensure RLS is enabled
 ALTER TABLE marks_analysis ENABLE ROW LEVEL SECURITY;
 ALTER TABLE syllabus_analysis ENABLE ROW LEVEL SECURITY;
@@ -100,6 +143,8 @@ ALTER TABLE feedback ENABLE ROW LEVEL SECURITY;
 ALTER TABLE study_materials ENABLE ROW LEVEL SECURITY;
 ALTER TABLE attendance ENABLE ROW LEVEL SECURITY;
 ALTER TABLE students ENABLE ROW LEVEL SECURITY;
+ALTER TABLE learning_gaps ENABLE ROW LEVEL SECURITY;
+ALTER TABLE student_aliases ENABLE ROW LEVEL SECURITY;
 
 -- 6. Lecture Notes Table
 CREATE TABLE IF NOT EXISTS lecture_notes (
@@ -126,4 +171,45 @@ CREATE POLICY "Enable all for service role" ON assessments FOR ALL USING (true)
 CREATE POLICY "Enable all for service role" ON feedback FOR ALL USING (true) WITH CHECK (true);
 CREATE POLICY "Enable all for service role" ON study_materials FOR ALL USING (true) WITH CHECK (true);
 CREATE POLICY "Enable all for service role" ON attendance FOR ALL USING (true) WITH CHECK (true);
-CREATE POLICY "Enable all for service role" ON students FOR ALL USING (true) WITH CHECK (true);
\ No newline at end of file
+CREATE POLICY "Enable all for service role" ON students FOR ALL USING (true) WITH CHECK (true);
+CREATE POLICY "Enable all for service role" ON learning_gaps FOR ALL USING (true) WITH CHECK (true);
+CREATE POLICY "Enable all for service role" ON student_aliases FOR ALL USING (true) WITH CHECK (true);
+
+-- 7. Indexes for the hot lookups (benchmarks/bench_indexes.py shows the plans with and without them)
+-- Latest-row and per-teacher reads: .eq("teacher_id", ...).order("created_at", desc=True).limit(n)
+CREATE INDEX IF NOT EXISTS marks_analysis_teacher_created_idx ON marks_analysis (teacher_id, created_at DESC);
+CREATE INDEX IF NOT EXISTS syllabus_analysis_teacher_created_idx ON syllabus_analysis (teacher_id, created_at DESC);
+CREATE INDEX IF NOT EXISTS attendance_teacher_created_idx ON attendance (teacher_id, created_at DESC);
+
+-- /history/{kind}: keyset pages ordered by (created_at, id), which also serve the latest-row reads above.
+-- They replace the (teacher_id, created_at) indexes these tables had before.
+CREATE INDEX IF NOT EXISTS assessments_teacher_created_id_idx ON assessments (teacher_id, created_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS feedback_teacher_created_id_idx ON feedback (teacher_id, created_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS study_materials_teacher_created_id_idx ON study_materials (teacher_id, created_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS lecture_notes_teacher_created_id_idx ON lecture_notes (teacher_id, created_at DESC, id DESC);
+DROP INDEX IF EXISTS assessments_teacher_created_idx;
+DROP INDEX IF EXISTS feedback_teacher_created_idx;
+DROP INDEX IF EXISTS study_materials_teacher_created_idx;
+DROP INDEX IF EXISTS lecture_notes_teacher_created_idx;
+
+-- /detect-learning-gaps: the teacher's latest analysis for one subject
+CREATE INDEX IF NOT EXISTS marks_analysis_teacher_subject_created_idx ON marks_analysis (teacher_id, subject, created_at DESC);
+CREATE INDEX IF NOT EXISTS syllabus_analysis_teacher_subject_created_idx ON syllabus_analysis (teacher_id, subject, created_at DESC);
+
+-- Question bank: incremental loads of assessments newer than the last refresh, keyset pages on (created_at, id)
+CREATE INDEX IF NOT EXISTS assessments_created_id_idx ON assessments (created_at, id);
+DROP INDEX IF EXISTS assessments_created_idx;
+
+-- /my-feedback links a student's unresolved feedback on read (StudentService.claim_unresolved): candidates
+-- are found by a word of their name (ilike '%word%'), among NULL-student rows only, and so are namesakes
+DROP INDEX IF EXISTS feedback_student_name_trgm_idx;
+CREATE INDEX IF NOT EXISTS feedback_unresolved_name_trgm_idx ON feedback USING GIN (student_name gin_trgm_ops)
+    WHERE student_id IS NULL;
+CREATE INDEX IF NOT EXISTS students_name_trgm_idx ON students USING GIN (name gin_trgm_ops);
+
+-- One student's attendance in a teacher's subject, by date
+CREATE INDEX IF NOT EXISTS attendance_teacher_subject_student_date_idx ON attendance (teacher_id, subject, student_name, attendance_date);
+
+-- A student's own rows: /my-feedback and attendance by students.id
+CREATE INDEX IF NOT EXISTS feedback_student_created_idx ON feedback (student_id, created_at DESC);
+CREATE INDEX IF NOT EXISTS attendance_student_date_idx ON attendance (student_id, attendance_date);
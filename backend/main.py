@@ -1,19 +1,79 @@
-import uvicorn
-from fastapi import FastAPI
-from fastapi.middleware.cors import CORSMiddleware
-from routes import analytics, academic, auth
+import time
+_process_start = time.perf_counter()
+
+from contextlib import asynccontextmanager
+import importlib
+import os
 from dotenv import load_dotenv
 
+# Load .env once, before any module reads its configuration
 load_dotenv()
 
+from fastapi import FastAPI
+from fastapi.middleware.cors import CORSMiddleware
+from services.container import container
+from services.password_service import password_service
+from services.export_service import export_service
+from services.data_service import data_service
+from services.metrics_service import MetricsMiddleware
+# Validates LLM_ROUTES: a bad entry raises here and the worker doesn't start
+import services.routing_service
+from services.profiling_service import ProfilingMiddleware, profiling_service
+
+# Import routers one by one so the startup report can attribute import cost
+_router_import_ms = {}
+for _module in ("routes.analytics", "routes.academic", "routes.auth", "routes.notifications", "routes.metrics",
+                "routes.profiling", "routes.history"):
+    _start = time.perf_counter()
+    importlib.import_module(_module)
+    _router_import_ms[_module] = (time.perf_counter() - _start) * 1000
+from routes import analytics, academic, auth, notifications, metrics, profiling, history
+
+# Set to true to build every service (Groq, Supabase, SMTP, ...) at startup instead of on first use
+WARM_SERVICES = os.environ.get("MENTORAI_WARM_SERVICES", "false").lower() == "true"
+
+_ready_ms = None
+
+
+def startup_report() -> dict:
+    """Import and init cost per module, in milliseconds."""
+    return {
+        "routers_import_ms": {k: round(v, 1) for k, v in _router_import_ms.items()},
+        "services": {
+            name: {k: round(v, 1) for k, v in timing.items()}
+            for name, timing in container.timings.items()
+        },
+        "ready_ms": round(_ready_ms, 1) if _ready_ms is not None else None,
+    }
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global _ready_ms
+    if WARM_SERVICES:
+        container.warm()
+    _ready_ms = (time.perf_counter() - _process_start) * 1000
+    report = startup_report()
+    print(f"🚀 MentorAI Backend ready in {_ready_ms:.0f} ms")
+    for module, ms in report["routers_import_ms"].items():
+        print(f"   import {module:<28} {ms:8.1f} ms")
+    for name, timing in report["services"].items():
+        print(f"   init   {name:<28} {timing['import_ms'] + timing['init_ms']:8.1f} ms (import {timing['import_ms']:.1f}, init {timing['init_ms']:.1f})")
+    yield
+    # Graceful shutdown: write the rows still buffered for batched inserts, and let in-flight
+    # hashing and export renders finish before the worker exits
+    await data_service.close()
+    password_service.shutdown()
+    export_service.shutdown()
+
+
 app = FastAPI(
     title="MentorAI Backend", 
     description="AI Academic Co-Pilot for Educators",
-    swagger_ui_parameters={"persistAuthorization": True}
+    swagger_ui_parameters={"persistAuthorization": True},
+    lifespan=lifespan
 )
 
-print("🚀 MentorAI Backend Reloaded Successfully")
-
 # Configure CORS
 app.add_middleware(
     CORSMiddleware,
@@ -23,13 +83,21 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-from routes import analytics, academic, auth, notifications
+# Per-route request counts and latency, exposed on /metrics
+app.add_middleware(MetricsMiddleware)
+
+# On-demand sampling profiles for requests carrying the admin token; not installed at all when disabled
+if profiling_service.enabled:
+    app.add_middleware(ProfilingMiddleware)
 
 # Include Routes
 app.include_router(analytics.router)
 app.include_router(academic.router)
 app.include_router(auth.router)
 app.include_router(notifications.router)
+app.include_router(metrics.router)
+app.include_router(profiling.router)
+app.include_router(history.router)
 
 
 @app.get("/")
@@ -37,4 +105,6 @@ async def root():
     return {"message": "Welcome to MentorAI API"}
 
 if __name__ == "__main__":
+    # Development server (single process, auto-reload). Use `python serve.py api` in production.
+    import uvicorn
     uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True)
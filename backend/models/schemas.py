@@ -1,5 +1,5 @@
-from pydantic import BaseModel, Field
-from typing import List, Optional
+from pydantic import BaseModel, BeforeValidator, ConfigDict, Field, field_validator
+from typing import Annotated, Any, Dict, List, Optional, Union
 
 class StudentMark(BaseModel):
     student_name: str
@@ -14,12 +14,17 @@ class AssessmentRequest(BaseModel):
     unit: str
     difficulty: str = "Medium"
     num_questions: int = 5
+    # Fill from previously generated questions first; False always generates a fresh paper
+    reuse_questions: bool = True
 
 class FeedbackRequest(BaseModel):
     student_name: str
     score: float
     weak_topics: List[str]
 
+class BulkFeedbackRequest(BaseModel):
+    students: List[FeedbackRequest] = Field(min_length=1)
+
 class SyllabusAnalysisRequest(BaseModel):
     subject: str
 
@@ -67,3 +72,141 @@ class LearningGapResponse(BaseModel):
     detected_gaps: List[str]
     recovery_plan: str
     at_risk_topics: List[str]
+
+
+# --- LLM response shapes ---------------------------------------------------
+# Lenient on purpose: models drift between strings and lists, or echo the template,
+# and a usable reply shouldn't be thrown away over that. Unknown keys are kept.
+
+def _as_text(value: Any) -> Any:
+    if isinstance(value, list):
+        return "\n".join(str(v) for v in value)
+    if isinstance(value, dict):
+        return "\n".join(f"{k}: {v}" for k, v in value.items())
+    if isinstance(value, (int, float)):
+        return str(value)
+    return value
+
+def _as_list(value: Any) -> Any:
+    if value is None:
+        return []
+    if isinstance(value, str):
+        return [value] if value.strip() else []
+    return value
+
+def _as_score(value: Any) -> Any:
+    if isinstance(value, str):
+        digits = value.strip().rstrip("%").strip()
+        try:
+            return float(digits) if "." in digits else int(digits)
+        except ValueError:
+            return None
+    return value
+
+def _as_definitions(value: Any) -> Any:
+    if isinstance(value, list):
+        # [{"term": ..., "definition": ...}] instead of {term: definition}
+        return {str(v.get("term", "")): str(v.get("definition", "")) for v in value if isinstance(v, dict)}
+    return value or {}
+
+Text = Annotated[str, BeforeValidator(_as_text)]
+TextList = Annotated[List[Text], BeforeValidator(_as_list)]
+Score = Annotated[Optional[Union[int, float]], BeforeValidator(_as_score)]
+
+class LLMResponse(BaseModel):
+    model_config = ConfigDict(extra="allow")
+
+class MarksAnalysisResponse(LLMResponse):
+    performance_summary: Text
+    teaching_strategy: Text = ""
+
+class AssessmentQuestion(LLMResponse):
+    question_number: Optional[int] = None
+    question_text: Text
+    question_type: Text = "Short Answer"
+    options: Optional[TextList] = None
+    correct_answer: Optional[Text] = None
+    bloom_level: Optional[Text] = None
+    marks: Score = None
+
+class AssessmentResponse(LLMResponse):
+    assessment_title: Optional[Text] = None
+    total_questions: Optional[int] = None
+    questions: List[AssessmentQuestion] = Field(min_length=1)
+
+    @field_validator("questions", mode="before")
+    @classmethod
+    def drop_invalid_questions(cls, value: Any) -> Any:
+        # A reply cut off by the token limit ends in a partial question; keep the complete ones
+        if not isinstance(value, list):
+            return value
+        kept = []
+        for item in value:
+            try:
+                kept.append(AssessmentQuestion.model_validate(item))
+            except ValueError:
+                continue
+        return kept
+
+    def model_post_init(self, __context: Any):
+        for number, question in enumerate(self.questions, 1):
+            question.question_number = number
+        self.total_questions = len(self.questions)
+
+class FeedbackResponse(LLMResponse):
+    strengths: Text = ""
+    weak_areas: Text = ""
+    improvement_plan: Text
+    motivational_message: Text = ""
+
+class StudentFeedbackResponse(FeedbackResponse):
+    student_name: Text
+
+class FeedbackBatchResponse(LLMResponse):
+    feedback: List[StudentFeedbackResponse] = Field(min_length=1)
+
+    @field_validator("feedback", mode="before")
+    @classmethod
+    def drop_invalid_feedback(cls, value: Any) -> Any:
+        # Students left out or cut off are retried one by one; keep the complete entries
+        if not isinstance(value, list):
+            return value
+        kept = []
+        for item in value:
+            try:
+                kept.append(StudentFeedbackResponse.model_validate(item))
+            except ValueError:
+                continue
+        return kept
+
+class SyllabusAnalysisResponse(LLMResponse):
+    major_topics: TextList = Field(min_length=1)
+    assessment_focus: TextList = []
+
+class AttendanceAnalysisResponse(LLMResponse):
+    risk_analysis: Text
+    engagement_score: Score = None
+    suggestions: TextList = []
+
+class LectureNotesResponse(LLMResponse):
+    title: Text = "Lecture Notes"
+    summary: Text
+    topics: TextList = []
+    concepts: TextList = []
+    formulas: TextList = []
+    definitions: Annotated[Dict[str, Text], BeforeValidator(_as_definitions)] = {}
+    examples: TextList = []
+
+class LearningGapAnalysisResponse(LLMResponse):
+    detected_gaps: TextList = []
+    pedagogical_advice: Text = ""
+    at_risk_topics: TextList = []
+
+class AttendanceRecordsResponse(LLMResponse):
+    # Per-record checks happen when records are merged (ParserService.merge_attendance_records)
+    records: List[Dict[str, Any]] = []
+
+class EngagementResponse(LLMResponse):
+    stats: Dict[str, Any]
+    charts: Dict[str, Any]
+    pedagogicalInsight: Text = ""
@@ -1,18 +1,169 @@
-from fastapi import APIRouter, HTTPException, Depends
-from models.schemas import AssessmentRequest, FeedbackRequest, MaterialBasedAssessmentRequest, LearningGapRequest
-from services.ai_service import ai_service
-from services.supabase_service import supabase_service
+from fastapi import APIRouter, UploadFile, File, HTTPException, Depends
+from fastapi.responses import StreamingResponse
+from models.schemas import AssessmentRequest, BulkFeedbackRequest, FeedbackRequest, MaterialBasedAssessmentRequest, LearningGapRequest
+from services.container import ai_service, parser_service
+from services.question_bank_service import question_bank_service
+from services.learning_gap_service import learning_gap_service
+from services.student_service import student_service
+from services.data_service import data_service
 from routes.auth import get_current_user
-from typing import Dict, Any
+from typing import Dict, Any, Awaitable, Callable, List, Optional
+import asyncio
+import json
 
 router = APIRouter(prefix="/academic", tags=["Academic"])
 
+# Comment lines sent while the model is still thinking, so proxies don't drop an idle stream
+SSE_KEEPALIVE_SECONDS = 15
+# Bulk feedback: rows per insert, and the largest class accepted in one job
+FEEDBACK_INSERT_BATCH = 50
+FEEDBACK_BULK_MAX_STUDENTS = 500
+
+def _sse(event: str, data: Any) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+def _index_stored(stored: asyncio.Future):
+    """Make a just-stored assessment reusable by this worker without waiting for the bank's refresh."""
+    if not stored.cancelled() and stored.exception() is None:
+        question_bank_service.add_assessment(stored.result())
+
+def _store_assessment(row: Dict[str, Any]) -> asyncio.Future:
+    """Queue an assessments row for the next batched insert; resolves to the stored row."""
+    stored = data_service.insert_later("assessments", row)
+    stored.add_done_callback(_index_stored)
+    return stored
+
+async def _bank_questions(request: AssessmentRequest, current_user: dict) -> List[Dict[str, Any]]:
+    if not request.reuse_questions:
+        return []
+    return await question_bank_service.select(request.subject, request.unit, request.difficulty,
+                                              request.num_questions, current_user["id"] if current_user else None)
+
+def _event_stream(job: Callable[[Callable[[str, Any], None]], Awaitable[Any]], start: Dict[str, Any]) -> StreamingResponse:
+    """
+    Server-Sent Events for a long-running job: a start event with the given data, whatever
+    the job emits as emit(event, data) while it runs, then done with the job's return value,
+    or error {"detail"} if it raised. The job is cancelled if the client goes away.
+    """
+    async def events():
+        queue: asyncio.Queue = asyncio.Queue()
+        task = asyncio.create_task(job(lambda event, data: queue.put_nowait((event, data))))
+        task.add_done_callback(lambda _: queue.put_nowait(None))
+        try:
+            yield _sse("start", start)
+            while True:
+                try:
+                    item = await asyncio.wait_for(queue.get(), SSE_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                if item is None:
+                    break
+                yield _sse(*item)
+            yield _sse("done", task.result())
+        except Exception as e:
+            yield _sse("error", {"detail": str(e)})
+        finally:
+            # Client went away mid-stream: stop paying for tokens nobody will read
+            if not task.done():
+                task.cancel()
+
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+def _assessment_event_stream(generate: Callable[[Callable[[Dict[str, Any]], None]], Awaitable[Dict[str, Any]]],
+                             row: Dict[str, Any], num_questions: int) -> StreamingResponse:
+    """
+    Server-Sent Events for an assessment being generated:
+      start     {"subject", "unit", "num_questions"}
+      question  one validated question, as soon as the model has finished it
+      done      the assembled assessment, after it has been stored (authoritative if
+                the reply needed a retry or fell back to sample questions)
+      error     {"detail"}
+    generate(on_question) runs the AIService call; row is the assessments row minus "data".
+    """
+    async def job(emit: Callable[[str, Any], None]) -> Dict[str, Any]:
+        assessment = await generate(lambda question: emit("question", question))
+        await _store_assessment({**row, "data": assessment})
+        return assessment
+
+    return _event_stream(job, {"subject": row["subject"], "unit": row["unit"], "num_questions": num_questions})
+
+def _feedback_event_stream(students: List[Dict[str, Any]], current_user: dict) -> StreamingResponse:
+    """
+    Server-Sent Events for feedback generated for a whole class:
+      start    {"total_students", "duplicates_skipped"}
+      student  {"student_name", "score", "feedback"} or {"student_name", "score", "error"}, as each finishes
+      stored   {"stored"}: a batch of feedback rows was inserted (running total)
+      done     {"total_students", "generated", "stored", "failed": [{"student_name", "error"}]}
+      error    {"detail"}
+    Rows are inserted FEEDBACK_INSERT_BATCH at a time while generation continues; a student
+    whose row could not be stored is reported in failed.
+    """
+    unique: Dict[str, Dict[str, Any]] = {}
+    for student in students:
+        unique.setdefault(student["student_name"].strip().casefold(), student)
+    teacher_id = current_user["id"] if current_user else None
+    unique_names = [student["student_name"] for student in unique.values()]
+
+    async def job(emit: Callable[[str, Any], None]) -> Dict[str, Any]:
+        pending: List[Dict[str, Any]] = []
+        inserts: List[asyncio.Task] = []
+        failed: List[Dict[str, str]] = []
+        counts = {"generated": 0, "stored": 0}
+        # Names are matched to students while the first prompts are generating
+        resolution = asyncio.create_task(student_service.resolve(unique_names, teacher_id))
+
+        async def insert(rows: List[Dict[str, Any]]):
+            student_ids = await resolution
+            for row in rows:
+                row["student_id"] = student_ids.get(row["student_name"])
+            try:
+                await data_service.insert("feedback", rows)
+            except Exception as e:
+                failed.extend({"student_name": row["student_name"], "error": f"Not stored: {str(e)}"} for row in rows)
+                return
+            counts["stored"] += len(rows)
+            emit("stored", {"stored": counts["stored"]})
+
+        def flush():
+            inserts.append(asyncio.create_task(insert(pending[:])))
+            pending.clear()
+
+        def on_result(student: Dict[str, Any], feedback: Optional[Dict[str, Any]], error: Optional[str]):
+            event = {"student_name": student["student_name"], "score": student["score"]}
+            if error is not None:
+                failed.append({"student_name": student["student_name"], "error": error})
+                emit("student", {**event, "error": error})
+                return
+            counts["generated"] += 1
+            emit("student", {**event, "feedback": feedback})
+            row = {**event, "feedback_data": feedback}
+            if teacher_id:
+                row["teacher_id"] = teacher_id
+            pending.append(row)
+            if len(pending) >= FEEDBACK_INSERT_BATCH:
+                flush()
+
+        try:
+            await ai_service.generate_class_feedback(list(unique.values()), on_result)
+            if pending:
+                flush()
+            await asyncio.gather(*inserts)
+        finally:
+            for task in inserts + [resolution]:
+                task.cancel()
+        return {"total_students": len(unique), "generated": counts["generated"],
+                "stored": counts["stored"], "failed": failed}
+
+    return _event_stream(job, {"total_students": len(unique), "duplicates_skipped": len(students) - len(unique)})
+
 @router.post("/generate-assessment-from-pdf")
 async def generate_assessment_from_pdf(request: MaterialBasedAssessmentRequest, current_user: dict = Depends(get_current_user)) -> Dict[str, Any]:
     """Generate assessment questions based on uploaded PDF content"""
     try:
         # Fetch the study material from database
-        material = supabase_service.get_client().table("study_materials").select("*").eq("id", request.material_id).single().execute()
+        material = await data_service.table("study_materials").select("subject, unit, content_text").eq("id", request.material_id).single().execute()
         
         if not material.data:
             raise HTTPException(status_code=404, detail="Study material not found. Please upload a PDF first using /analyze-syllabus")
@@ -39,7 +190,7 @@ async def generate_assessment_from_pdf(request: MaterialBasedAssessmentRequest,
         if current_user:
             data_to_insert["teacher_id"] = current_user["id"]
             
-        supabase_service.get_client().table("assessments").insert(data_to_insert).execute()
+        _store_assessment(data_to_insert)
         
         return assessment
     except Exception as e:
@@ -52,7 +203,8 @@ async def generate_assessment(request: AssessmentRequest, current_user: dict = D
             request.subject, 
             request.unit, 
             request.difficulty, 
-            request.num_questions
+            request.num_questions,
+            seed_questions=await _bank_questions(request, current_user)
         )
         
         # Store in Supabase
@@ -64,74 +216,123 @@ async def generate_assessment(request: AssessmentRequest, current_user: dict = D
         if current_user:
             data_to_insert["teacher_id"] = current_user["id"]
             
-        supabase_service.get_client().table("assessments").insert(data_to_insert).execute()
+        _store_assessment(data_to_insert)
         
         return assessment
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.post("/generate-assessment/stream")
+async def generate_assessment_stream(request: AssessmentRequest, current_user: dict = Depends(get_current_user)) -> StreamingResponse:
+    """Streaming /generate-assessment: each question is sent as an SSE event as soon as it is generated"""
+    row = {"subject": request.subject, "unit": request.unit}
+    if current_user:
+        row["teacher_id"] = current_user["id"]
+    # Reused questions are the first events, before any LLM call
+    seed_questions = await _bank_questions(request, current_user)
+    return _assessment_event_stream(
+        lambda on_question: ai_service.generate_assessment(
+            request.subject, request.unit, request.difficulty, request.num_questions,
+            on_question=on_question, seed_questions=seed_questions),
+        row, request.num_questions)
+
+@router.post("/generate-assessment-from-pdf/stream")
+async def generate_assessment_from_pdf_stream(request: MaterialBasedAssessmentRequest, current_user: dict = Depends(get_current_user)) -> StreamingResponse:
+    """Streaming /generate-assessment-from-pdf: each question is sent as an SSE event as soon as it is generated"""
+    material = await data_service.table("study_materials").select("subject, unit, content_text").eq("id", request.material_id).limit(1).execute()
+    if not material.data:
+        raise HTTPException(status_code=404, detail="Study material not found. Please upload a PDF first using /analyze-syllabus")
+    material = material.data[0]
+
+    row = {"subject": material["subject"], "unit": material["unit"]}
+    if current_user:
+        row["teacher_id"] = current_user["id"]
+    return _assessment_event_stream(
+        lambda on_question: ai_service.generate_assessment_from_content(
+            content=material["content_text"], subject=material["subject"], unit=material["unit"],
+            difficulty=request.difficulty, num_questions=request.num_questions, on_question=on_question),
+        row, request.num_questions)
+
 @router.post("/generate-feedback")
 async def generate_feedback(request: FeedbackRequest, current_user: dict = Depends(get_current_user)) -> Dict[str, Any]:
     try:
-        feedback = await ai_service.generate_feedback(
-            request.student_name,
-            request.score,
-            request.weak_topics
-        )
+        # The student is looked up while the feedback is generated
+        feedback, student_id = await asyncio.gather(
+            ai_service.generate_feedback(
+                request.student_name,
+                request.score,
+                request.weak_topics
+            ),
+            student_service.resolve_one(request.student_name, current_user["id"] if current_user else None))
         
         # Store in Supabase
         data_to_insert = {
             "student_name": request.student_name,
+            "student_id": student_id,
             "score": request.score,
             "feedback_data": feedback
         }
         if current_user:
             data_to_insert["teacher_id"] = current_user["id"]
             
-        supabase_service.get_client().table("feedback").insert(data_to_insert).execute()
+        data_service.insert_later("feedback", data_to_insert)
         
         return feedback
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.post("/generate-feedback/bulk")
+async def generate_feedback_bulk(request: BulkFeedbackRequest, current_user: dict = Depends(get_current_user)) -> StreamingResponse:
+    """Feedback for every student in the list, streamed as SSE progress events and stored in batches"""
+    if len(request.students) > FEEDBACK_BULK_MAX_STUDENTS:
+        raise HTTPException(status_code=400, detail=f"At most {FEEDBACK_BULK_MAX_STUDENTS} students per request")
+    return _feedback_event_stream([s.model_dump() for s in request.students], current_user)
+
+@router.post("/generate-feedback/bulk-csv")
+async def generate_feedback_bulk_csv(file: UploadFile = File(...), current_user: dict = Depends(get_current_user)) -> StreamingResponse:
+    """Bulk feedback from a marks CSV (student_name, score, optional per-topic score columns)"""
+    if not file.filename.endswith('.csv'):
+        raise HTTPException(status_code=400, detail="Only CSV files are allowed")
+    content = await file.read()
+    try:
+        students = await asyncio.to_thread(parser_service.parse_feedback_csv, content)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Could not read marks CSV: {str(e)}")
+    if not students:
+        raise HTTPException(status_code=400, detail="No students with a score found in the CSV")
+    if len(students) > FEEDBACK_BULK_MAX_STUDENTS:
+        raise HTTPException(status_code=400, detail=f"At most {FEEDBACK_BULK_MAX_STUDENTS} students per request")
+    return _feedback_event_stream(students, current_user)
+
 @router.post("/detect-learning-gaps")
 async def detect_learning_gaps(request: LearningGapRequest, current_user: dict = Depends(get_current_user)) -> Dict[str, Any]:
-    """Cross-references marks with syllabus to identify student struggles"""
+    """Cross-references the caller's latest marks and syllabus analyses for the subject to identify student struggles"""
     try:
-        # 1. Fetch performance summary
-        marks_res = supabase_service.get_client().table("marks_analysis").select("performance_summary").order("created_at", desc=True).limit(1).execute()
-        
-        # 2. Fetch syllabus topics
-        syllabus_res = supabase_service.get_client().table("syllabus_analysis").select("major_topics").order("created_at", desc=True).limit(1).execute()
-        
-        if not marks_res.data or not syllabus_res.data:
-            raise HTTPException(status_code=404, detail="Performance or syllabus data not found. Please analyze both first.")
-        
-        marks_summary = marks_res.data[0]["performance_summary"]
-        topics = syllabus_res.data[0]["major_topics"]
-        
-        # 3. Analyze with AI
-        analysis = await ai_service.detect_learning_gaps(marks_summary, topics)
-        
-        return analysis
-    except HTTPException as e:
-        raise e
+        # Recomputed only when a newer marks or syllabus analysis exists
+        return await learning_gap_service.detect(current_user["id"], request.subject)
+    except LookupError as e:
+        raise HTTPException(status_code=404, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
 @router.get("/my-feedback")
 async def get_my_feedback(current_user: dict = Depends(get_current_user)) -> Dict[str, Any]:
     """Allows authenticated students to fetch their OWN feedback"""
     if current_user["role"] != "student":
          raise HTTPException(status_code=403, detail="This endpoint is for students only.")
          
-    student_name = current_user["email"] # marking the name as 'email' in the token 'sub' field for simplicity
-    
     try:
-        result = supabase_service.get_client().table("feedback").select("*").ilike("student_name", f"%{student_name}%").order("created_at", desc=True).limit(1).execute()
+        # Feedback rows are linked to students.id when they are stored; rows stored before this
+        # student could be resolved (e.g. they registered later) are linked on their first read
+        await data_service.flush("feedback")
+        try:
+            await student_service.claim_unresolved("feedback", current_user["student_id"])
+        except Exception as e:
+            print(f"Linking unresolved feedback failed: {str(e)}")
+        result = await data_service.table("feedback").select("feedback_data").eq("student_id", current_user["student_id"]).order("created_at", desc=True).limit(1).execute()
         
         if not result.data:
-            # Fallback: maybe the token name is slightly different?
-            raise HTTPException(status_code=404, detail=f"No feedback found for you ({student_name}). Please asking your teacher to generate it.")
+            raise HTTPException(status_code=404, detail=f"No feedback found for you ({current_user['email']}). Please ask your teacher to generate it.")
             
         return result.data[0]["feedback_data"]
     except HTTPException as e:
@@ -1,27 +1,28 @@
 from fastapi import APIRouter, UploadFile, File, HTTPException, Depends
-from fastapi.responses import FileResponse
-from services.parser_service import parser_service
-from services.ai_service import ai_service
-from services.supabase_service import supabase_service
-from services.whisper_service import whisper_service
-from services.pdf_service import pdf_service
+from fastapi.responses import FileResponse, StreamingResponse
+from starlette.background import BackgroundTask
+from services.container import parser_service, ai_service, whisper_service, pdf_service
+from services.export_service import export_service, EXPORT_KINDS
+from services.scratch_service import scratch_service, ScratchQuotaExceeded
+from services.student_service import student_service
+from services.data_service import data_service
 from routes.auth import get_current_user
 from models.schemas import SyllabusAnalysisRequest, UploadMaterialRequest
-from typing import Dict, Any
+from typing import Dict, Any, Optional
+from datetime import datetime
 import os
-import shutil
-import tempfile
+import asyncio
 
 router = APIRouter(prefix="/analytics", tags=["Analytics"])
 
 @router.post("/analyze-marks")
-async def analyze_marks(file: UploadFile = File(...), topics_covered: str = "General", current_user: dict = Depends(get_current_user)) -> Dict[str, Any]:
+async def analyze_marks(file: UploadFile = File(...), topics_covered: str = "General", subject: str = "General", current_user: dict = Depends(get_current_user)) -> Dict[str, Any]:
     if not file.filename.endswith('.csv'):
         raise HTTPException(status_code=400, detail="Only CSV files are allowed")
     
     content = await file.read()
     try:
-        avg_score, weak_topics, risk_students, summary = parser_service.parse_marks_csv(content)
+        avg_score, weak_topics, risk_students, summary, topic_scores = await asyncio.to_thread(parser_service.parse_marks_csv, content)
         # Add the context to the summary
         full_context = f"{summary} Topics tested: {topics_covered}"
         ai_analysis = await ai_service.analyze_marks(full_context)
@@ -29,6 +30,7 @@ async def analyze_marks(file: UploadFile = File(...), topics_covered: str = "Gen
         result = {
             "average_score": round(avg_score, 2),
             "weak_topics": weak_topics,
+            "topic_scores": topic_scores,
             "risk_students": risk_students,
             "performance_summary": ai_analysis.get("performance_summary"),
             "strategy": ai_analysis.get("teaching_strategy")
@@ -36,14 +38,17 @@ async def analyze_marks(file: UploadFile = File(...), topics_covered: str = "Gen
         
         # Store in Supabase
         data_to_insert = {
+            "subject": subject,
             "average_score": avg_score,
             "risk_students_count": len(risk_students),
-            "performance_summary": ai_analysis.get("performance_summary")
+            "performance_summary": ai_analysis.get("performance_summary"),
+            "topic_scores": topic_scores
         }
         if current_user:
             data_to_insert["teacher_id"] = current_user["id"]
             
-        supabase_service.get_client().table("marks_analysis").insert(data_to_insert).execute()
+        # Written in the next batch; /detect-learning-gaps flushes it before reading
+        data_service.insert_later("marks_analysis", data_to_insert)
         
         return result
     except Exception as e:
@@ -66,11 +71,11 @@ async def upload_text_material(request: UploadMaterialRequest, content: str, cur
         if current_user:
             material_data["teacher_id"] = current_user["id"]
         
-        material_result = supabase_service.get_client().table("study_materials").insert(material_data).execute()
-        material_id = material_result.data[0]["id"] if material_result.data else None
-        
-        # Analyze with AI
-        ai_analysis = await ai_service.analyze_syllabus(content)
+        # Store the material while the AI analyzes it
+        material_rows, ai_analysis = await asyncio.gather(
+            data_service.insert("study_materials", material_data),
+            ai_service.analyze_syllabus(content))
+        material_id = material_rows[0]["id"] if material_rows else None
         
         return {
             "material_id": material_id,
@@ -88,7 +93,7 @@ async def analyze_syllabus(file: UploadFile = File(...), subject: str = "General
     
     content = await file.read()
     try:
-        text = parser_service.parse_syllabus_pdf(content)
+        text = await asyncio.to_thread(parser_service.parse_syllabus_pdf, content)
         if not text or text.startswith("Warning:"):
             return {
                 "material_id": None,
@@ -111,22 +116,22 @@ async def analyze_syllabus(file: UploadFile = File(...), subject: str = "General
         if current_user:
             material_data["teacher_id"] = current_user["id"]
         
-        material_result = supabase_service.get_client().table("study_materials").insert(material_data).execute()
-        material_id = material_result.data[0]["id"] if material_result.data else None
-        
-        # Analyze with AI
-        ai_analysis = await ai_service.analyze_syllabus(text)
+        # Store the material while the AI analyzes it; only the analysis depends on the model
+        material_rows, ai_analysis = await asyncio.gather(
+            data_service.insert("study_materials", material_data),
+            ai_service.analyze_syllabus(text))
+        material_id = material_rows[0]["id"] if material_rows else None
         
-        # Store analysis
+        # Store analysis after the response (write-behind)
         data_to_insert = {
+            "subject": subject,
             "major_topics": ai_analysis.get("major_topics"),
             "assessment_focus": ai_analysis.get("assessment_focus")
         }
         if current_user:
             data_to_insert["teacher_id"] = current_user["id"]
             
-        supabase_service.get_client().table("syllabus_analysis").insert(data_to_insert).execute()
-        
+        data_service.insert_later("syllabus_analysis", data_to_insert)
         
         return {
             "material_id": material_id,
@@ -143,39 +148,52 @@ async def analyze_syllabus(file: UploadFile = File(...), subject: str = "General
 async def analyze_attendance(file: UploadFile = File(...), subject: str = "General", current_user: dict = Depends(get_current_user)) -> Dict[str, Any]:
     """Analyze attendance CSV or PDF data for trends and student risk"""
     content = await file.read()
+    extraction = None
     
     try:
         if file.filename.endswith('.csv'):
-            attendance_records = parser_service.parse_attendance_csv(content)
+            attendance_records = await asyncio.to_thread(parser_service.parse_attendance_csv, content)
         elif file.filename.endswith('.pdf'):
-            # 1. Extract raw text
-            text = parser_service.parse_syllabus_pdf(content)
-            if not text or text.startswith("Warning:"):
+            # 1. Read tables deterministically; everything else comes back as page-sized text blocks
+            table_records, blocks = await asyncio.to_thread(parser_service.extract_attendance_pdf, content)
+            if not table_records and not blocks:
                 raise HTTPException(status_code=400, detail="Could not extract text from this PDF attendance sheet.")
-            
-            # 2. Parse into structured records via AI
-            print("Parsing PDF attendance with AI...")
-            attendance_records = await ai_service.parse_attendance_text(text)
+
+            # 2. Parse the leftover blocks via AI, several at a time
+            print(f"PDF attendance: {len(table_records)} records from tables, {len(blocks)} text blocks for AI")
+            block_records = await ai_service.parse_attendance_blocks(blocks) if blocks else []
+            attendance_records, dropped = parser_service.merge_attendance_records(table_records, *block_records)
+            extraction = {
+                "table_records": len(table_records),
+                "ai_blocks": len(blocks),
+                "ai_blocks_empty": sum(1 for records in block_records if not records),
+                **dropped,
+            }
         else:
             raise HTTPException(status_code=400, detail="Only CSV and PDF files are allowed")
 
         if not attendance_records:
             raise HTTPException(status_code=400, detail="No attendance records could be extracted from the provided file.")
         
-        # Insert records into DB
-        for record in attendance_records:
-            record["subject"] = subject
-            if current_user:
-                record["teacher_id"] = current_user["id"]
-        
-        supabase_service.get_client().table("attendance").insert(attendance_records).execute()
-        
         # Create a summary for AI
         total_records = len(attendance_records)
         absent_count = len([r for r in attendance_records if r["status"] == "Absent"])
         summary_text = f"Total records analyzed for {subject}: {total_records}. Absences: {absent_count}."
         
-        ai_analysis = await ai_service.analyze_attendance(summary_text)
+        # Insert records into DB, each linked to its student where the name is known
+        teacher_id = current_user["id"] if current_user else None
+        async def store_records() -> Dict[str, Optional[str]]:
+            student_ids = await student_service.resolve((r["student_name"] for r in attendance_records), teacher_id)
+            for record in attendance_records:
+                record["subject"] = subject
+                record["student_id"] = student_ids.get(record["student_name"])
+                if current_user:
+                    record["teacher_id"] = current_user["id"]
+            await data_service.insert("attendance", attendance_records)
+            return student_ids
+        
+        # The AI only needs the counts, so it runs while names are resolved and the rows stored
+        student_ids, ai_analysis = await asyncio.gather(store_records(), ai_service.analyze_attendance(summary_text, total_records, absent_count))
         
         return {
             "total_records": total_records,
@@ -183,6 +201,8 @@ async def analyze_attendance(file: UploadFile = File(...), subject: str = "Gener
             "risk_analysis": ai_analysis.get("risk_analysis"),
             "engagement_score": ai_analysis.get("engagement_score"),
             "suggestions": ai_analysis.get("suggestions"),
+            "extraction": extraction,
+            "unmatched_students": sorted(name for name, student_id in student_ids.items() if student_id is None),
             "message": f"Successfully analyzed {total_records} records from {file.filename}."
         }
     except Exception as e:
@@ -212,13 +232,11 @@ async def lecture_to_pdf(
             detail=f"FORCED UPDATE: Unsupported format '{file_ext}'. Supported: {sorted(list(allowed_extensions))}"
         )
 
-    # 2. Save temporary file
-    temp_dir = tempfile.mkdtemp()
-    temp_audio_path = os.path.join(temp_dir, file.filename)
+    # 2. Save temporary file (per-request scratch dir, removed after the response is sent)
+    scratch = scratch_service.create()
     
     try:
-        with open(temp_audio_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
+        temp_audio_path = scratch_service.save_upload(scratch, file.file, file.filename, size_hint=file.size)
 
         # 3. Transcribe with Whisper
         print(f"Starting transcription for {file.filename}...")
@@ -231,16 +249,9 @@ async def lecture_to_pdf(
         print("Analyzing transcript...")
         structured_notes = await ai_service.analyze_lecture(transcript)
 
-        # 5. Generate PDF
-        print("Generating PDF notes...")
-        pdf_filename = f"Lecture_Notes_{os.path.splitext(file.filename)[0]}.pdf"
-        output_pdf_path = os.path.join(temp_dir, pdf_filename)
-        
-        pdf_service.create_lecture_notes(structured_notes, output_pdf_path)
-
-        # 6. Save to Supabase (Database Storage)
+        # 5. Save to Supabase (Database Storage): queued first, so the insert runs while the PDF renders
         try:
-            supabase_service.get_client().table("lecture_notes").insert({
+            data_service.insert_later("lecture_notes", {
                 "teacher_id": current_user.get("id"), # Assumes teacher is logged in
                 "title": structured_notes.get("title", "Untitled Lecture"),
                 "summary": structured_notes.get("summary"),
@@ -249,27 +260,66 @@ async def lecture_to_pdf(
                 "definitions": structured_notes.get("definitions"),
                 "examples": structured_notes.get("examples"),
                 # "transcript": transcript # Optional: Save raw transcript if needed (can be large)
-            }).execute()
-            print("Lecture notes saved to database.")
+            })
+            print("Lecture notes queued for the database.")
         except Exception as db_error:
             print(f"Database Error (Non-blocking): {str(db_error)}")
 
-        # 6. Return File Response
+        # 6. Generate PDF (off the event loop)
+        print("Generating PDF notes...")
+        pdf_filename = f"Lecture_Notes_{os.path.splitext(file.filename)[0]}.pdf"
+        output_pdf_path = scratch.file_path(pdf_filename)
+        
+        await asyncio.to_thread(pdf_service.create_lecture_notes, structured_notes, output_pdf_path)
+        scratch_service.track_file(scratch, output_pdf_path)
+
+        # 7. Return File Response
         return FileResponse(
             path=output_pdf_path,
             filename=pdf_filename,
-            media_type="application/pdf"
+            media_type="application/pdf",
+            background=BackgroundTask(scratch_service.release, scratch)
         )
 
+    except ScratchQuotaExceeded as e:
+        scratch_service.release(scratch)
+        raise HTTPException(status_code=507, detail=str(e))
     except Exception as e:
+        # The response never reaches FileResponse, so clean up here
+        scratch_service.release(scratch)
         print(f"Error in lecture-to-pdf: {str(e)}")
         if isinstance(e, HTTPException):
             raise e
         raise HTTPException(status_code=500, detail=f"Lecture processing error: {str(e)}")
-    finally:
-        # Note: We don't delete the temp_dir here because FileResponse needs it.
-        # Ideally, use a BackgroundTask to cleanup after sending.
-        pass
+
+@router.get("/export-pdfs")
+async def export_pdfs(
+    kinds: str = "lecture_notes,assessments",
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Download stored lecture notes and assessments as PDFs in a single ZIP.
+    PDFs are rendered in a process pool and streamed as each one finishes.
+    """
+    if current_user.get("role") != "teacher":
+        raise HTTPException(status_code=403, detail="Only teachers can export documents")
+
+    requested = [k.strip() for k in kinds.split(",") if k.strip()]
+    invalid = [k for k in requested if k not in EXPORT_KINDS]
+    if not requested or invalid:
+        raise HTTPException(status_code=400, detail=f"Unsupported export kinds: {invalid}. Supported: {sorted(EXPORT_KINDS)}")
+
+    # Include rows still waiting in this worker's write-behind buffers
+    await data_service.flush(*(EXPORT_KINDS[kind] for kind in requested))
+    rows = export_service.iter_rows(data_service.client(), requested, current_user["id"], start_date, end_date)
+    filename = f"MentorAI_export_{datetime.now().strftime('%Y%m%d_%H%M')}.zip"
+    return StreamingResponse(
+        export_service.stream_zip(rows),
+        media_type="application/zip",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
 
 @router.get("/engagement")
 async def get_engagement(current_user: dict = Depends(get_current_user)) -> Dict[str, Any]:
@@ -279,17 +329,23 @@ async def get_engagement(current_user: dict = Depends(get_current_user)) -> Dict
     """
     try:
         # 1. Fetch recent marks analysis
-        marks_query = supabase_service.get_client().table("marks_analysis") \
-            .select("*") \
+        # Both reads are the teacher's newest rows: served by the (teacher_id, created_at DESC) indexes
+        marks_query = data_service.table("marks_analysis") \
+            .select("average_score, performance_summary") \
+            .eq("teacher_id", current_user["id"]) \
             .order("created_at", desc=True) \
-            .limit(3) \
-            .execute()
+            .limit(3)
         
         # 2. Fetch recent attendance trends
-        attendance_query = supabase_service.get_client().table("attendance") \
+        attendance_query = data_service.table("attendance") \
             .select("status, subject") \
-            .limit(100) \
-            .execute()
+            .eq("teacher_id", current_user["id"]) \
+            .order("created_at", desc=True) \
+            .limit(100)
+        
+        # The two reads are independent: one round trip instead of two
+        await data_service.flush("marks_analysis")
+        marks_query, attendance_query = await data_service.gather(marks_query, attendance_query)
         
         # 3. Build summary for AI
         marks_data = marks_query.data if marks_query.data else []
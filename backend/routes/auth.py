@@ -1,11 +1,14 @@
-from fastapi import APIRouter, HTTPException, Depends, status
+from fastapi import APIRouter, HTTPException, Depends, Request, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials, OAuth2PasswordRequestForm
 from jose import JWTError, jwt
 from services.auth_service import auth_service, SECRET_KEY, ALGORITHM
-from services.supabase_service import supabase_service
+from services.data_service import data_service
+from services.rate_limit_service import rate_limit_service
+from services.student_service import student_service
 from models.schemas import UserRegister, LoginRequest, Token, TokenData, StudentLoginRequest, StudentRegister
 from typing import Optional
 from datetime import timedelta
+import math
 
 router = APIRouter(prefix="/auth", tags=["Authentication"])
 
@@ -38,13 +41,14 @@ async def get_current_user(
         role: str = payload.get("role", "teacher")
         
         if role == "student":
-            return {"email": user_id, "id": "student", "role": "student"}
+            # sub is the students.id; rows about the student are looked up by it
+            return {"email": payload.get("email", user_id), "id": "student", "student_id": user_id, "role": "student"}
 
         if user_id is None:
             raise credentials_exception
         
         # Check if user exists in Supabase
-        user = supabase_service.get_client().table("teachers").select("*").eq("id", user_id).single().execute()
+        user = await data_service.table("teachers").select("id, name, email, subject").eq("id", user_id).single().execute()
         if user.data:
             user_data = user.data
             user_data["role"] = "teacher"
@@ -53,15 +57,34 @@ async def get_current_user(
     except Exception:
         raise credentials_exception
 
+def _enforce_login_rate_limit(request: Request, account: str):
+    """Reject throttled attempts before any database or hashing work"""
+    client_ip = request.client.host if request.client else None
+    allowed, retry_after = rate_limit_service.check_login(client_ip, account)
+    if not allowed:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many login attempts. Please try again later.",
+            headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+        )
+
+async def _rehash_password(table: str, user_id: str, new_hash: str):
+    """Transparently migrate a legacy or outdated hash after a successful login"""
+    try:
+        await data_service.table(table).update({"password_hash": new_hash}).eq("id", user_id).execute()
+    except Exception as e:
+        # Non-blocking: the user can still log in, we just retry the migration next time
+        print(f"Password rehash failed for {table}/{user_id}: {str(e)}")
+
 @router.post("/register", response_model=Token)
 async def register(user_data: UserRegister):
     try:
         # Check if user already exists
-        existing_user = supabase_service.get_client().table("teachers").select("*").eq("email", user_data.email).execute()
+        existing_user = await data_service.table("teachers").select("id").eq("email", user_data.email).execute()
         if existing_user.data:
             raise HTTPException(status_code=400, detail="Email already registered")
         
-        hashed_password = auth_service.get_password_hash(user_data.password)
+        hashed_password = await auth_service.hash_password(user_data.password)
         
         new_user = {
             "name": user_data.name,
@@ -70,7 +93,7 @@ async def register(user_data: UserRegister):
             "subject": user_data.subject
         }
         
-        result = supabase_service.get_client().table("teachers").insert(new_user).execute()
+        result = await data_service.table("teachers").insert(new_user).execute()
         
         if not result.data:
             print(f"Registration failed: {result}")
@@ -88,14 +111,19 @@ async def register(user_data: UserRegister):
         raise HTTPException(status_code=500, detail=f"Registration Error: {str(e)}")
 
 @router.post("/login", response_model=Token)
-async def login(form_data: OAuth2PasswordRequestForm = Depends()):
-    user_res = supabase_service.get_client().table("teachers").select("*").eq("email", form_data.username).execute()
+async def login(request: Request, form_data: OAuth2PasswordRequestForm = Depends()):
+    _enforce_login_rate_limit(request, form_data.username)
+    user_res = await data_service.table("teachers").select("id, email, password_hash").eq("email", form_data.username).execute()
     if not user_res.data:
         raise HTTPException(status_code=400, detail="Incorrect email or password")
     
     user = user_res.data[0]
-    if not auth_service.verify_password(form_data.password, user["password_hash"]):
+    valid, new_hash = await auth_service.verify_and_update_password(form_data.password, user["password_hash"])
+    if not valid:
         raise HTTPException(status_code=400, detail="Incorrect email or password")
+    rate_limit_service.login_succeeded(form_data.username)
+    if new_hash:
+        await _rehash_password("teachers", user["id"], new_hash)
     
     access_token = auth_service.create_access_token(
         data={"sub": str(user["id"]), "email": user["email"], "role": "teacher"}
@@ -106,11 +134,11 @@ async def login(form_data: OAuth2PasswordRequestForm = Depends()):
 async def student_register(user_data: StudentRegister):
     try:
         # Check if student already exists
-        existing_user = supabase_service.get_client().table("students").select("*").eq("email", user_data.email).execute()
+        existing_user = await data_service.table("students").select("id").eq("email", user_data.email).execute()
         if existing_user.data:
             raise HTTPException(status_code=400, detail="Email already registered")
         
-        hashed_password = auth_service.get_password_hash(user_data.password)
+        hashed_password = await auth_service.hash_password(user_data.password)
         
         new_user = {
             "name": user_data.name,
@@ -118,12 +146,13 @@ async def student_register(user_data: StudentRegister):
             "password_hash": hashed_password
         }
         
-        result = supabase_service.get_client().table("students").insert(new_user).execute()
+        result = await data_service.table("students").insert(new_user).execute()
         
         if not result.data:
             raise HTTPException(status_code=500, detail="Failed to create student account")
         
         user = result.data[0]
+        student_service.add_student(user)
         access_token = auth_service.create_access_token(
             data={"sub": str(user["id"]), "email": user["email"], "role": "student"}
         )
@@ -134,16 +163,21 @@ async def student_register(user_data: StudentRegister):
         raise HTTPException(status_code=500, detail=f"Registration Error: {str(e)}")
 
 @router.post("/student-login", response_model=Token)
-async def student_login(request: StudentLoginRequest):
+async def student_login(request: StudentLoginRequest, http_request: Request):
+    _enforce_login_rate_limit(http_request, request.email)
     # Verify student exists in students table
-    user_res = supabase_service.get_client().table("students").select("*").eq("email", request.email).execute()
+    user_res = await data_service.table("students").select("id, email, password_hash").eq("email", request.email).execute()
     
     if not user_res.data:
         raise HTTPException(status_code=400, detail="Incorrect email or password")
         
     user = user_res.data[0]
-    if not auth_service.verify_password(request.password, user["password_hash"]):
+    valid, new_hash = await auth_service.verify_and_update_password(request.password, user["password_hash"])
+    if not valid:
         raise HTTPException(status_code=400, detail="Incorrect email or password")
+    rate_limit_service.login_succeeded(request.email)
+    if new_hash:
+        await _rehash_password("students", user["id"], new_hash)
 
     # Create token with STUDENT role
     access_token = auth_service.create_access_token(data={"sub": str(user["id"]), "email": user["email"], "role": "student"})
@@ -0,0 +1,28 @@
+from fastapi import APIRouter, HTTPException, Depends, Query
+from services.history_service import history_service, HISTORY_KINDS, HISTORY_PAGE_SIZE, HISTORY_MAX_PAGE_SIZE
+from routes.auth import get_current_user
+from typing import Dict, Any, Optional
+
+router = APIRouter(prefix="/history", tags=["History"])
+
+@router.get("/{kind}")
+async def list_history(
+    kind: str,
+    limit: int = Query(HISTORY_PAGE_SIZE, ge=1, le=HISTORY_MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    current_user: dict = Depends(get_current_user)
+) -> Dict[str, Any]:
+    """
+    The teacher's stored assessments, feedback, lecture_notes or study_materials, newest first.
+    Pass next_cursor back as cursor for the following page; it is null on the last one.
+    fields (comma-separated) replaces the default summary columns, e.g. fields=title,data.
+    """
+    if current_user.get("role") != "teacher":
+        raise HTTPException(status_code=403, detail="Only teachers can list stored documents")
+    if kind not in HISTORY_KINDS:
+        raise HTTPException(status_code=404, detail=f"Unknown history kind: {kind}. Supported: {sorted(HISTORY_KINDS)}")
+    try:
+        return await history_service.page(kind, current_user["id"], limit, cursor, fields)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
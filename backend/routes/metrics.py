@@ -0,0 +1,28 @@
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import PlainTextResponse
+from services.metrics_service import metrics_service, stats_collector, METRICS_TOKEN
+from services.rate_limit_service import rate_limit_service
+from services.scratch_service import scratch_service
+from services.question_bank_service import question_bank_service
+from services.learning_gap_service import learning_gap_service
+from services.student_service import student_service
+from services.data_service import data_service
+
+router = APIRouter(tags=["Monitoring"])
+
+# Stats kept by other services are read at scrape time, so they cost nothing per request
+metrics_service.register_collector(stats_collector("login", rate_limit_service.stats, counters=("allowed", "dropped_ip", "dropped_account")))
+metrics_service.register_collector(stats_collector("scratch", scratch_service.stats, counters=("reaped_dirs", "quota_rejections")))
+metrics_service.register_collector(stats_collector("question_bank", question_bank_service.stats, counters=("lookups", "requested", "served")))
+metrics_service.register_collector(stats_collector("learning_gaps", learning_gap_service.stats, counters=("memory_hits", "stored_hits", "computed")))
+metrics_service.register_collector(stats_collector("students", student_service.stats, counters=("lookups", "alias_hits", "resolved", "unresolved")))
+metrics_service.register_collector(stats_collector("write_behind", data_service.stats, counters=("rows_buffered", "batches", "rows_written", "rows_failed")))
+
+@router.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+async def metrics(request: Request):
+    """Prometheus text exposition of this worker's metrics."""
+    if not metrics_service.enabled:
+        raise HTTPException(status_code=404, detail="Metrics are disabled")
+    if METRICS_TOKEN and request.headers.get("Authorization") != f"Bearer {METRICS_TOKEN}":
+        raise HTTPException(status_code=401, detail="Invalid metrics token")
+    return PlainTextResponse(metrics_service.expose(), media_type="text/plain; version=0.0.4; charset=utf-8")
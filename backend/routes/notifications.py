@@ -1,6 +1,7 @@
 from fastapi import APIRouter, HTTPException, Depends
-from services.email_service import email_service
-from services.supabase_service import supabase_service
+from services.container import email_service
+from services.data_service import data_service
+from services.student_service import student_service
 from routes.auth import get_current_user
 from typing import Dict, Any
 from pydantic import BaseModel
@@ -24,42 +25,46 @@ async def send_attendance_alerts(
         raise HTTPException(status_code=403, detail="Only teachers can send attendance alerts")
     
     try:
-        # Fetch all attendance records
-        attendance_data = supabase_service.get_client().table("attendance").select("*").execute()
+        # Fetch this teacher's attendance records
+        attendance_data = await data_service.table("attendance").select("student_id, student_name, status").eq("teacher_id", current_user["id"]).execute()
         
         if not attendance_data.data:
             raise HTTPException(status_code=404, detail="No attendance records found")
         
+        # Rows stored before names were resolved at upload carry only the name
+        legacy_names = {r["student_name"] for r in attendance_data.data if not r.get("student_id")}
+        resolved = await student_service.resolve(legacy_names, current_user["id"]) if legacy_names else {}
+        
         # Calculate attendance for each student
         student_attendance = {}
         for record in attendance_data.data:
-            student_name = record["student_name"]
+            student_id = record.get("student_id") or resolved.get(record["student_name"])
+            if not student_id:
+                continue  # no matching student account to alert
             status = record["status"]
             
-            if student_name not in student_attendance:
-                student_attendance[student_name] = {"total": 0, "present": 0}
+            if student_id not in student_attendance:
+                student_attendance[student_id] = {"total": 0, "present": 0}
             
-            student_attendance[student_name]["total"] += 1
+            student_attendance[student_id]["total"] += 1
             if status == "Present":
-                student_attendance[student_name]["present"] += 1
+                student_attendance[student_id]["present"] += 1
         
         # Identify low-attendance students
+        low_ids = [sid for sid, stats in student_attendance.items() if stats["present"] / stats["total"] * 100 < request.threshold]
+        students = await student_service.get_students(low_ids) if low_ids else {}
         low_attendance_students = []
-        for student_name, stats in student_attendance.items():
-            attendance_percentage = (stats["present"] / stats["total"]) * 100
-            
-            if attendance_percentage < request.threshold:
-                # Try to find student email
-                student_record = supabase_service.get_client().table("students").select("email, name").ilike("name", f"%{student_name}%").limit(1).execute()
-                
-                if student_record.data:
-                    low_attendance_students.append({
-                        "name": student_record.data[0]["name"],
-                        "email": student_record.data[0]["email"],
-                        "attendance_percentage": attendance_percentage,
-                        "total_classes": stats["total"],
-                        "attended_classes": stats["present"]
-                    })
+        for student_id in low_ids:
+            if student_id not in students:
+                continue
+            stats = student_attendance[student_id]
+            low_attendance_students.append({
+                "name": students[student_id]["name"],
+                "email": students[student_id]["email"],
+                "attendance_percentage": (stats["present"] / stats["total"]) * 100,
+                "total_classes": stats["total"],
+                "attended_classes": stats["present"]
+            })
         
         if not low_attendance_students:
             return {
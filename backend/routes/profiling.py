@@ -0,0 +1,42 @@
+from fastapi import APIRouter, HTTPException, Header, Depends
+from fastapi.responses import PlainTextResponse
+from services.profiling_service import profiling_service, ADMIN_PATH_PREFIX
+from typing import Any, Dict, Optional
+import os
+
+def require_profiling_admin(x_profile_token: Optional[str] = Header(None)):
+    """Profiling endpoints are invisible unless enabled, and need the admin token"""
+    if not profiling_service.enabled:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not profiling_service.authorized(x_profile_token):
+        raise HTTPException(status_code=403, detail="Invalid profiling token")
+
+router = APIRouter(prefix=ADMIN_PATH_PREFIX, tags=["Admin"], dependencies=[Depends(require_profiling_admin)])
+
+@router.post("/window")
+async def start_window(seconds: int = 30) -> Dict[str, Any]:
+    """
+    Sample every thread of the worker that serves this request for `seconds`.
+    With several uvicorn workers, repeat the call until each worker you care about is covered.
+    """
+    profile_id = profiling_service.start_window(seconds)
+    if profile_id is None:
+        raise HTTPException(status_code=409, detail="This worker is already profiling")
+    return {
+        "profile_id": profile_id,
+        "pid": os.getpid(),
+        "seconds": seconds,
+        "message": f"Fetch /admin/profiling/profiles/{profile_id} once the window has elapsed."
+    }
+
+@router.get("/profiles")
+async def list_profiles() -> Dict[str, Any]:
+    return {"active_on_this_worker": profiling_service.active, "profiles": profiling_service.list_profiles()}
+
+@router.get("/profiles/{profile_id}", response_class=PlainTextResponse)
+async def get_profile(profile_id: str):
+    """Collapsed stacks: pipe into flamegraph.pl or open in speedscope."""
+    profile = profiling_service.read_profile(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Profile not found (it may still be running)")
+    return PlainTextResponse(profile, headers={"Content-Disposition": f'attachment; filename="{profile_id}.collapsed"'})
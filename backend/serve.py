@@ -0,0 +1,137 @@
+"""
+Production entry point for the MentorAI services.
+
+    python serve.py api                  # MentorAI API, one worker per CPU
+    python serve.py whisper              # Whisper ASR microservice
+    python serve.py api --workers 4 --port 8080
+
+`python main.py` remains the development server (single process, auto-reload).
+Every setting can also be given as <PREFIX>_<NAME> in the environment or .env,
+e.g. API_WORKERS=8 or WHISPER_MAX_REQUESTS=100.
+"""
+import argparse
+import importlib.util
+import os
+
+from dotenv import load_dotenv
+
+CPU_COUNT = os.cpu_count() or 1
+
+SERVER_CONFIGS = {
+    "api": {
+        "env_prefix": "API",
+        "app": "main:app",
+        "host": "0.0.0.0",
+        "port": 8000,
+        # Route handlers run pandas/pdfplumber/FPDF work in-process, so scale with cores
+        "workers": CPU_COUNT,
+        "max_requests": 2000,
+        "max_requests_jitter": 200,
+        "graceful_timeout": 30,
+        "keep_alive": 5,
+        "backlog": 2048,
+    },
+    "whisper": {
+        "env_prefix": "WHISPER",
+        "app": "whisper_server:app",
+        "host": "0.0.0.0",
+        "port": 9000,
+        # Every worker loads its own copy of the model and transcription already uses all cores
+        "workers": 1,
+        "max_requests": 500,
+        "max_requests_jitter": 50,
+        # Long audio files can take minutes to transcribe
+        "graceful_timeout": 300,
+        "keep_alive": 5,
+        "backlog": 128,
+    },
+}
+
+INT_SETTINGS = ("port", "workers", "max_requests", "max_requests_jitter", "graceful_timeout", "keep_alive", "backlog")
+
+
+def load_config(service: str) -> dict:
+    """Defaults for the service, overridden by <PREFIX>_<SETTING> environment variables."""
+    config = dict(SERVER_CONFIGS[service])
+    prefix = config.pop("env_prefix")
+    for key, default in config.items():
+        value = os.environ.get(f"{prefix}_{key.upper()}")
+        if value is not None:
+            config[key] = int(value) if key in INT_SETTINGS else value
+        else:
+            config[key] = default
+    return config
+
+
+def size_worker_pools(workers: int):
+    """
+    Split the per-process pools across uvicorn workers so N workers don't each
+    start cpu_count export processes and hashing threads, or each fill the whole
+    scratch quota. Explicit settings win.
+    """
+    if workers <= 1:
+        return
+    per_worker = max(1, CPU_COUNT // workers)
+    os.environ.setdefault("EXPORT_WORKERS", str(per_worker))
+    os.environ.setdefault("PASSWORD_HASH_WORKERS", str(min(4, per_worker)))
+    scratch_quota_mb = int(os.environ.get("SCRATCH_QUOTA_MB", 2048))
+    os.environ.setdefault("SCRATCH_WORKER_QUOTA_MB", str(max(1, scratch_quota_mb // workers)))
+
+
+def describe_event_loop() -> str:
+    loop = "uvloop" if importlib.util.find_spec("uvloop") else "asyncio"
+    http = "httptools" if importlib.util.find_spec("httptools") else "h11"
+    return f"{loop}/{http}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a MentorAI service with production settings")
+    parser.add_argument("service", choices=sorted(SERVER_CONFIGS))
+    parser.add_argument("--app", help="override the ASGI app import string (e.g. for load tests)")
+    parser.add_argument("--host")
+    parser.add_argument("--port", type=int)
+    parser.add_argument("--workers", type=int)
+    parser.add_argument("--max-requests", type=int, help="recycle a worker after this many requests (0 disables)")
+    args = parser.parse_args()
+
+    # Workers inherit this environment, so .env must be loaded before it is adjusted
+    load_dotenv()
+    config = load_config(args.service)
+    for key in ("app", "host", "port", "workers", "max_requests"):
+        if getattr(args, key) is not None:
+            config[key] = getattr(args, key)
+    config["workers"] = max(1, config["workers"])
+
+    if args.service == "api":
+        size_worker_pools(config["workers"])
+        if config["workers"] > 1 and not os.environ.get("RATE_LIMIT_REDIS_URL"):
+            print("⚠️  RATE_LIMIT_REDIS_URL is not set: each worker keeps its own login buckets, "
+                  f"so the effective limits are {config['workers']}x the configured ones.")
+
+    print(f"🚀 Starting {args.service} ({config['app']}) on {config['host']}:{config['port']} "
+          f"with {config['workers']} worker(s), {describe_event_loop()}, "
+          f"recycling every {config['max_requests'] or '∞'} requests")
+
+    import uvicorn
+    uvicorn.run(
+        config["app"],
+        host=config["host"],
+        port=config["port"],
+        workers=config["workers"],
+        # "auto" picks uvloop and httptools when installed (uvicorn[standard])
+        loop="auto",
+        http="auto",
+        reload=False,
+        proxy_headers=True,
+        backlog=config["backlog"],
+        timeout_keep_alive=config["keep_alive"],
+        timeout_graceful_shutdown=config["graceful_timeout"],
+        # Bound memory creep from long-lived workers; jitter keeps them from restarting together
+        limit_max_requests=config["max_requests"] or None,
+        limit_max_requests_jitter=config["max_requests_jitter"],
+        access_log=os.environ.get("ACCESS_LOG", "true").lower() == "true",
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,64 +1,292 @@
 import os
-import json
-from groq import Groq
-from dotenv import load_dotenv
-from typing import List, Dict, Any
+import time
+import asyncio
+from typing import List, Dict, Any, Callable, Optional, Type, Union
+from pydantic import BaseModel
+from services.container import container
+from services.metrics_service import metrics_service
+from services.prompt_service import PromptBuilder, BuiltPrompt
+from services.response_service import LLMResponseError, StreamingJSONParser, parse_response
+from services.question_service import QuestionCollector, shard_plan
+from services.routing_service import (
+    ModelRouter, ModelTier, DEFAULT, FAST, LOCAL, LLM_MODEL, LLM_FAST_MODEL, LLM_FAST_BASE_URL, LLM_FAST_API_KEY,
+)
+from services.template_service import attendance_analysis, feedback, learning_gap_advice
+from models.schemas import (
+    MarksAnalysisResponse, AssessmentResponse, FeedbackResponse, SyllabusAnalysisResponse,
+    AttendanceAnalysisResponse, LectureNotesResponse, LearningGapAnalysisResponse,
+    AttendanceRecordsResponse, EngagementResponse, FeedbackBatchResponse,
+)
 
-load_dotenv()
+# Concurrent Groq calls when one upload is extracted block by block
+ATTENDANCE_LLM_CONCURRENCY = int(os.environ.get("ATTENDANCE_LLM_CONCURRENCY", 4))
+# Stream structured replies and scan them as they arrive. Groq doesn't combine JSON mode with
+# streaming, so streamed replies are checked by local repair and validation instead.
+LLM_STREAM_RESPONSES = os.environ.get("LLM_STREAM_RESPONSES", "true").lower() == "true"
+# Extra round trips allowed for a reply that local repair can't make valid
+LLM_REPAIR_RETRIES = int(os.environ.get("LLM_REPAIR_RETRIES", 1))
+# Assessments above ASSESSMENT_SHARD_SIZE questions are generated as concurrent sub-requests
+ASSESSMENT_SHARD_SIZE = int(os.environ.get("ASSESSMENT_SHARD_SIZE", 10))
+ASSESSMENT_SHARD_CONCURRENCY = int(os.environ.get("ASSESSMENT_SHARD_CONCURRENCY", 5))
+# Bulk feedback packs several students into one prompt (fewer if their answers wouldn't fit the
+# completion budget) and keeps FEEDBACK_CONCURRENCY prompts in flight
+FEEDBACK_STUDENTS_PER_PROMPT = int(os.environ.get("FEEDBACK_STUDENTS_PER_PROMPT", 5))
+FEEDBACK_CONCURRENCY = int(os.environ.get("FEEDBACK_CONCURRENCY", 4))
+# Completion tokens reserved for one student's feedback
+FEEDBACK_OUTPUT_TOKENS = 600
 
+@metrics_service.instrument("ai_service")
 class AIService:
     def __init__(self):
         api_key = os.environ.get("GROQ_API_KEY")
         if not api_key:
             raise ValueError("GROQ_API_KEY must be set")
-        self.client = Groq(api_key=api_key)
-        self.model = "llama-3.3-70b-versatile"
-
-    async def generate_completion(self, prompt: str, system_prompt: str = "You are a helpful teaching assistant.") -> str:
-        completion = self.client.chat.completions.create(
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": prompt},
-            ],
-            model=self.model,
-            response_format={"type": "json_object"}
-        )
+        from groq import AsyncGroq  # Deferred: the Groq SDK is slow to import
+        # Async client: a completion no longer blocks the event loop, so calls can overlap
+        self.client = AsyncGroq(api_key=api_key)
+        self.model = LLM_MODEL
+        # The fast tier shares the Groq client unless it has an endpoint of its own
+        fast_client = AsyncGroq(api_key=LLM_FAST_API_KEY or api_key, base_url=LLM_FAST_BASE_URL) \
+            if LLM_FAST_BASE_URL else self.client
+        self.router = ModelRouter({DEFAULT: ModelTier(DEFAULT, self.model, self.client),
+                                   FAST: ModelTier(FAST, LLM_FAST_MODEL, fast_client)})
+
+    def _prompts(self, purpose: str) -> PromptBuilder:
+        """Prompt builder sized for the model that will answer purpose."""
+        return self.router.hosted(purpose).prompts
+
+    async def generate_completion(self, prompt: Union[str, BuiltPrompt], system_prompt: str = "You are a helpful teaching assistant.",
+                                  purpose: str = "completion") -> str:
+        """
+        Run one JSON-mode chat completion. Pass a BuiltPrompt from self._prompts(purpose).build() to get
+        budgeted content and a matching max_tokens; plain strings are sent as-is.
+        """
+        built = prompt if isinstance(prompt, BuiltPrompt) else \
+            self._prompts(purpose).build(lambda _: prompt, system_prompt=system_prompt)
+        tier = self.router.hosted(purpose)
+        start = time.perf_counter()
+        outcome = "error"
+        try:
+            text = await self._complete(tier, built, built.messages(), purpose)
+            outcome = "ok"
+            return text
+        finally:
+            self._record_call(purpose, tier.name, start, outcome)
+
+    async def complete_json(self, prompt: BuiltPrompt, response_model: Type[BaseModel], purpose: str,
+                            array_key: Optional[str] = None,
+                            on_item: Optional[Callable[[Any], None]] = None,
+                            local: Optional[Callable[[], Optional[Dict[str, Any]]]] = None) -> Dict[str, Any]:
+        """
+        Get a reply validated against response_model, as a dict, from the tier purpose is routed
+        to. When that is the local tier, local() answers without a model call; if it returns
+        None the call goes to the fast model instead. Model replies are streamed and scanned as
+        they arrive: on_item receives each element of the top-level array_key list as soon as it
+        is complete. Malformed JSON is repaired locally; only a reply that still doesn't
+        validate is re-prompted, at most LLM_REPAIR_RETRIES times, before LLMResponseError is raised.
+        """
+        start = time.perf_counter()
+        if local is not None and self.router.route(purpose) == LOCAL:
+            data = local()
+            if data is not None:
+                data = response_model.model_validate(data).model_dump(exclude_none=True)
+                self._record_call(purpose, LOCAL, start, "ok")
+                return data
+        tier = self.router.hosted(purpose)
+        outcome = "error"
+        try:
+            data = await self._complete_json(tier, prompt, response_model, purpose, array_key, on_item)
+            outcome = "ok"
+            return data
+        finally:
+            self._record_call(purpose, tier.name, start, outcome)
+
+    async def _complete_json(self, tier: ModelTier, prompt: BuiltPrompt, response_model: Type[BaseModel], purpose: str,
+                             array_key: Optional[str], on_item: Optional[Callable[[Any], None]]) -> Dict[str, Any]:
+        messages = prompt.messages()
+        for attempt in range(max(0, LLM_REPAIR_RETRIES) + 1):
+            if LLM_STREAM_RESPONSES or on_item:
+                parser = StreamingJSONParser(array_key)
+                # Items already handed out aren't replayed on a retry; the final dict is authoritative
+                emit = on_item if attempt == 0 else None
+                raw = await self._stream(tier, prompt, messages, purpose, parser, emit)
+            else:
+                raw = await self._complete(tier, prompt, messages, purpose)
+            try:
+                data, repaired = parse_response(raw, response_model)
+            except LLMResponseError as e:
+                print(f"LLM {purpose}: unusable reply (attempt {attempt + 1}): {e}")
+                # Same prompt plus what went wrong; the broken reply itself isn't sent back
+                messages = prompt.messages() + [{"role": "user", "content": (
+                    f"A previous reply to this request could not be used: {e}. "
+                    "Reply with only the complete JSON object in the requested format.")}]
+                error = e
+                continue
+            outcome = "reprompted" if attempt else "repaired" if repaired else "clean"
+            metrics_service.record_llm_response(purpose, outcome)
+            return data
+        metrics_service.record_llm_response(purpose, "failed")
+        raise error
+
+    async def _complete(self, tier: ModelTier, built: BuiltPrompt, messages: List[Dict[str, str]], purpose: str) -> str:
+        try:
+            completion = await tier.client.chat.completions.create(
+                messages=messages,
+                model=tier.model,
+                max_tokens=built.max_output_tokens,
+                response_format={"type": "json_object"}
+            )
+        except Exception as e:
+            # JSON mode rejects invalid output with a 400 that still carries the generation;
+            # local repair usually rescues it without another round trip
+            failed = self._failed_generation(e)
+            if failed is None:
+                raise
+            self._report_usage(purpose, tier, built, None)
+            return failed
+        self._report_usage(purpose, tier, built, getattr(completion, "usage", None))
         return completion.choices[0].message.content
 
+    async def _stream(self, tier: ModelTier, built: BuiltPrompt, messages: List[Dict[str, str]], purpose: str,
+                      parser: StreamingJSONParser, on_item: Optional[Callable[[Any], None]]) -> str:
+        stream = await tier.client.chat.completions.create(
+            messages=messages,
+            model=tier.model,
+            max_tokens=built.max_output_tokens,
+            stream=True
+        )
+        usage = None
+        async for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                for item in parser.feed(chunk.choices[0].delta.content):
+                    if on_item:
+                        on_item(item)
+            # Groq reports usage on the last chunk under x_groq, other OpenAI-compatible servers as usage
+            usage = getattr(getattr(chunk, "x_groq", None), "usage", None) or getattr(chunk, "usage", None) or usage
+        self._report_usage(purpose, tier, built, usage)
+        return parser.text
+
+    @staticmethod
+    def _failed_generation(error: Exception) -> Optional[str]:
+        body = getattr(error, "body", None)
+        if not isinstance(body, dict):
+            return None
+        details = body.get("error", body)
+        if isinstance(details, dict) and details.get("code") == "json_validate_failed":
+            return details.get("failed_generation")
+        return None
+
+    async def _generate_questions(self, build: Callable[[int, str], BuiltPrompt], num_questions: int, purpose: str,
+                                  on_question: Optional[Callable[[Dict[str, Any]], None]] = None,
+                                  seed_questions: Optional[List[Dict[str, Any]]] = None) -> Dict[str, Any]:
+        """
+        Generate num_questions questions with build(count, focus) prompts. seed_questions (e.g. from
+        the question bank) are taken first and only the shortfall is generated. Large requests are
+        split into shards (see shard_plan) run ASSESSMENT_SHARD_CONCURRENCY at a time; questions
+        from all sources are deduplicated and numbered in arrival order, which is also the order
+        on_question sees them. Returns the first reply's top-level fields with the merged questions.
+        """
+        collector = QuestionCollector(num_questions, on_question)
+        for question in seed_questions or []:
+            collector.offer(question)
+        reused = len(collector.questions)
+        remaining = num_questions - reused
+        plan = shard_plan(remaining, ASSESSMENT_SHARD_SIZE) if remaining > 0 else []
+        # Shards can overlap each other and generated questions can repeat seeded ones
+        overlap = len(plan) > 1 or reused > 0
+        semaphore = asyncio.Semaphore(ASSESSMENT_SHARD_CONCURRENCY)
+
+        async def run_shard(count: int, focus: str) -> Dict[str, Any]:
+            # ...so when that can happen each reply asks for ~20% more than its share
+            count = count + -(-count // 5) if overlap else count
+            async with semaphore:
+                reply = await self.complete_json(build(count, focus), AssessmentResponse, purpose=purpose,
+                                                 array_key="questions", on_item=collector.offer)
+            # Questions the stream scanner couldn't hand out early (e.g. repaired at the end)
+            for question in reply["questions"]:
+                collector.offer(question)
+            return reply
+
+        results = await asyncio.gather(*(run_shard(s["count"], s["focus"]) for s in plan), return_exceptions=True)
+        if not plan:
+            return {"questions": collector.questions, "total_questions": len(collector.questions),
+                    "question_sources": {"bank": reused, "generated": 0}}
+        replies = [r for r in results if isinstance(r, dict)]
+        if not collector.full and replies and overlap:
+            # Deduplication left the paper short: one more request for the rest
+            shortfall = num_questions - len(collector.questions)
+            try:
+                await run_shard(shortfall, "")
+            except Exception as e:
+                print(f"LLM {purpose}: top-up for {shortfall} questions failed: {str(e)}")
+        if not collector.questions:
+            errors = [r for r in results if isinstance(r, BaseException)]
+            raise errors[0] if errors else LLMResponseError("No usable questions in any reply", "")
+        if overlap or reused:
+            print(f"LLM {purpose}: {len(collector.questions)}/{num_questions} questions, {reused} reused, "
+                  f"{len(plan)} shards, {collector.duplicates} near-duplicates dropped")
+
+        assessment = {k: v for k, v in replies[0].items() if k != "questions"} if replies else {}
+        assessment["questions"] = collector.questions
+        assessment["total_questions"] = len(collector.questions)
+        assessment["question_sources"] = {"bank": reused, "generated": len(collector.questions) - reused}
+        return assessment
+
+    def _report_usage(self, purpose: str, tier: ModelTier, built: BuiltPrompt, usage: Any):
+        prompt_tokens = getattr(usage, "prompt_tokens", None)
+        completion_tokens = getattr(usage, "completion_tokens", None)
+        metrics_service.record_llm_usage(purpose, tier.name, built.prompt_tokens, prompt_tokens, completion_tokens,
+                                         built.truncated)
+        self.router.record_tokens(purpose, tier.name, prompt_tokens, completion_tokens)
+        note = f" (content cut from ~{built.content_tokens} to {built.content_budget} tokens)" if built.truncated else ""
+        print(f"LLM {purpose} [{tier.model}]: ~{built.prompt_tokens} prompt tokens estimated, "
+              f"{prompt_tokens} billed, {completion_tokens}/{built.max_output_tokens} completion{note}")
+
+    def _record_call(self, purpose: str, tier: str, start: float, outcome: str):
+        seconds = time.perf_counter() - start
+        metrics_service.observe_llm_call(purpose, tier, seconds, outcome)
+        self.router.record_call(purpose, tier, seconds)
+
     async def analyze_marks(self, marks_summary: str) -> Dict[str, Any]:
-        prompt = f"""
+        prompt = self._prompts("analyze_marks").build(lambda summary: f"""
         Analyze the following student marks summary and provide:
         1. Performance summary
         2. Teaching strategy suggestions
         
         Summary Data:
-        {marks_summary}
+        {summary}
         
         Return JSON format:
         {{
             "performance_summary": "...",
             "teaching_strategy": "..."
         }}
-        """
-        response = await self.generate_completion(prompt)
-        return json.loads(response)
+        """, content=marks_summary, system_prompt="You are a helpful teaching assistant.", output_tokens=600)
+        return await self.complete_json(prompt, MarksAnalysisResponse, purpose="analyze_marks")
 
-    async def generate_assessment(self, subject: str, unit: str, difficulty: str, num_questions: int) -> Dict[str, Any]:
-        prompt = f"""
+    async def generate_assessment(self, subject: str, unit: str, difficulty: str, num_questions: int,
+                                  on_question: Optional[Callable[[Dict[str, Any]], None]] = None,
+                                  seed_questions: Optional[List[Dict[str, Any]]] = None) -> Dict[str, Any]:
+        """
+        on_question, if given, receives each validated question as soon as it has been generated.
+        seed_questions are used first; only the shortfall is generated.
+        """
+        build = lambda count, focus: self._prompts("generate_assessment").build(lambda _: f"""
 You are an expert teacher creating an assessment.
 
-Generate {num_questions} questions for:
+Generate {count} questions for:
 - Subject: {subject}
 - Unit/Topic: {unit}
 - Difficulty Level: {difficulty}
 
 Create a mix of Multiple Choice Questions (MCQs) and Short Answer questions.
 For each question, include a Bloom's Taxonomy level (Remember, Understand, Apply, Analyze, Evaluate, Create).
+{focus}
 
 Return ONLY valid JSON in this exact format:
 {{
   "assessment_title": "{subject} - {unit} Assessment",
-  "total_questions": {num_questions},
+  "total_questions": {count},
   "questions": [
     {{
       "question_number": 1,
@@ -78,41 +306,41 @@ Return ONLY valid JSON in this exact format:
     }}
   ]
 }}
-        """
+        """, system_prompt="You are an expert teacher. Return only valid JSON, no additional text.",
+            output_tokens=self._assessment_output_tokens(count))
         try:
-            response = await self.generate_completion(prompt, system_prompt="You are an expert teacher. Return only valid JSON, no additional text.")
-            return json.loads(response)
-        except json.JSONDecodeError as e:
+            assessment = await self._generate_questions(build, num_questions, "generate_assessment", on_question, seed_questions)
+            assessment.setdefault("assessment_title", f"{subject} - {unit} Assessment")
+            assessment["difficulty"] = difficulty
+            return assessment
+        except LLMResponseError:
             # Fallback: return a simple structure if AI fails
-            return {{
+            return {
                 "assessment_title": f"{subject} - {unit} Assessment",
                 "total_questions": num_questions,
                 "questions": [
-                    {{
+                    {
                         "question_number": i+1,
                         "question_text": f"Sample question {i+1} for {unit}",
                         "question_type": "MCQ" if i % 2 == 0 else "Short Answer",
                         "bloom_level": "Apply",
                         "marks": 2
-                    }} for i in range(num_questions)
+                    } for i in range(num_questions)
                 ],
                 "note": "AI generation failed, showing sample structure"
-            }}
+            }
 
-    async def generate_assessment_from_content(self, content: str, subject: str, unit: str, difficulty: str, num_questions: int) -> Dict[str, Any]:
+    async def generate_assessment_from_content(self, content: str, subject: str, unit: str, difficulty: str, num_questions: int,
+                                               on_question: Optional[Callable[[Dict[str, Any]], None]] = None) -> Dict[str, Any]:
         """Generate assessment questions based on actual PDF content"""
-        # Truncate content if too long (keep first 3000 words to stay within token limits)
-        words = content.split()
-        if len(words) > 3000:
-            content = " ".join(words[:3000]) + "... [content truncated]"
-        
-        prompt = f"""
+        # The study material gets whatever the budget leaves after the instructions and the reserved answer
+        build = lambda count, focus: self._prompts("generate_assessment_from_content").build(lambda material: f"""
 You are an expert teacher creating an assessment based on the following study material.
 
 STUDY MATERIAL:
-{content}
+{material}
 
-Based ONLY on the content above, generate {num_questions} questions for:
+Based ONLY on the content above, generate {count} questions for:
 - Subject: {subject}
 - Unit/Topic: {unit}
 - Difficulty Level: {difficulty}
@@ -122,11 +350,12 @@ Do NOT create generic questions - use actual facts, concepts, and examples from
 
 Create a mix of Multiple Choice Questions (MCQs) and Short Answer questions.
 For each question, include a Bloom's Taxonomy level.
+{focus}
 
 Return ONLY valid JSON in this exact format:
 {{
   "assessment_title": "{subject} - {unit} Assessment",
-  "total_questions": {num_questions},
+  "total_questions": {count},
   "source": "Generated from uploaded PDF content",
   "questions": [
     {{
@@ -140,29 +369,33 @@ Return ONLY valid JSON in this exact format:
     }}
   ]
 }}
-        """
+        """, content=content,
+            system_prompt="You are an expert teacher. Generate questions from the provided content only. Return only valid JSON.",
+            output_tokens=self._assessment_output_tokens(count))
         try:
-            response = await self.generate_completion(prompt, system_prompt="You are an expert teacher. Generate questions from the provided content only. Return only valid JSON.")
-            return json.loads(response)
-        except json.JSONDecodeError:
-            return {{
+            assessment = await self._generate_questions(build, num_questions, "generate_assessment_from_content", on_question)
+            assessment.setdefault("assessment_title", f"{subject} - {unit} Assessment")
+            assessment["difficulty"] = difficulty
+            return assessment
+        except LLMResponseError:
+            return {
                 "assessment_title": f"{subject} - {unit} Assessment",
                 "total_questions": num_questions,
                 "source": "PDF content",
                 "questions": [
-                    {{
+                    {
                         "question_number": i+1,
                         "question_text": f"Question {i+1} based on {unit} material",
                         "question_type": "Short Answer",
                         "bloom_level": "Apply",
                         "marks": 3
-                    }} for i in range(num_questions)
+                    } for i in range(num_questions)
                 ],
                 "note": "AI generation failed, showing sample structure"
-            }}
+            }
 
     async def generate_feedback(self, student_name: str, score: float, weak_topics: List[str]) -> Dict[str, Any]:
-        prompt = f"""
+        prompt = self._prompts("generate_feedback").build(lambda _: f"""
         Generate personalized feedback for:
         Student: {student_name}
         Score: {score}
@@ -181,32 +414,108 @@ Return ONLY valid JSON in this exact format:
             "improvement_plan": "...",
             "motivational_message": "..."
         }}
+        """, system_prompt="You are a helpful teaching assistant.", output_tokens=FEEDBACK_OUTPUT_TOKENS)
+        return await self.complete_json(prompt, FeedbackResponse, purpose="generate_feedback",
+                                        local=lambda: feedback(student_name, score, weak_topics))
+
+    async def generate_feedback_batch(self, students: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
         """
-        response = await self.generate_completion(prompt)
-        return json.loads(response)
+        Feedback for several students from one prompt, keyed by casefolded student name.
+        Students the reply leaves out are missing from the result.
+        """
+        roster = "\n".join(
+            f"        - Student: {s['student_name']} | Score: {s['score']} | Weak Topics: {', '.join(s['weak_topics']) or 'None identified'}"
+            for s in students)
+        prompt = self._prompts("generate_feedback_batch").build(lambda _: f"""
+        Generate personalized feedback for each of the following students:
+{roster}
+        
+        For every student include:
+        - Strengths
+        - Weak Areas
+        - Improvement Plan
+        - Motivational message
+        
+        Return JSON format, one entry per student in the order given:
+        {{
+            "feedback": [
+                {{
+                    "student_name": "...",
+                    "strengths": "...",
+                    "weak_areas": "...",
+                    "improvement_plan": "...",
+                    "motivational_message": "..."
+                }}
+            ]
+        }}
+        """, system_prompt="You are a helpful teaching assistant.", output_tokens=FEEDBACK_OUTPUT_TOKENS * len(students))
+        reply = await self.complete_json(prompt, FeedbackBatchResponse, purpose="generate_feedback_batch")
+        return {entry.pop("student_name").strip().casefold(): entry for entry in reply["feedback"]}
+
+    async def generate_class_feedback(self, students: List[Dict[str, Any]],
+                                      on_result: Callable[[Dict[str, Any], Optional[Dict[str, Any]], Optional[str]], None]):
+        """
+        Feedback for a whole class. Students go to generate_feedback_batch in packs with at most
+        FEEDBACK_CONCURRENCY prompts in flight; anyone a packed reply leaves out, or whose pack
+        failed, is retried on their own. on_result(student, feedback, error) is called once per
+        student as results arrive, with exactly one of feedback and error set.
+        """
+        # Packing only saves model calls; feedback from the local tier comes one student at a time
+        size = 1 if self.router.route("generate_feedback") == LOCAL else self._feedback_pack_size()
+        semaphore = asyncio.Semaphore(FEEDBACK_CONCURRENCY)
+
+        async def single(student: Dict[str, Any]):
+            try:
+                async with semaphore:
+                    feedback = await self.generate_feedback(student["student_name"], student["score"], student["weak_topics"])
+            except Exception as e:
+                on_result(student, None, str(e))
+                return
+            on_result(student, feedback, None)
+
+        async def pack(group: List[Dict[str, Any]]):
+            if len(group) == 1:
+                return await single(group[0])
+            try:
+                async with semaphore:
+                    replies = await self.generate_feedback_batch(group)
+            except Exception as e:
+                print(f"LLM generate_feedback_batch: pack of {len(group)} failed, retrying one by one: {str(e)}")
+                replies = {}
+            missing = []
+            for student in group:
+                feedback = replies.get(student["student_name"].strip().casefold())
+                if feedback is None:
+                    missing.append(student)
+                else:
+                    on_result(student, feedback, None)
+            await asyncio.gather(*(single(student) for student in missing))
+
+        await asyncio.gather(*(pack(students[i:i + size]) for i in range(0, len(students), size)))
 
     async def analyze_syllabus(self, text: str) -> Dict[str, Any]:
-        prompt = f"""
+        prompt = self._prompts("analyze_syllabus").build(lambda syllabus: f"""
         Analyze the following syllabus text:
         1. Extract major topics
         2. Suggest assessment focus areas
         
         Text:
-        {text[:4000]} # Truncate for token limits if necessary
+        {syllabus}
         
         Return JSON format:
         {{
             "major_topics": ["...", "..."],
             "assessment_focus": ["...", "..."]
         }}
-        """
-        response = await self.generate_completion(prompt)
-        return json.loads(response)
+        """, content=text, system_prompt="You are a helpful teaching assistant.", output_tokens=800)
+        return await self.complete_json(prompt, SyllabusAnalysisResponse, purpose="analyze_syllabus")
 
-    async def analyze_attendance(self, attendance_summary: str) -> Dict[str, Any]:
-        prompt = f"""
+    async def analyze_attendance(self, attendance_summary: str, total_records: Optional[int] = None,
+                                 absent_count: Optional[int] = None) -> Dict[str, Any]:
+        """The counts, when given, let the local tier answer without a model call."""
+        prompt = self._prompts("analyze_attendance").build(lambda summary: f"""
         Analyze this student attendance summary:
-        {attendance_summary}
+        {summary}
         
         Identify:
         1. Students with worrying attendance trends
@@ -219,19 +528,19 @@ Return ONLY valid JSON in this exact format:
             "engagement_score": 0-100,
             "suggestions": [...]
         }}
-        """
-        response = await self.generate_completion(prompt)
-        return json.loads(response)
+        """, content=attendance_summary, system_prompt="You are a helpful teaching assistant.", output_tokens=600)
+        return await self.complete_json(prompt, AttendanceAnalysisResponse, purpose="analyze_attendance",
+                                        local=lambda: attendance_analysis(total_records, absent_count))
 
     async def analyze_lecture(self, transcript: str) -> Dict[str, Any]:
         """
         Analyze a raw lecture transcript and return structured notes.
         """
-        prompt = f"""
+        prompt = self._prompts("analyze_lecture").build(lambda text: f"""
         You are an expert academic scribe. Analyze the following lecture transcript and extract structured notes.
         
         Transcript:
-        {transcript[:10000]} # Truncate to stay within Llama 3 token limits if needed
+        {text}
         
         Extract:
         1. A concise, professional Lecture Title.
@@ -252,10 +561,9 @@ Return ONLY valid JSON in this exact format:
             "definitions": {{ "term": "definition" }},
             "examples": ["...", "..."]
         }}
-        """
+        """, content=transcript, system_prompt="You are an expert academic analyst. Return only valid JSON.", output_tokens=2000)
         try:
-            response = await self.generate_completion(prompt, system_prompt="You are an expert academic analyst. Return only valid JSON.")
-            return json.loads(response)
+            return await self.complete_json(prompt, LectureNotesResponse, purpose="analyze_lecture")
         except Exception:
             # Fallback structure if AI fails
             return {
@@ -268,13 +576,28 @@ Return ONLY valid JSON in this exact format:
                 "examples": []
             }
 
-    async def detect_learning_gaps(self, marks_summary: str, syllabus_topics: List[str]) -> Dict[str, Any]:
-        prompt = f"""
+    async def detect_learning_gaps(self, marks_summary: str, syllabus_topics: List[str],
+                                   topic_results: Optional[List[Dict[str, Any]]] = None) -> Dict[str, Any]:
+        """
+        topic_results, if given, are syllabus topics already matched to per-topic class averages
+        ({"topic", "score", "status"}); the model is told to take them as given and only advise.
+        """
+        if topic_results:
+            findings = "\n".join(
+                f"        - {t['topic']}: " + (f"class average {t['score']:.0f}% ({t['status']})" if t["score"] is not None else "not assessed")
+                for t in topic_results)
+            task = f"""Per-topic results, already computed from the marks (use them as given):
+{findings}
+        
+        Report the topics marked gap as detected gaps and those marked at risk as at-risk topics."""
+        else:
+            task = "Identify any topics students are struggling with (Learning Gaps)."
+        prompt = self._prompts("detect_learning_gaps").build(lambda summary: f"""
         Compare student performance with syllabus topics:
         Syllabus: {", ".join(syllabus_topics)}
-        Performance Summary: {marks_summary}
+        Performance Summary: {summary}
         
-        Identify any topics students are struggling with (Learning Gaps).
+        {task}
         If students are performing exceptionally well (e.g., above 85%), suggest enrichment activities or moving to advanced topics.
         
         Return JSON:
@@ -283,20 +606,20 @@ Return ONLY valid JSON in this exact format:
             "pedagogical_advice": "Specific teaching steps or enrichment plan...",
             "at_risk_topics": ["topic A"] or []
         }}
-        """
-        response = await self.generate_completion(prompt)
+        """, content=marks_summary, system_prompt="You are a helpful teaching assistant.", output_tokens=700)
         # Handle the field name change in response if needed, for simplicity kept as pedagogical_advice
-        return json.loads(response)
+        return await self.complete_json(prompt, LearningGapAnalysisResponse, purpose="detect_learning_gaps",
+                                        local=lambda: learning_gap_advice(topic_results))
 
     async def parse_attendance_text(self, text: str) -> List[Dict[str, Any]]:
         """
         Extract structured student attendance records from raw text (e.g., parsed from a PDF).
         """
-        prompt = f"""
+        prompt = self._prompts("parse_attendance_text").build(lambda sheet: f"""
         Extract student attendance records from the following text.
         
         TEXT CONTENT:
-        {text[:6000]}
+        {sheet}
         
         For each student mentioned, extract:
         1. student_name: Full name of the student.
@@ -315,24 +638,37 @@ Return ONLY valid JSON in this exact format:
                 }}
             ]
         }}
-        """
+        """, content=text, system_prompt="You are an expert data analyst. Extract attendance records accurately. Return only valid JSON.",
+            output_tokens=4096)
         try:
-            response = await self.generate_completion(prompt, system_prompt="You are an expert data analyst. Extract attendance records accurately. Return only valid JSON.")
-            data = json.loads(response)
-            return data.get("records", [])
+            data = await self.complete_json(prompt, AttendanceRecordsResponse, purpose="parse_attendance_text")
+            return data["records"]
         except Exception as e:
             print(f"AI Attendance Parsing Error: {str(e)}")
             return []
 
+    async def parse_attendance_blocks(self, blocks: List[str]) -> List[List[Dict[str, Any]]]:
+        """
+        Run parse_attendance_text over each block with at most ATTENDANCE_LLM_CONCURRENCY
+        calls in flight. Returns one record list per block, in block order.
+        """
+        semaphore = asyncio.Semaphore(ATTENDANCE_LLM_CONCURRENCY)
+
+        async def parse(block: str) -> List[Dict[str, Any]]:
+            async with semaphore:
+                return await self.parse_attendance_text(block)
+
+        return await asyncio.gather(*(parse(block) for block in blocks))
+
     async def analyze_engagement(self, class_summary: str) -> Dict[str, Any]:
         """
         Generate full engagement analytics based on a class summary (attendance + marks).
         """
-        prompt = f"""
+        prompt = self._prompts("analyze_engagement").build(lambda summary: f"""
         Analyze the following class performance and attendance summary to generate deep engagement insights.
         
         CLASS SUMMARY:
-        {class_summary}
+        {summary}
         
         Generate a JSON object with the following structure:
         {{
@@ -371,10 +707,11 @@ Return ONLY valid JSON in this exact format:
         }}
         
         Ensure the data is consistent with the summary provided. Return ONLY valid JSON.
-        """
+        """, content=class_summary,
+            system_prompt="You are an expert pedagogical data analyst. Generate realistic, data-driven engagement metrics. Return only valid JSON.",
+            output_tokens=1200)
         try:
-            response = await self.generate_completion(prompt, system_prompt="You are an expert pedagogical data analyst. Generate realistic, data-driven engagement metrics. Return only valid JSON.")
-            return json.loads(response)
+            return await self.complete_json(prompt, EngagementResponse, purpose="analyze_engagement")
         except Exception as e:
             print(f"AI Engagement Analysis Error: {str(e)}")
             # Fallback mock data structure if AI fails
@@ -389,4 +726,14 @@ Return ONLY valid JSON in this exact format:
                 "pedagogicalInsight": "Engagement levels are steady. Focus on active learning techniques to boost participation."
             }
 
-ai_service = AIService()
+    @staticmethod
+    def _assessment_output_tokens(num_questions: int) -> int:
+        # An MCQ with four options and metadata is ~150 tokens of JSON
+        return 300 + 180 * num_questions
+
+    def _feedback_pack_size(self) -> int:
+        prompts = self._prompts("generate_feedback_batch")
+        output_budget = min(prompts.max_completion_tokens, prompts.context_tokens // 2)
+        return max(1, min(FEEDBACK_STUDENTS_PER_PROMPT, output_budget // FEEDBACK_OUTPUT_TOKENS))
+
+ai_service = container.lazy("ai_service")
@@ -1,11 +1,8 @@
 import os
-import hashlib
 from jose import jwt
 from datetime import datetime, timedelta
-from typing import Optional
-from dotenv import load_dotenv
-
-load_dotenv()
+from typing import Optional, Tuple
+from services.password_service import password_service
 
 # JWT configuration
 SECRET_KEY = os.environ.get("SECRET_KEY", "hackathon-secret-key-123456789")
@@ -14,11 +11,23 @@ ACCESS_TOKEN_EXPIRE_MINUTES = int(os.environ.get("ACCESS_TOKEN_EXPIRE_MINUTES",
 
 class AuthService:
     def get_password_hash(self, password: str) -> str:
-        """Simple SHA256 hashing for hackathon compatibility"""
-        return hashlib.sha256(password.encode()).hexdigest()
+        """Hash with the configured KDF (bcrypt by default). Blocks - prefer hash_password in async code."""
+        return password_service.hash(password)
 
     def verify_password(self, plain_password: str, hashed_password: str) -> bool:
-        return self.get_password_hash(plain_password) == hashed_password
+        valid, _ = password_service.verify_and_update(plain_password, hashed_password)
+        return valid
+
+    async def hash_password(self, password: str) -> str:
+        """Hash in the password worker pool so the event loop stays responsive"""
+        return await password_service.hash_async(password)
+
+    async def verify_and_update_password(self, plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+        """
+        Verify in the password worker pool.
+        Returns (is_valid, new_hash); new_hash is set for legacy SHA-256 or outdated-cost hashes.
+        """
+        return await password_service.verify_and_update_async(plain_password, hashed_password)
 
     def create_access_token(self, data: dict, expires_delta: Optional[timedelta] = None):
         to_encode = data.copy()
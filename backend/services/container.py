@@ -0,0 +1,119 @@
+import importlib
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Union
+
+# Service name -> "module:Class". Modules are only imported when the service is first used,
+# so heavy dependencies (groq, supabase, pandas, pdfplumber, fpdf) stay out of cold start.
+SERVICE_REGISTRY: Dict[str, str] = {
+    "ai_service": "services.ai_service:AIService",
+    "supabase_service": "services.supabase_service:SupabaseService",
+    "email_service": "services.email_service:EmailService",
+    "parser_service": "services.parser_service:ParserService",
+    "pdf_service": "services.pdf_service:PDFService",
+    "whisper_service": "services.whisper_service:WhisperService",
+}
+
+
+class ServiceContainer:
+    """
+    Dependency-injection provider for the backend services.
+
+    Services are constructed on first use and cached. Tests can swap in fakes with
+    override(); every LazyService proxy and FastAPI provider sees the swap immediately.
+    """
+
+    def __init__(self, registry: Dict[str, str]):
+        self._factories: Dict[str, Union[str, Callable[[], Any]]] = dict(registry)
+        self._instances: Dict[str, Any] = {}
+        self._overrides: Dict[str, Any] = {}
+        self._lock = threading.RLock()
+        self.timings: Dict[str, Dict[str, float]] = {}
+
+    def register(self, name: str, factory: Union[str, Callable[[], Any]]):
+        with self._lock:
+            self._factories[name] = factory
+            self._instances.pop(name, None)
+
+    def get(self, name: str) -> Any:
+        if name in self._overrides:
+            return self._overrides[name]
+        instance = self._instances.get(name)
+        if instance is not None:
+            return instance
+        with self._lock:
+            if name not in self._instances:
+                self._instances[name] = self._build(name)
+            return self._instances[name]
+
+    def _build(self, name: str) -> Any:
+        if name not in self._factories:
+            raise KeyError(f"Unknown service '{name}'")
+        factory = self._factories[name]
+        start = time.perf_counter()
+        if isinstance(factory, str):
+            module_name, class_name = factory.split(":")
+            factory = getattr(importlib.import_module(module_name), class_name)
+        imported = time.perf_counter()
+        instance = factory()
+        self.timings[name] = {
+            "import_ms": (imported - start) * 1000,
+            "init_ms": (time.perf_counter() - imported) * 1000,
+        }
+        return instance
+
+    def override(self, name: str, instance: Any):
+        """Replace a service (e.g. with a fake in tests) until clear_overrides() is called."""
+        self._overrides[name] = instance
+
+    def clear_overrides(self):
+        self._overrides.clear()
+
+    def reset(self):
+        """Drop constructed instances so the next use rebuilds them."""
+        with self._lock:
+            self._instances.clear()
+            self.timings.clear()
+
+    def warm(self, names: Optional[List[str]] = None):
+        """Construct services ahead of the first request."""
+        for name in names or list(self._factories):
+            try:
+                self.get(name)
+            except Exception as e:
+                print(f"Warning: could not initialise {name}: {str(e)}")
+
+    def lazy(self, name: str) -> "LazyService":
+        return LazyService(self, name)
+
+    def provider(self, name: str) -> Callable[[], Any]:
+        """FastAPI dependency: Depends(container.provider("ai_service"))."""
+        def _provide():
+            return self.get(name)
+        return _provide
+
+
+class LazyService:
+    """Module-level stand-in for a service singleton that resolves through the container on attribute access."""
+
+    __slots__ = ("_container", "_name")
+
+    def __init__(self, container: ServiceContainer, name: str):
+        self._container = container
+        self._name = name
+
+    def __getattr__(self, attr: str) -> Any:
+        return getattr(self._container.get(self._name), attr)
+
+    def __repr__(self) -> str:
+        return f"<LazyService {self._name}>"
+
+
+container = ServiceContainer(SERVICE_REGISTRY)
+
+ai_service = container.lazy("ai_service")
+supabase_service = container.lazy("supabase_service")
+email_service = container.lazy("email_service")
+parser_service = container.lazy("parser_service")
+pdf_service = container.lazy("pdf_service")
+whisper_service = container.lazy("whisper_service")
@@ -0,0 +1,147 @@
+import os
+import asyncio
+from typing import Any, Dict, List, Optional, Tuple
+from services.container import supabase_service
+
+# Write-behind: small inserts are buffered per table and sent as one multi-row insert when
+# WRITE_BEHIND_BATCH_SIZE rows are waiting or WRITE_BEHIND_DELAY_MS after the first one
+WRITE_BEHIND_ENABLED = os.environ.get("WRITE_BEHIND_ENABLED", "true").lower() == "true"
+WRITE_BEHIND_BATCH_SIZE = int(os.environ.get("WRITE_BEHIND_BATCH_SIZE", 50))
+WRITE_BEHIND_DELAY_MS = float(os.environ.get("WRITE_BEHIND_DELAY_MS", 100))
+
+# (table, sorted column names): rows are only batched with rows that have the same columns
+BatchKey = Tuple[str, Tuple[str, ...]]
+
+
+def _mark_retrieved(future: asyncio.Future):
+    # Nobody has to await a write-behind row; its failure is already logged
+    if not future.cancelled():
+        future.exception()
+
+
+class DataService:
+    """
+    Async access to Supabase for the routes and services running on the event loop.
+
+    Queries go through one async PostgREST client per worker, whose pooled connections are
+    shared by every request, so a database round trip no longer holds up the loop and
+    independent reads can run together (gather). Inserts whose result the response doesn't
+    need can be handed to insert_later(): they are batched per table and written shortly
+    after, and whatever is still buffered is flushed when the app shuts down.
+    """
+
+    def __init__(self, enabled: bool = WRITE_BEHIND_ENABLED, batch_size: int = WRITE_BEHIND_BATCH_SIZE,
+                 delay_ms: float = WRITE_BEHIND_DELAY_MS):
+        self.enabled = enabled
+        self.batch_size = max(1, batch_size)
+        self.delay = delay_ms / 1000
+        self._client: Any = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._buffers: Dict[BatchKey, List[Tuple[Dict[str, Any], asyncio.Future]]] = {}
+        self._timers: Dict[BatchKey, asyncio.TimerHandle] = {}
+        # write task -> table
+        self._in_flight: Dict[asyncio.Task, str] = {}
+        self.buffered = 0
+        self.batches = 0
+        self.rows_written = 0
+        self.rows_failed = 0
+
+    def client(self) -> Any:
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._loop is not loop:
+            self._client = supabase_service.create_async_client()
+            self._loop = loop
+        return self._client
+
+    def table(self, table_name: str) -> Any:
+        """Async query builder: await data_service.table("x").select(...).eq(...).execute()."""
+        return self.client().table(table_name)
+
+    async def gather(self, *queries: Any) -> List[Any]:
+        """Execute independent queries concurrently; results in the order given."""
+        return list(await asyncio.gather(*(query.execute() for query in queries)))
+
+    async def insert(self, table_name: str, rows: Any) -> List[Dict[str, Any]]:
+        """Insert now (one row or a list) and return the stored rows."""
+        result = await self.table(table_name).insert(rows).execute()
+        return result.data or []
+
+    def insert_later(self, table_name: str, row: Dict[str, Any]) -> asyncio.Future:
+        """
+        Buffer one row for a batched insert. The returned future resolves to the stored row once
+        it is written; awaiting it is optional. A row that can't be written is logged and its
+        future raises.
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        future.add_done_callback(_mark_retrieved)
+        key = (table_name, tuple(sorted(row)))
+        batch = self._buffers.setdefault(key, [])
+        batch.append((row, future))
+        self.buffered += 1
+        if not self.enabled or len(batch) >= self.batch_size:
+            self._start_write(key)
+        elif key not in self._timers:
+            self._timers[key] = loop.call_later(self.delay, self._start_write, key)
+        return future
+
+    async def flush(self, *tables: str):
+        """Write what is buffered for the given tables (default: all) and wait for their writes in flight."""
+        for key in [key for key in self._buffers if not tables or key[0] in tables]:
+            self._start_write(key)
+        pending = [task for task, table in self._in_flight.items() if not tables or table in tables]
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+
+    async def close(self):
+        """Flush every buffer, then release the connection pool. Called from the app's shutdown."""
+        if self._loop is not None and self._loop is not asyncio.get_running_loop():
+            return  # buffers and connections belong to a loop that is gone
+        await self.flush()
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def _start_write(self, key: BatchKey):
+        timer = self._timers.pop(key, None)
+        if timer is not None:
+            timer.cancel()
+        batch = self._buffers.pop(key, None)
+        if not batch:
+            return
+        task = asyncio.ensure_future(self._write(key[0], batch))
+        self._in_flight[task] = key[0]
+        task.add_done_callback(lambda done: self._in_flight.pop(done, None))
+
+    async def _write(self, table_name: str, batch: List[Tuple[Dict[str, Any], asyncio.Future]]):
+        try:
+            stored = await self.insert(table_name, [row for row, _ in batch])
+        except Exception as e:
+            if len(batch) > 1:
+                # One bad row shouldn't lose the whole batch: retry each row on its own
+                print(f"Batched insert of {len(batch)} rows into {table_name} failed, retrying one by one: {str(e)}")
+                await asyncio.gather(*(self._write(table_name, [item]) for item in batch))
+                return
+            self.rows_failed += 1
+            print(f"Write-behind insert into {table_name} failed: {str(e)}")
+            if not batch[0][1].done():
+                batch[0][1].set_exception(e)
+            return
+        self.batches += 1
+        self.rows_written += len(batch)
+        for i, (row, future) in enumerate(batch):
+            if not future.done():
+                future.set_result(stored[i] if i < len(stored) else row)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "pending_rows": sum(len(batch) for batch in self._buffers.values()),
+            "writes_in_flight": len(self._in_flight),
+            "rows_buffered": self.buffered,
+            "batches": self.batches,
+            "rows_written": self.rows_written,
+            "rows_failed": self.rows_failed,
+        }
+
+
+data_service = DataService()
@@ -2,10 +2,9 @@ import smtplib
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 import os
-from dotenv import load_dotenv
 from typing import List, Dict
-
-load_dotenv()
+from services.container import container
+from services.metrics_service import metrics_service
 
 class EmailService:
     def __init__(self):
@@ -17,6 +16,7 @@ class EmailService:
         if not self.sender_email or not self.sender_password:
             print("Warning: Email credentials not configured. Set EMAIL_SENDER and EMAIL_PASSWORD in .env")
     
+    @metrics_service.timed("email_service.send_email")
     def send_email(self, recipient: str, subject: str, body: str) -> bool:
         """Send a single email to a recipient"""
         try:
@@ -99,5 +99,5 @@ class EmailService:
         
         return results
 
-# Create a singleton instance
-email_service = EmailService()
+# Singleton, constructed on first use
+email_service = container.lazy("email_service")
@@ -0,0 +1,168 @@
+import os
+import io
+import re
+import asyncio
+import zipfile
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, AsyncIterator, Dict, Iterable, List, Optional, Tuple
+
+# Batch PDF export configuration
+EXPORT_WORKERS = int(os.environ.get("EXPORT_WORKERS", max(1, (os.cpu_count() or 2) - 1)))
+EXPORT_PAGE_SIZE = int(os.environ.get("EXPORT_PAGE_SIZE", 50))
+# Rendered PDFs waiting to be written; together with one page of rows this bounds peak memory
+EXPORT_MAX_IN_FLIGHT = int(os.environ.get("EXPORT_MAX_IN_FLIGHT", EXPORT_WORKERS * 2))
+
+EXPORT_KINDS = {
+    "lecture_notes": "lecture_notes",
+    "assessments": "assessments",
+}
+
+_SLUG = re.compile(r"[^A-Za-z0-9]+")
+
+
+def render_export_document(kind: str, row: Dict[str, Any]) -> Tuple[str, bytes]:
+    """
+    Runs inside a pool process: render one stored row to (zip entry name, PDF bytes).
+    Imports stay local so worker processes only load the PDF stack.
+    """
+    from services.pdf_service import pdf_service
+
+    if kind == "assessments":
+        data = row.get("data") or {}
+        title = data.get("assessment_title") or f"{row.get('subject', '')} {row.get('unit', '')}".strip() or "Assessment"
+        pdf_bytes = pdf_service.render_assessment(data)
+    else:
+        title = row.get("title") or "Lecture Notes"
+        pdf_bytes = pdf_service.render_lecture_notes(row)
+
+    date = str(row.get("created_at") or "")[:10] or "undated"
+    slug = _SLUG.sub("_", title).strip("_")[:60] or kind
+    return f"{kind}/{date}_{slug}_{row.get('id', '')}.pdf", pdf_bytes
+
+
+class _ZipStream(io.RawIOBase):
+    """Write-only, unseekable sink: zipfile falls back to data descriptors and we drain bytes as they are written."""
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, b) -> int:
+        self._chunks.append(bytes(b))
+        return len(b)
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+class ExportService:
+    def __init__(self, max_workers: int = EXPORT_WORKERS, max_in_flight: int = EXPORT_MAX_IN_FLIGHT):
+        self.max_workers = max_workers
+        self.max_in_flight = max(1, max_in_flight)
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # spawn: workers must not inherit the API's threads, sockets or event loop
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return self._executor
+
+    async def stream_zip(self, documents: AsyncIterator[Tuple[str, Dict[str, Any]]]) -> AsyncIterator[bytes]:
+        """
+        Render (kind, row) pairs in the process pool and yield ZIP bytes as each PDF finishes.
+        At most max_in_flight PDFs are pending at any time, so memory stays flat however many rows there are.
+        """
+        loop = asyncio.get_running_loop()
+        executor = self._get_executor()
+        sink = _ZipStream()
+        archive = zipfile.ZipFile(sink, mode="w", compression=zipfile.ZIP_STORED)
+        pending = set()
+        failures: List[str] = []
+
+        def write_entry(task: asyncio.Future):
+            try:
+                name, pdf_bytes = task.result()
+                archive.writestr(name, pdf_bytes)
+            except Exception as e:
+                print(f"Export render failed: {str(e)}")
+                failures.append(str(e))
+
+        async def write_completed():
+            nonlocal pending
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                write_entry(task)
+
+        try:
+            async for kind, row in documents:
+                pending.add(loop.run_in_executor(executor, render_export_document, kind, row))
+                if len(pending) >= self.max_in_flight:
+                    await write_completed()
+                    chunk = sink.drain()
+                    if chunk:
+                        yield chunk
+
+            while pending:
+                await write_completed()
+                chunk = sink.drain()
+                if chunk:
+                    yield chunk
+
+            if failures:
+                archive.writestr("export_errors.txt", "\n".join(failures))
+            archive.close()
+            yield sink.drain()
+        finally:
+            # Client gone mid-download: give queued renders back to the shared pool (ones already
+            # running finish and are discarded) and release the archive
+            for task in pending:
+                task.cancel()
+            archive.close()
+
+    async def iter_rows(self, client, kinds: Iterable[str], teacher_id: Optional[str],
+                        start_date: Optional[str] = None, end_date: Optional[str] = None,
+                        page_size: int = EXPORT_PAGE_SIZE) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+        """
+        Page through the stored rows so only one page is held in memory at a time. client is an async PostgREST client.
+        Pages follow a (created_at, id) keyset: rows sharing a timestamp (a write-behind batch) are neither
+        repeated nor skipped, and rows inserted during the export don't shift later pages.
+        """
+        for kind in kinds:
+            cursor: Optional[Tuple[str, Any]] = None
+            while True:
+                query = client.table(EXPORT_KINDS[kind]).select("*")
+                if teacher_id:
+                    query = query.eq("teacher_id", teacher_id)
+                if start_date:
+                    query = query.gte("created_at", start_date)
+                if end_date:
+                    query = query.lte("created_at", end_date)
+                if cursor:
+                    created_at, row_id = cursor
+                    # (created_at, id) > cursor; the gte is the index bound, as in history_service.page
+                    query = query.gte("created_at", created_at) \
+                        .or_(f'created_at.gt."{created_at}",and(created_at.eq."{created_at}",id.gt.{row_id})')
+                query = query.order("created_at").order("id").limit(page_size)
+                result = await query.execute()
+                rows = result.data or []
+                for row in rows:
+                    yield kind, row
+                if len(rows) < page_size:
+                    break
+                cursor = (rows[-1]["created_at"], rows[-1]["id"])
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+
+export_service = ExportService()
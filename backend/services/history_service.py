@@ -0,0 +1,99 @@
+import os
+import json
+import uuid
+import base64
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+from services.data_service import data_service
+
+# Rows per history page when the caller doesn't ask, and the most one page may hold
+HISTORY_PAGE_SIZE = int(os.environ.get("HISTORY_PAGE_SIZE", 20))
+HISTORY_MAX_PAGE_SIZE = int(os.environ.get("HISTORY_MAX_PAGE_SIZE", 100))
+
+# kind -> table, selectable fields (name -> PostgREST select expression) and the fields listed by default.
+# Defaults leave out the large JSONB/text columns; ask for them with fields=... when they are needed.
+HISTORY_KINDS: Dict[str, Dict[str, Any]] = {
+    "assessments": {
+        "table": "assessments",
+        "fields": {"subject": "subject", "unit": "unit", "title": "title:data->>assessment_title", "data": "data"},
+        "default": ("subject", "unit", "title"),
+    },
+    "feedback": {
+        "table": "feedback",
+        "fields": {"student_name": "student_name", "student_id": "student_id", "score": "score",
+                   "feedback_data": "feedback_data"},
+        "default": ("student_name", "student_id", "score"),
+    },
+    "lecture_notes": {
+        "table": "lecture_notes",
+        "fields": {name: name for name in ("title", "summary", "topics", "concepts", "definitions", "examples",
+                                           "transcript")},
+        "default": ("title", "summary"),
+    },
+    "study_materials": {
+        "table": "study_materials",
+        "fields": {name: name for name in ("subject", "unit", "title", "file_name", "word_count", "content_text")},
+        "default": ("subject", "unit", "title", "file_name", "word_count"),
+    },
+}
+
+
+def encode_cursor(row: Dict[str, Any]) -> str:
+    """Opaque cursor pointing just past row in (created_at, id) descending order."""
+    raw = json.dumps([row["created_at"], str(row["id"])], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[str, str]:
+    """(created_at, id) from a cursor. Raises ValueError for anything encode_cursor didn't produce."""
+    try:
+        created_at, row_id = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        # Both end up inside a PostgREST filter string, so only accept well-formed values
+        datetime.fromisoformat(created_at)
+        return created_at, str(uuid.UUID(row_id))
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+
+def select_fields(kind: str, fields: Optional[str] = None) -> str:
+    """PostgREST select for a history kind: id, created_at and the requested (or default) fields."""
+    spec = HISTORY_KINDS[kind]
+    names = [f.strip() for f in fields.split(",") if f.strip()] if fields else list(spec["default"])
+    unknown = [name for name in names if name not in spec["fields"]]
+    if unknown:
+        raise ValueError(f"Unknown fields for {kind}: {unknown}. Available: {sorted(spec['fields'])}")
+    return ",".join(["id", "created_at"] + [spec["fields"][name] for name in dict.fromkeys(names)])
+
+
+class HistoryService:
+    """
+    Newest-first listings of a teacher's stored rows, paged by keyset on (created_at, id).
+
+    A page is one index range scan on (teacher_id, created_at DESC, id DESC) that starts where
+    the previous page ended, so page 500 costs the same as page 1 (OFFSET would read and drop
+    every earlier row) and rows inserted meanwhile don't shift or repeat entries.
+    """
+
+    async def page(self, kind: str, teacher_id: str, limit: int = HISTORY_PAGE_SIZE, cursor: Optional[str] = None,
+                   fields: Optional[str] = None) -> Dict[str, Any]:
+        """{"items", "next_cursor"}; next_cursor is None on the last page. Raises ValueError for a bad cursor or field."""
+        limit = max(1, min(limit, HISTORY_MAX_PAGE_SIZE))
+        table = HISTORY_KINDS[kind]["table"]
+        query = data_service.table(table).select(select_fields(kind, fields)).eq("teacher_id", teacher_id)
+        if cursor:
+            created_at, row_id = decode_cursor(cursor)
+            # (created_at, id) < cursor. PostgREST can't compare row values, and an OR alone isn't an index
+            # bound, so the redundant lte is what lets Postgres start the scan at the cursor
+            query = query.lte("created_at", created_at) \
+                .or_(f'created_at.lt."{created_at}",and(created_at.eq."{created_at}",id.lt.{row_id})')
+        # One extra row tells whether another page exists without a count query
+        query = query.order("created_at", desc=True).order("id", desc=True).limit(limit + 1)
+        # Rows this worker hasn't written yet would otherwise be missing from page 1
+        await data_service.flush(table)
+        result = await query.execute()
+        rows: List[Dict[str, Any]] = result.data or []
+        items = rows[:limit]
+        return {"items": items, "next_cursor": encode_cursor(items[-1]) if len(rows) > limit else None}
+
+
+history_service = HistoryService()
@@ -0,0 +1,179 @@
+import os
+import asyncio
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+from services.container import ai_service
+from services.data_service import data_service
+from services.parser_service import WEAK_TOPIC_PERCENT
+from services.question_service import keywords
+
+# Syllabus topics whose matched class average is below this % are learning gaps
+# (below WEAK_TOPIC_PERCENT they are also at risk)
+LEARNING_GAP_PERCENT = float(os.environ.get("LEARNING_GAP_PERCENT", 60))
+# Results this worker keeps in memory, on top of the learning_gaps table
+LEARNING_GAP_CACHE_SIZE = int(os.environ.get("LEARNING_GAP_CACHE_SIZE", 256))
+
+# Words that say where a topic sits, not what it is about
+_GENERIC_WORDS = frozenset({"unit", "chapter", "topic", "module", "part", "section", "marks", "score", "test", "quiz"})
+
+# (teacher id, subject, marks_analysis id, syllabus_analysis id)
+GapKey = Tuple[str, str, str, str]
+
+
+def _topic_words(text: str) -> frozenset:
+    return keywords(text) - _GENERIC_WORDS
+
+
+def _same_word(a: str, b: str) -> bool:
+    # "quadratic" / "quadratics", "polynomial" / "polynomials"
+    return a == b or (min(len(a), len(b)) >= 4 and (a.startswith(b) or b.startswith(a)))
+
+
+def _refers_to(column: str, topic: str) -> bool:
+    """Whether a marks column (e.g. "quadratics") scores a syllabus topic (e.g. "Quadratic equations")."""
+    if " ".join(column.lower().split()) == " ".join(topic.lower().split()):
+        return True
+    a, b = _topic_words(column), _topic_words(topic)
+    if not a or not b:
+        return False
+    shared = sum(1 for word in a if any(_same_word(word, other) for other in b))
+    return shared / min(len(a), len(b)) >= 0.5
+
+
+def _status(score: Optional[float]) -> str:
+    if score is None:
+        return "not assessed"
+    if score < WEAK_TOPIC_PERCENT:
+        return "at risk"
+    return "gap" if score < LEARNING_GAP_PERCENT else "on track"
+
+
+def match_topics(topic_scores: Dict[str, float], syllabus_topics: List[str]) -> List[Dict[str, Any]]:
+    """
+    Pair each syllabus topic with the per-topic class averages that refer to it (same name or
+    mostly the same content words). Returns [{"topic", "score", "status"}] in syllabus order;
+    score is the mean of the matched columns, None when no column matched.
+    """
+    results = []
+    for topic in syllabus_topics:
+        scores = [float(score) for column, score in topic_scores.items()
+                  if score is not None and _refers_to(str(column), str(topic))]
+        score = round(sum(scores) / len(scores), 1) if scores else None
+        results.append({"topic": str(topic), "score": score, "status": _status(score)})
+    return results
+
+
+class LearningGapService:
+    """
+    Learning gaps per (teacher, subject, latest marks analysis, latest syllabus analysis).
+
+    Results are stored in learning_gaps and reused until a newer marks or syllabus analysis
+    exists for that teacher and subject; the most recent ones are also kept in memory, and
+    concurrent requests for the same key share one computation. When the marks carry
+    per-topic scores, gaps are classified locally and the LLM is only asked for advice.
+    """
+
+    def __init__(self, cache_size: int = LEARNING_GAP_CACHE_SIZE):
+        self.cache_size = cache_size
+        self._memo: "OrderedDict[GapKey, Dict[str, Any]]" = OrderedDict()
+        self._pending: Dict[GapKey, asyncio.Future] = {}
+        self.memory_hits = 0
+        self.stored_hits = 0
+        self.computed = 0
+
+    async def detect(self, teacher_id: str, subject: str) -> Dict[str, Any]:
+        """Raises LookupError when the teacher has no marks or syllabus analysis for subject."""
+        # An analysis uploaded a moment ago may still be in this worker's write-behind buffer
+        await data_service.flush("marks_analysis", "syllabus_analysis")
+        marks, syllabus = await asyncio.gather(
+            self._latest("marks_analysis", "id, performance_summary, topic_scores", teacher_id, subject),
+            self._latest("syllabus_analysis", "id, major_topics", teacher_id, subject))
+        if marks is None or syllabus is None:
+            raise LookupError(f"Performance or syllabus data not found for {subject}. Please analyze both first.")
+
+        key = (teacher_id, subject, str(marks["id"]), str(syllabus["id"]))
+        if key in self._memo:
+            self._memo.move_to_end(key)
+            self.memory_hits += 1
+            return {**self._memo[key], "cached": True}
+        pending = self._pending.get(key)
+        if pending is None:
+            pending = self._pending[key] = asyncio.ensure_future(self._load_or_compute(key, marks, syllabus))
+            pending.add_done_callback(lambda _: self._pending.pop(key, None))
+        # A caller that disconnects doesn't cancel the work others are waiting on
+        result, cached = await asyncio.shield(pending)
+        return {**result, "cached": cached}
+
+    async def _latest(self, table: str, columns: str, teacher_id: str, subject: str) -> Optional[Dict[str, Any]]:
+        result = await data_service.table(table).select(columns) \
+            .eq("teacher_id", teacher_id).eq("subject", subject).order("created_at", desc=True).limit(1).execute()
+        return result.data[0] if result.data else None
+
+    async def _load_or_compute(self, key: GapKey, marks: Dict[str, Any],
+                               syllabus: Dict[str, Any]) -> Tuple[Dict[str, Any], bool]:
+        teacher_id, subject, marks_id, syllabus_id = key
+        stored = await data_service.table("learning_gaps").select("result") \
+            .eq("teacher_id", teacher_id).eq("subject", subject) \
+            .eq("marks_analysis_id", marks_id).eq("syllabus_analysis_id", syllabus_id).limit(1).execute()
+        if stored.data:
+            self.stored_hits += 1
+            self._remember(key, stored.data[0]["result"])
+            return stored.data[0]["result"], True
+
+        result, complete = await self._compute(marks, syllabus)
+        result.update({"marks_analysis_id": marks_id, "syllabus_analysis_id": syllabus_id})
+        self.computed += 1
+        if complete:
+            self._remember(key, result)
+            row = {"teacher_id": teacher_id, "subject": subject, "marks_analysis_id": marks_id,
+                   "syllabus_analysis_id": syllabus_id, "result": result}
+            query = data_service.table("learning_gaps").upsert(
+                row, on_conflict="teacher_id,subject,marks_analysis_id,syllabus_analysis_id", ignore_duplicates=True)
+            try:
+                await query.execute()
+            except Exception as e:
+                print(f"Storing learning gaps failed: {str(e)}")
+        return result, False
+
+    async def _compute(self, marks: Dict[str, Any], syllabus: Dict[str, Any]) -> Tuple[Dict[str, Any], bool]:
+        """Returns (result, complete); an incomplete result is served but not stored."""
+        topics = syllabus.get("major_topics") or []
+        if not isinstance(topics, list):
+            topics = [topics]
+        summary = marks.get("performance_summary") or ""
+        topic_results = match_topics(marks.get("topic_scores") or {}, topics)
+        if not any(t["score"] is not None for t in topic_results):
+            # Only an overall score to go on: the model has to judge the gaps itself
+            analysis = await ai_service.detect_learning_gaps(summary, topics)
+            return {**analysis, "topic_results": topic_results, "method": "llm"}, True
+
+        result = {
+            "detected_gaps": [t["topic"] for t in topic_results if t["status"] in ("gap", "at risk")],
+            "at_risk_topics": [t["topic"] for t in topic_results if t["status"] == "at risk"],
+            "topic_results": topic_results,
+            "method": "topic_scores",
+        }
+        try:
+            analysis = await ai_service.detect_learning_gaps(summary, topics, topic_results)
+        except Exception as e:
+            print(f"Learning gap advice failed, returning topic matches only: {str(e)}")
+            return {**result, "pedagogical_advice": ""}, False
+        # The locally classified lists are authoritative; the model contributes the advice
+        return {**analysis, **result}, True
+
+    def _remember(self, key: GapKey, result: Dict[str, Any]):
+        self._memo[key] = result
+        self._memo.move_to_end(key)
+        while len(self._memo) > self.cache_size:
+            self._memo.popitem(last=False)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "cached_results": len(self._memo),
+            "memory_hits": self.memory_hits,
+            "stored_hits": self.stored_hits,
+            "computed": self.computed,
+        }
+
+
+learning_gap_service = LearningGapService()
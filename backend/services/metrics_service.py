@@ -0,0 +1,275 @@
+import os
+import time
+import asyncio
+import bisect
+import functools
+import threading
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+# Metrics configuration
+METRICS_ENABLED = os.environ.get("METRICS_ENABLED", "true").lower() == "true"
+# Optional bearer token for /metrics; leave unset when the endpoint is only reachable from the scraper's network
+METRICS_TOKEN = os.environ.get("METRICS_TOKEN")
+
+# Seconds. Spans range from sub-millisecond DB reads to multi-minute transcriptions.
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+LabelValues = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Iterable[str], values: Iterable[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str, label_names: Tuple[str, ...] = ()):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self._values: Dict[LabelValues, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values: str, amount: float = 1.0):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0.0) + amount
+
+    def expose(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for values, total in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.label_names, values)} {total}")
+        return lines
+
+
+class Gauge(Counter):
+    def set(self, *label_values: str, value: float):
+        with self._lock:
+            self._values[label_values] = value
+
+    def dec(self, *label_values: str, amount: float = 1.0):
+        self.inc(*label_values, amount=-amount)
+
+    def expose(self) -> List[str]:
+        lines = super().expose()
+        lines[1] = f"# TYPE {self.name} gauge"
+        return lines
+
+
+class Histogram:
+    """Fixed-bucket histogram. observe() is a bisect and three additions under a lock."""
+
+    def __init__(self, name: str, help_text: str, label_names: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self.buckets = tuple(sorted(buckets))
+        # label values -> [per-bucket counts (+Inf last), sum, count]
+        self._series: Dict[LabelValues, list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, seconds: float, *label_values: str):
+        index = bisect.bisect_left(self.buckets, seconds)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += seconds
+            series[2] += 1
+
+    def expose(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            snapshot = sorted((values, [list(s[0]), s[1], s[2]]) for values, s in self._series.items())
+        for values, (counts, total, count) in snapshot:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                le = _format_labels(self.label_names, values, f'le="{bound}"')
+                lines.append(f"{self.name}_bucket{le} {cumulative}")
+            inf = _format_labels(self.label_names, values, 'le="+Inf"')
+            lines.append(f"{self.name}_bucket{inf} {count}")
+            lines.append(f"{self.name}_sum{_format_labels(self.label_names, values)} {total}")
+            lines.append(f"{self.name}_count{_format_labels(self.label_names, values)} {count}")
+        return lines
+
+
+class MetricsService:
+    """
+    In-process metrics registry with Prometheus text exposition.
+
+    Each uvicorn worker keeps its own registry; scrape every worker (or run one
+    worker per container) and aggregate in Prometheus.
+    """
+
+    def __init__(self, enabled: bool = METRICS_ENABLED):
+        self.enabled = enabled
+        self.http_requests = Counter(
+            "mentorai_http_requests_total", "HTTP requests by route template and status.", ("method", "route", "status"))
+        self.http_duration = Histogram(
+            "mentorai_http_request_duration_seconds", "Time from request start to last response byte.", ("method", "route"))
+        self.http_in_flight = Gauge(
+            "mentorai_http_requests_in_flight", "Requests currently being served.")
+        self.stage_duration = Histogram(
+            "mentorai_stage_duration_seconds", "Time spent in an instrumented service call.", ("stage", "outcome"))
+        self.supabase_duration = Histogram(
+            "mentorai_supabase_query_duration_seconds", "Supabase .execute() round trips.", ("table", "operation", "outcome"))
+        self.llm_tokens = Counter(
+            "mentorai_llm_tokens_total",
+            "LLM tokens per call purpose and model tier; kind is prompt_estimated, prompt or completion.",
+            ("purpose", "tier", "kind"))
+        self.llm_duration = Histogram(
+            "mentorai_llm_call_duration_seconds", "AIService calls by purpose and the tier that answered (default, fast or local).",
+            ("purpose", "tier", "outcome"))
+        self.llm_truncations = Counter(
+            "mentorai_llm_prompt_truncations_total", "Prompts whose content was cut to fit the token budget.", ("purpose",))
+        self.llm_responses = Counter(
+            "mentorai_llm_responses_total", "Structured LLM replies by outcome: clean, repaired, reprompted or failed.",
+            ("purpose", "outcome"))
+        self._metrics = [self.http_requests, self.http_duration, self.http_in_flight, self.stage_duration,
+                         self.supabase_duration, self.llm_tokens, self.llm_duration, self.llm_truncations,
+                         self.llm_responses]
+        self._collectors: List[Callable[[], List[str]]] = []
+
+    def observe_stage(self, stage: str, seconds: float, outcome: str = "ok"):
+        if self.enabled:
+            self.stage_duration.observe(seconds, stage, outcome)
+
+    def observe_supabase(self, table: str, operation: str, seconds: float, outcome: str = "ok"):
+        if self.enabled:
+            self.supabase_duration.observe(seconds, table, operation, outcome)
+
+    def record_llm_usage(self, purpose: str, tier: str, estimated_prompt: int, prompt: Optional[int],
+                         completion: Optional[int], truncated: bool):
+        if not self.enabled:
+            return
+        self.llm_tokens.inc(purpose, tier, "prompt_estimated", amount=estimated_prompt)
+        if prompt is not None:
+            self.llm_tokens.inc(purpose, tier, "prompt", amount=prompt)
+        if completion is not None:
+            self.llm_tokens.inc(purpose, tier, "completion", amount=completion)
+        if truncated:
+            self.llm_truncations.inc(purpose)
+
+    def observe_llm_call(self, purpose: str, tier: str, seconds: float, outcome: str = "ok"):
+        if self.enabled:
+            self.llm_duration.observe(seconds, purpose, tier, outcome)
+
+    def record_llm_response(self, purpose: str, outcome: str):
+        if self.enabled:
+            self.llm_responses.inc(purpose, outcome)
+
+    def timed(self, stage: str):
+        """Decorator recording a stage span around a sync or async function."""
+        def decorator(fn):
+            if asyncio.iscoroutinefunction(fn):
+                @functools.wraps(fn)
+                async def async_wrapper(*args, **kwargs):
+                    start = time.perf_counter()
+                    outcome = "error"
+                    try:
+                        result = await fn(*args, **kwargs)
+                        outcome = "ok"
+                        return result
+                    finally:
+                        self.observe_stage(stage, time.perf_counter() - start, outcome)
+                return async_wrapper
+
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                start = time.perf_counter()
+                outcome = "error"
+                try:
+                    result = fn(*args, **kwargs)
+                    outcome = "ok"
+                    return result
+                finally:
+                    self.observe_stage(stage, time.perf_counter() - start, outcome)
+            return wrapper
+        return decorator
+
+    def instrument(self, prefix: str, methods: Optional[Iterable[str]] = None):
+        """Class decorator: wrap the named methods (default: every public method) in stage spans."""
+        def decorator(cls):
+            names = methods or [n for n, v in vars(cls).items() if callable(v) and not n.startswith("_")]
+            for name in names:
+                setattr(cls, name, self.timed(f"{prefix}.{name}")(getattr(cls, name)))
+            return cls
+        return decorator
+
+    def register_collector(self, collector: Callable[[], List[str]]):
+        """Add a callback that returns exposition lines at scrape time (e.g. stats from other services)."""
+        self._collectors.append(collector)
+
+    def expose(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics:
+            lines.extend(metric.expose())
+        for collector in self._collectors:
+            try:
+                lines.extend(collector())
+            except Exception as e:
+                print(f"Metrics collector failed: {str(e)}")
+        return "\n".join(lines) + "\n"
+
+
+class MetricsMiddleware:
+    """
+    Pure ASGI middleware (no BaseHTTPMiddleware task/queue overhead) that records
+    per-route request counts and latency. Routes are labelled by template
+    (/analytics/export-pdfs, not the raw URL) to keep cardinality bounded.
+    """
+
+    def __init__(self, app, metrics: "MetricsService" = None):
+        self.app = app
+        self.metrics = metrics or metrics_service
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.metrics.enabled:
+            await self.app(scope, receive, send)
+            return
+
+        status = {"code": "500"}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = str(message["status"])
+            await send(message)
+
+        metrics = self.metrics
+        metrics.http_in_flight.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            metrics.http_in_flight.dec()
+            route = scope.get("route")
+            template = getattr(route, "path", None) or "unmatched"
+            metrics.http_requests.inc(scope["method"], template, status["code"])
+            metrics.http_duration.observe(elapsed, scope["method"], template)
+
+
+def stats_collector(prefix: str, stats: Callable[[], Dict[str, float]], counters: Iterable[str] = ()) -> Callable[[], List[str]]:
+    """Expose a service's stats() dict as mentorai_<prefix>_<key> gauges (or counters for the named keys)."""
+    counters = set(counters)
+
+    def collect() -> List[str]:
+        lines = []
+        for key, value in stats().items():
+            name = f"mentorai_{prefix}_{key}" + ("_total" if key in counters else "")
+            lines.append(f"# TYPE {name} {'counter' if key in counters else 'gauge'}")
+            lines.append(f"{name} {value}")
+        return lines
+    return collect
+
+
+metrics_service = MetricsService()
@@ -1,11 +1,154 @@
-import pandas as pd
-import pdfplumber
-from typing import List, Dict, Any, Tuple
+from typing import List, Dict, Any, Optional, Tuple
 import io
+import os
+import re
+from datetime import datetime
+from services.container import container
+from services.metrics_service import metrics_service
+from services.prompt_service import count_tokens
 
+# PDF attendance sheets: text the table pass can't read is sent to the LLM in blocks of at most this many tokens
+ATTENDANCE_BLOCK_TOKENS = int(os.environ.get("ATTENDANCE_BLOCK_TOKENS", 1500))
+
+# Marks CSVs: a topic column counts as weak below this % of the best mark in it
+WEAK_TOPIC_PERCENT = 40
+_NON_TOPIC_COLUMN = re.compile(r"(^|[\s_])(id|roll|no|number|year|age|phone|total|percentage|attendance)($|[\s_])", re.IGNORECASE)
+
+PRESENT_MARKS = {"p", "present", "1", "yes", "y", "\u2713"}
+ABSENT_MARKS = {"a", "ab", "absent", "0", "no", "n", "x", "\u2717"}
+LATE_MARKS = {"l", "late"}
+
+# Day-first before month-first: registers here are written dd/mm/yyyy
+DATE_FORMATS = ("%Y-%m-%d", "%d-%m-%Y", "%d/%m/%Y", "%d.%m.%Y", "%m/%d/%Y", "%d %b %Y", "%d-%b-%Y",
+                "%d %B %Y", "%b %d, %Y", "%B %d, %Y", "%d/%m/%y", "%d-%m-%y")
+_DATE_IN_TEXT = re.compile(r"\b(\d{4}-\d{2}-\d{2}|\d{1,2}[/.-]\d{1,2}[/.-]\d{2,4}|\d{1,2}[ -][A-Za-z]{3,9}[ -]\d{4})\b")
+
+
+def _normalize_date(value: Any) -> Optional[str]:
+    text = " ".join(str(value or "").split())
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(text, fmt).date().isoformat()
+        except ValueError:
+            continue
+    return None
+
+
+def _status(mark: str) -> Optional[str]:
+    """attendance.status for a register mark; None for blanks, holidays, leave and anything else unknown."""
+    mark = mark.strip().lower()
+    if mark in PRESENT_MARKS:
+        return "Present"
+    if mark in ABSENT_MARKS:
+        return "Absent"
+    if mark in LATE_MARKS:
+        return "Late"
+    return None
+
+
+def _normalize_name(value: Any) -> str:
+    return " ".join(str(value or "").split())
+
+
+def _topic_columns(df: Any, score_col: str) -> List[str]:
+    """Numeric columns of a marks CSV that hold per-topic marks (not the total, roll numbers or ids)."""
+    return [c for c in df.select_dtypes(include=['number']).columns
+            if c != score_col and not _NON_TOPIC_COLUMN.search(str(c))]
+
+
+def _cell(value: Any) -> str:
+    return " ".join(str(value).split()) if value is not None else ""
+
+
+def _attendance_header(row: List[str]) -> Optional[Dict[str, Any]]:
+    """Column layout of a header row, or None if the row doesn't look like an attendance header."""
+    headers = [cell.lower() for cell in row]
+    name_col = next((i for i, h in enumerate(headers) if "name" in h), None)
+    if name_col is None:
+        return None
+    status_col = next((i for i, h in enumerate(headers) if "status" in h or "presence" in h), None)
+    date_col = next((i for i, h in enumerate(headers) if "date" in h), None)
+    # Register layout: one column per class day, marked P/A
+    day_cols = {i: d for i, d in ((i, _normalize_date(cell)) for i, cell in enumerate(row)) if d}
+    if status_col is None and not day_cols:
+        return None
+    return {"width": len(row), "name": name_col, "status": status_col, "date": date_col, "days": day_cols}
+
+
+def _table_records(rows: List[List[str]], header: Optional[Dict[str, Any]], page_date: Optional[str]) -> Tuple[Optional[List[Dict[str, Any]]], Optional[Dict[str, Any]]]:
+    """
+    Turn one extracted table into records. A table without its own header row is read
+    with the previous one (registers continue across pages). Returns (records, header);
+    records is None when the table isn't an attendance table this parser understands.
+    """
+    for index, row in enumerate(rows):
+        found = _attendance_header(row)
+        if found:
+            header, rows = found, rows[index + 1:]
+            break
+    else:
+        if header is None or not rows or len(rows[0]) != header["width"]:
+            return None, header
+
+    if header["status"] is not None and header["date"] is None and page_date is None:
+        # Name/status list whose date isn't anywhere we can read deterministically
+        return None, header
+
+    records = []
+    for row in rows:
+        if len(row) != header["width"]:
+            continue
+        name = _normalize_name(row[header["name"]])
+        if not name:
+            continue
+        if header["status"] is not None:
+            date = _normalize_date(row[header["date"]]) if header["date"] is not None else page_date
+            status = _status(row[header["status"]])
+            if not date or not status:
+                continue
+            records.append({"student_name": name, "attendance_date": date, "status": status})
+            continue
+        for column, date in header["days"].items():
+            # Blank, holiday or leave marks aren't attendance facts; skip rather than guess
+            status = _status(row[column])
+            if status:
+                records.append({"student_name": name, "attendance_date": date, "status": status})
+    return records, header
+
+
+def _split_blocks(pages: List[str], max_tokens: int) -> List[str]:
+    """One block per page; pages over max_tokens are split on line boundaries, repeating the page's first line for context."""
+    blocks = []
+    for page in pages:
+        if count_tokens(page) <= max_tokens:
+            blocks.append(page)
+            continue
+        lines = page.splitlines()
+        heading = lines[0]
+        current, used = [], 0
+        for line in lines:
+            tokens = count_tokens(line) + 1
+            if current and used + tokens > max_tokens:
+                blocks.append("\n".join(current))
+                current, used = [heading], count_tokens(heading) + 1
+            current.append(line)
+            used += tokens
+        if current:
+            blocks.append("\n".join(current))
+    return blocks
+
+
+@metrics_service.instrument("parser_service")
 class ParserService:
-    def parse_marks_csv(self, file_content: bytes) -> Tuple[float, List[str], List[str], str]:
+    def parse_marks_csv(self, file_content: bytes) -> Tuple[float, List[str], List[str], str, Dict[str, float]]:
+        """
+        Returns (average score, weak topics, risk students, summary for the AI, topic scores).
+        Numeric columns besides the score are per-topic marks; topic scores are the class
+        average in each as a percentage of the best mark in it (full marks aren't in the CSV).
+        """
+        import pandas as pd
         df = pd.read_csv(io.BytesIO(file_content))
+        df.columns = [str(c).strip() for c in df.columns]
         
         # Assuming CSV has 'student_name' and 'score' columns
         # If columns are different, we might need a more robust mapping
@@ -25,14 +168,53 @@ class ParserService:
         threshold = 40 
         risk_students = df[df[score_col] < threshold]['student_name'].tolist() if 'student_name' in df.columns else []
         
-        # Weak topics (this usually requires topic-wise marks, but if not provided, we can't infer much from a single score)
-        # For now, let's assume we might have column-wise topics or just a general list
-        weak_topics = [] # This would ideally come from analyzing sub-scores
+        topic_scores = {}
+        for col in _topic_columns(df, score_col):
+            best = df[col].max()
+            if best > 0 and not pd.isna(df[col].mean()):
+                topic_scores[col] = round(float(df[col].mean() * 100 / best), 1)
+        weak_topics = [topic for topic, percent in topic_scores.items() if percent < WEAK_TOPIC_PERCENT]
         
         # Create a summary for AI
         summary = f"Average Score: {average_score:.2f}. Total Students: {len(df)}. Risk Students: {len(risk_students)}."
+        if topic_scores:
+            summary += " Topic averages: " + ", ".join(f"{topic} {percent:.0f}%" for topic, percent in topic_scores.items()) + "."
         
-        return average_score, weak_topics, risk_students, summary
+        return average_score, weak_topics, risk_students, summary, topic_scores
+
+    def parse_feedback_csv(self, file_content: bytes) -> List[Dict[str, Any]]:
+        """
+        Students for bulk feedback from a marks CSV with a 'student_name' column and an overall
+        'score' (else the first numeric column). Other numeric columns are read as per-topic
+        scores; an optional 'weak_topics' column lists more topics separated by ';' or '|'.
+        """
+        import pandas as pd
+        df = pd.read_csv(io.BytesIO(file_content))
+        df.columns = [str(c).strip() for c in df.columns]
+        if 'student_name' not in df.columns:
+            raise ValueError("CSV must contain a 'student_name' column")
+        numeric_cols = list(df.select_dtypes(include=['number']).columns)
+        if 'score' in numeric_cols:
+            score_col = 'score'
+        elif numeric_cols:
+            score_col = numeric_cols[0]
+        else:
+            raise ValueError("CSV must contain a numeric 'score' column")
+        topic_cols = _topic_columns(df, score_col)
+        best = {c: df[c].max() for c in topic_cols}
+
+        students = []
+        for row in df.to_dict('records'):
+            name = _normalize_name(row['student_name']) if not pd.isna(row['student_name']) else ""
+            if not name or pd.isna(row[score_col]):
+                continue
+            weak_topics = [c for c in topic_cols
+                           if not pd.isna(row[c]) and best[c] > 0 and row[c] * 100 / best[c] < WEAK_TOPIC_PERCENT]
+            listed = row.get('weak_topics')
+            if isinstance(listed, str):
+                weak_topics += [t.strip() for t in re.split(r"[;|]", listed) if t.strip() and t.strip() not in weak_topics]
+            students.append({"student_name": name, "score": float(row[score_col]), "weak_topics": weak_topics})
+        return students
 
     def parse_syllabus_pdf(self, file_content: bytes) -> str:
         """
@@ -41,6 +223,7 @@ class ParserService:
         text = ""
         # Strategy 1: pdfplumber (Better for layout and tables)
         try:
+            import pdfplumber
             with pdfplumber.open(io.BytesIO(file_content)) as pdf:
                 for page_num, page in enumerate(pdf.pages, 1):
                     page_text = page.extract_text()
@@ -79,6 +262,7 @@ class ParserService:
 
     def parse_attendance_csv(self, file_content: bytes) -> List[Dict[str, Any]]:
         """Parses attendance CSV expecting columns related to name, date, and status."""
+        import pandas as pd
         df = pd.read_csv(io.BytesIO(file_content))
         
         # Standardize columns
@@ -101,4 +285,78 @@ class ParserService:
             })
         return records
 
-parser_service = ParserService()
+    def extract_attendance_pdf(self, file_content: bytes) -> Tuple[List[Dict[str, Any]], List[str]]:
+        """
+        Deterministic first pass over a PDF attendance sheet. Tables with a recognisable
+        name/date/status or register (name + one column per day) layout become records
+        directly; the remaining page text comes back as blocks for LLM extraction.
+        Returns (records, blocks).
+        """
+        import pdfplumber
+        records: List[Dict[str, Any]] = []
+        pages: List[str] = []
+        try:
+            with pdfplumber.open(io.BytesIO(file_content)) as pdf:
+                header = None
+                for page in pdf.pages:
+                    page_text = page.extract_text() or ""
+                    dates = _DATE_IN_TEXT.findall(page_text)
+                    page_date = _normalize_date(dates[0]) if len(set(dates)) == 1 else None
+                    remaining = page
+                    parsed_any = False
+                    for table in page.find_tables():
+                        rows = [[_cell(c) for c in row] for row in table.extract()]
+                        parsed, header = _table_records(rows, header, page_date)
+                        if parsed is None:
+                            continue
+                        records.extend(parsed)
+                        parsed_any = True
+                        remaining = remaining.outside_bbox(table.bbox)
+                    leftover = (remaining.extract_text() if parsed_any else page_text).strip()
+                    # Titles and footers around a parsed table carry no rows worth an LLM call
+                    if leftover and (not parsed_any or len(leftover.splitlines()) > 3):
+                        pages.append(leftover)
+        except Exception as e:
+            print(f"pdfplumber attendance extraction failed: {e}")
+
+        if not records and not pages:
+            # Nothing pdfplumber could read; fall back to the multi-strategy text extraction
+            text = self.parse_syllabus_pdf(file_content)
+            if text and not text.startswith("Warning:"):
+                pages.append(text)
+        return records, _split_blocks(pages, ATTENDANCE_BLOCK_TOKENS)
+
+    def merge_attendance_records(self, *batches: List[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], Dict[str, int]]:
+        """
+        Merge record lists, keeping the first record per (student, date). Pass the
+        deterministic batch first so it wins over LLM output. Records whose date doesn't parse
+        (attendance_date is a DATE) or whose status isn't a known mark are dropped, not guessed.
+        Returns (records, {"duplicates_removed", "invalid_dates_dropped", "unknown_status_dropped"}).
+        """
+        merged: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        duplicates = invalid_dates = unknown_status = 0
+        for batch in batches:
+            for record in batch:
+                if not isinstance(record, dict):
+                    continue
+                name = _normalize_name(record.get("student_name"))
+                raw_date = _normalize_name(record.get("attendance_date"))
+                if not name or not raw_date:
+                    continue
+                date = _normalize_date(raw_date)
+                if not date:
+                    invalid_dates += 1
+                    continue
+                status = _status(str(record.get("status", "")))
+                if not status:
+                    unknown_status += 1
+                    continue
+                key = (name.casefold(), date)
+                if key in merged:
+                    duplicates += 1
+                    continue
+                merged[key] = {"student_name": name, "attendance_date": date, "status": status}
+        return list(merged.values()), {"duplicates_removed": duplicates, "invalid_dates_dropped": invalid_dates,
+                                       "unknown_status_dropped": unknown_status}
+
+parser_service = container.lazy("parser_service")
@@ -0,0 +1,71 @@
+import os
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Tuple
+from passlib.context import CryptContext
+
+# Password hashing configuration
+PASSWORD_HASH_SCHEME = os.environ.get("PASSWORD_HASH_SCHEME", "bcrypt")
+BCRYPT_ROUNDS = int(os.environ.get("BCRYPT_ROUNDS", 12))
+ARGON2_TIME_COST = int(os.environ.get("ARGON2_TIME_COST", 3))
+ARGON2_MEMORY_COST = int(os.environ.get("ARGON2_MEMORY_COST", 65536))
+PASSWORD_HASH_WORKERS = int(os.environ.get("PASSWORD_HASH_WORKERS", min(4, os.cpu_count() or 1)))
+
+SUPPORTED_SCHEMES = ("bcrypt", "argon2")
+
+
+class PasswordService:
+    """
+    KDF-based password hashing that runs off the event loop.
+
+    bcrypt and argon2 both release the GIL while hashing, so a small bounded
+    thread pool gives real parallelism without the pickling cost of a process pool.
+    Legacy unsalted SHA-256 hex digests are still accepted and flagged for rehash.
+    """
+
+    def __init__(self, scheme: str = PASSWORD_HASH_SCHEME, bcrypt_rounds: int = BCRYPT_ROUNDS,
+                 max_workers: int = PASSWORD_HASH_WORKERS):
+        if scheme not in SUPPORTED_SCHEMES:
+            raise ValueError(f"PASSWORD_HASH_SCHEME must be one of {SUPPORTED_SCHEMES}, got '{scheme}'")
+
+        # The active scheme comes first so it is used for new hashes; everything else is deprecated
+        schemes = [scheme] + [s for s in SUPPORTED_SCHEMES if s != scheme] + ["hex_sha256"]
+        self.context = CryptContext(
+            schemes=schemes,
+            default=scheme,
+            deprecated="auto",
+            bcrypt__rounds=bcrypt_rounds,
+            argon2__time_cost=ARGON2_TIME_COST,
+            argon2__memory_cost=ARGON2_MEMORY_COST,
+        )
+        self.scheme = scheme
+        self.max_workers = max_workers
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="password-hash")
+
+    def hash(self, password: str) -> str:
+        return self.context.hash(password)
+
+    def verify_and_update(self, password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+        """
+        Returns (is_valid, new_hash). new_hash is set when the stored hash uses a
+        deprecated scheme or outdated cost and should be written back.
+        """
+        try:
+            return self.context.verify_and_update(password, hashed_password)
+        except (ValueError, TypeError):
+            # Unrecognised or corrupt hash in the database
+            return False, None
+
+    async def hash_async(self, password: str) -> str:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self.hash, password)
+
+    async def verify_and_update_async(self, password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self.verify_and_update, password, hashed_password)
+
+    def shutdown(self):
+        self._executor.shutdown(wait=True)
+
+
+password_service = PasswordService()
@@ -1,139 +1,346 @@
 from fpdf import FPDF
+from fpdf.enums import XPos, YPos
+from fpdf.fonts import SubsetMap
+from fontTools import ttLib
+from fontTools import subset as ftsubset
 from datetime import datetime
+from io import BytesIO
+import copy
+import glob
 import os
 import re
-from typing import Dict, Any, List
+import threading
+from typing import Dict, Any, List, Optional, Tuple
+from services.container import container
+from services.metrics_service import metrics_service
+
+# Bundled Unicode font (DejaVu Sans covers Latin, Greek and math symbols such as ± √ ²).
+# Any other *.ttf dropped into FONT_DIR (e.g. NotoSansDevanagari-Regular.ttf) is used as a fallback font.
+FONT_DIR = os.environ.get("PDF_FONT_DIR", os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "fonts"))
+UNICODE_FONT_FAMILY = "DejaVuSans"
+UNICODE_FONT_FILES = {"": "DejaVuSans.ttf", "B": "DejaVuSans-Bold.ttf", "I": "DejaVuSans-Oblique.ttf"}
+PDF_UNICODE_FONTS = os.environ.get("PDF_UNICODE_FONTS", "true").lower() != "false"
+
+# Scripts kept from the bundled font: Latin (with IPA, modifiers, combining marks and Vietnamese),
+# Greek, Cyrillic, punctuation, super/subscripts, currency, letterlike symbols, number forms, arrows,
+# math operators, technical symbols and geometric shapes. Everything DejaVu draws without shaping or
+# bidi; Hebrew and Arabic are left out. Restricting the repertoire once up front (~2.5k of DejaVu's
+# ~6k glyphs) makes per-document subsetting much cheaper.
+UNICODE_FONT_RANGES = [
+    (0x0020, 0x007E), (0x00A0, 0x036F), (0x0370, 0x03FF), (0x0400, 0x052F), (0x1E00, 0x1EFF),
+    (0x1F00, 0x1FFF), (0x2000, 0x206F), (0x2070, 0x209F), (0x20A0, 0x20CF), (0x2100, 0x214F),
+    (0x2150, 0x218F), (0x2190, 0x21FF), (0x2200, 0x22FF), (0x2300, 0x23FF), (0x25A0, 0x25FF),
+]
+# Tables the fpdf2 subsetter drops anyway
+_UNUSED_FONT_TABLES = ["FFTM", "GDEF", "GPOS", "GSUB", "MATH", "hdmx", "meta", "kern"]
+
+# Single-pass character mapping for typography FPDF's core fonts can't encode
+_TRANSLATION = str.maketrans({
+    "\u2022": "-", "\u2013": "-", "\u2014": "--",
+    "\u2018": "'", "\u2019": "'", "\u201c": '"', "\u201d": '"',
+    "\u2026": "...",
+})
+# Anything still outside ASCII after translation triggers "Character \uXXXX is outside the range"
+_NON_ASCII = re.compile(r'[^\x00-\x7f]')
+
+# Layout template: style name -> (emphasis, size, rgb)
+STYLES = {
+    "title": ("B", 20, (44, 62, 80)),
+    "subtitle": ("I", 10, (44, 62, 80)),
+    "heading": ("B", 14, (52, 73, 94)),
+    "body": ("", 11, (0, 0, 0)),
+    "term": ("B", 11, (0, 0, 0)),
+    "footer": ("I", 8, (149, 165, 166)),
+}
+
+# Section order for lecture notes: (data key, heading, kind)
+NOTES_SECTIONS = [
+    ("topics", "Topic Breakdown", "list"),
+    ("concepts", "Key Concepts", "list"),
+    ("formulas", "Formulas & Equations", "list"),
+    ("definitions", "Glossary & Definitions", "dict"),
+    ("examples", "Examples Mentioned", "list"),
+]
+
+MAX_SECTION_CHARS = 5000
+MAX_ITEM_CHARS = 500
+NEXT_LINE = {"new_x": XPos.LMARGIN, "new_y": YPos.NEXT}
+
+
+class _FontCache:
+    """
+    Parses each TTF once per process. Every document gets a cheap copy of the parsed
+    font (shared metrics and cmap, fresh glyph subset) instead of re-reading the file.
+    """
+
+    def __init__(self, font_dir: str):
+        self.font_dir = font_dir
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._templates: Dict[str, Tuple[Any, bytes]] = {}  # fontkey -> (parsed TTFFont, slimmed font bytes)
+        self.fallback_families: List[str] = []
+        self.supported: frozenset = frozenset()
+        # Characters already reported as undrawable, so each one is logged once per process
+        self._reported: set = set()
+
+    def available(self) -> bool:
+        if not self._loaded:
+            with self._lock:
+                if not self._loaded:
+                    self._load()
+                    self._loaded = True
+        return bool(self._templates)
+
+    def _load(self):
+        paths = {style: os.path.join(self.font_dir, name) for style, name in UNICODE_FONT_FILES.items()}
+        missing = [p for p in paths.values() if not os.path.exists(p)]
+        if missing:
+            print(f"Warning: Unicode PDF fonts not found ({', '.join(missing)}). Falling back to ASCII-only PDFs.")
+            return
+
+        loader = FPDF()
+        slim_bytes: Dict[str, bytes] = {}
+        unicodes = [c for start, end in UNICODE_FONT_RANGES for c in range(start, end + 1)]
+        for style, path in paths.items():
+            loader.add_font(UNICODE_FONT_FAMILY, style, path, unicode_range=UNICODE_FONT_RANGES)
+            slim_bytes[f"{UNICODE_FONT_FAMILY.lower()}{style}"] = self._slim_font_bytes(path, unicodes)
+        for path in sorted(glob.glob(os.path.join(self.font_dir, "*.ttf"))):
+            if os.path.basename(path) in UNICODE_FONT_FILES.values():
+                continue
+            family = os.path.splitext(os.path.basename(path))[0]
+            loader.add_font(family, "", path)
+            slim_bytes[family.lower()] = self._slim_font_bytes(path)
+            self.fallback_families.append(family)
+
+        supported = set()
+        for fontkey, font in loader.fonts.items():
+            self._templates[fontkey] = (font, slim_bytes[fontkey])
+            supported.update(font.cmap.keys())
+        self.supported = frozenset(supported)
+
+    @staticmethod
+    def _slim_font_bytes(path: str, unicodes: Optional[List[int]] = None) -> bytes:
+        """Pre-subset a font to the kept repertoire (glyph names preserved) and drop unused tables."""
+        ttfont = ttLib.TTFont(path, recalcTimestamp=False)
+        if unicodes is not None:
+            options = ftsubset.Options(notdef_outline=True, recommended_glyphs=True, glyph_names=True)
+            options.layout_features = []
+            options.drop_tables += _UNUSED_FONT_TABLES
+            subsetter = ftsubset.Subsetter(options)
+            subsetter.populate(unicodes=unicodes)
+            subsetter.subset(ttfont)
+        else:
+            for tag in _UNUSED_FONT_TABLES:
+                if tag in ttfont:
+                    del ttfont[tag]
+        buffer = BytesIO()
+        ttfont.save(buffer)
+        return buffer.getvalue()
+
+    def attach(self, pdf: FPDF):
+        """Register the cached fonts on a new document."""
+        for fontkey, (template, font_bytes) in self._templates.items():
+            font = copy.copy(template)
+            font.i = len(pdf.fonts) + 1
+            # Subsetting at output() mutates the fontTools object, so each document needs its own
+            font.ttfont = ttLib.TTFont(BytesIO(font_bytes), recalcTimestamp=False, lazy=True)
+            font.subset = SubsetMap(font)
+            font.missing_glyphs = []
+            font.biggest_size_pt = 0
+            pdf.fonts[fontkey] = font
+        if self.fallback_families:
+            pdf.set_fallback_fonts(self.fallback_families)
+
+    def filter_supported(self, text: str) -> str:
+        """
+        Drop characters no loaded font can draw, so they don't render as empty boxes. Each
+        dropped character is logged the first time, naming the font to add (e.g. Devanagari
+        names need NotoSansDevanagari-Regular.ttf in FONT_DIR, see fonts/README.md).
+        """
+        supported = self.supported
+        if all(ord(c) in supported for c in text):
+            return text
+        dropped = {c for c in text if ord(c) not in supported and c not in "\n\t"}
+        new = dropped - self._reported
+        if new:
+            self._reported.update(new)
+            sample = ", ".join(f"U+{ord(c):04X}" for c in sorted(new)[:10])
+            print(f"Warning: no PDF font for {len(new)} characters ({sample}); they are left out. "
+                  f"Add a font covering them to {self.font_dir}.")
+        return "".join(c for c in text if c not in dropped)
+
+
+font_cache = _FontCache(FONT_DIR)
+
+
+class _NotesPDF(FPDF):
+    """FPDF with style switching that skips redundant font/color operators."""
+
+    def __init__(self, unicode_fonts: bool):
+        super().__init__(format='A4')
+        self.set_auto_page_break(auto=True, margin=15)
+        self.set_margins(left=20, top=20, right=20)
+        self._style: Optional[str] = None
+        if unicode_fonts:
+            font_cache.attach(self)
+            self.family = UNICODE_FONT_FAMILY
+        else:
+            self.family = "Helvetica"
+
+    def use_style(self, name: str):
+        if name == self._style:
+            return
+        emphasis, size, rgb = STYLES[name]
+        self.set_font(self.family, emphasis, size)
+        self.set_text_color(*rgb)
+        self._style = name
+
 
 class PDFService:
+    def __init__(self, unicode_fonts: bool = PDF_UNICODE_FONTS):
+        self.unicode_fonts = unicode_fonts
+
+    def _use_unicode(self) -> bool:
+        return self.unicode_fonts and font_cache.available()
+
+    @metrics_service.timed("pdf_service.create_lecture_notes")
     def create_lecture_notes(self, data: Dict[str, Any], output_path: str):
         """
         Generate structured PDF notes from AI analysis.
         """
-        print(f"DEBUG: Generating PDF with keys: {list(data.keys())}")
-        
-        # Sanitize all data
-        data = self._sanitize_data(data)
-        
-        # Configure PDF with proper margins to prevent layout errors
-        pdf = FPDF(format='A4')  # Explicitly set A4 format
-        pdf.set_auto_page_break(auto=True, margin=15)
-        pdf.set_margins(left=20, top=20, right=20)
+        with open(output_path, "wb") as f:
+            f.write(self.render_lecture_notes(data))
+        return output_path
+
+    def render_lecture_notes(self, data: Dict[str, Any]) -> bytes:
+        """Render lecture notes to PDF bytes without touching the filesystem."""
+        unicode_fonts = self._use_unicode()
+        # One sanitize pass over the whole structure
+        data = self._sanitize_data(data, unicode_fonts)
+
+        pdf = _NotesPDF(unicode_fonts)
+        self._add_header(pdf, data.get("title") or "Lecture Notes")
+
+        # Summary Section
+        self._add_section(pdf, "Executive Summary", data.get("summary") or "No summary provided.")
+
+        for key, heading, kind in NOTES_SECTIONS:
+            if not data.get(key):
+                continue
+            if kind == "dict":
+                self._add_dict_section(pdf, heading, data[key])
+            else:
+                self._add_list_section(pdf, heading, data[key])
+
+        self._add_footer(pdf, "Note: These notes were automatically generated from lecture audio.")
+        return bytes(pdf.output())
+
+    def render_assessment(self, data: Dict[str, Any]) -> bytes:
+        """Render a generated assessment (question paper followed by an answer key) to PDF bytes."""
+        unicode_fonts = self._use_unicode()
+        data = self._sanitize_data(data, unicode_fonts)
+
+        pdf = _NotesPDF(unicode_fonts)
+        self._add_header(pdf, data.get("assessment_title") or "Assessment")
+
+        answers = []
+        self._add_heading(pdf, "Questions")
+        for i, question in enumerate(data.get("questions") or [], 1):
+            if not isinstance(question, dict):
+                continue
+            number = question.get("question_number", i)
+            meta = [question.get("bloom_level"), f"{question['marks']} marks" if question.get("marks") else None]
+            meta = ", ".join(str(m) for m in meta if m)
+            text = f"{number}. {str(question.get('question_text', ''))[:MAX_ITEM_CHARS]}"
+            try:
+                pdf.multi_cell(0, 7, f"{text}  ({meta})" if meta else text, **NEXT_LINE)
+                for option in question.get("options") or []:
+                    pdf.multi_cell(0, 7, f"      {str(option)[:MAX_ITEM_CHARS]}", **NEXT_LINE)
+            except Exception as e:
+                print(f"PDF Rendering Error for question {number}: {e}")
+                pdf.cell(0, 7, f"{number}. [Question rendering error]", **NEXT_LINE)
+            pdf.ln(2)
+            if question.get("correct_answer"):
+                answers.append(f"{number}. {question['correct_answer']}")
+        pdf.ln(5)
+
+        if answers:
+            self._add_list_section(pdf, "Answer Key", answers)
+
+        self._add_footer(pdf, "Note: This assessment was automatically generated by MentorAI.")
+        return bytes(pdf.output())
+
+    def _add_header(self, pdf: _NotesPDF, title: str):
         pdf.add_page()
-        
-        # Header
-        pdf.set_font("Helvetica", "B", 20)
-        pdf.set_text_color(44, 62, 80) # Dark Blue
-        pdf.cell(0, 15, data.get("title", "Lecture Notes"), ln=True, align="C")
-        
-        pdf.set_font("Helvetica", "I", 10)
-        pdf.cell(0, 5, f"Generated by MentorAI on {datetime.now().strftime('%Y-%m-%d %H:%M')}", ln=True, align="C")
+        pdf.use_style("title")
+        pdf.multi_cell(0, 15, title, align="C", **NEXT_LINE)
+        pdf.use_style("subtitle")
+        pdf.cell(0, 5, f"Generated by MentorAI on {datetime.now().strftime('%Y-%m-%d %H:%M')}", align="C", **NEXT_LINE)
         pdf.ln(10)
-        
-        # Sanitize all data
-        data = self._sanitize_data(data)
-        
-        # Summary Section
-        self._add_section(pdf, "Executive Summary", data.get("summary", "No summary provided."))
-        
-        # Topic Breakdown
-        if data.get("topics"):
-            self._add_list_section(pdf, "Topic Breakdown", data["topics"])
-            
-        # Key Concepts
-        if data.get("concepts"):
-            self._add_list_section(pdf, "Key Concepts", data["concepts"])
-        
-        # Formulas & Equations (NEW!)
-        if data.get("formulas"):
-            self._add_list_section(pdf, "Formulas & Equations", data["formulas"])
-            
-        # Definitions
-        if data.get("definitions"):
-            self._add_dict_section(pdf, "Glossary & Definitions", data["definitions"])
-            
-        # Examples
-        if data.get("examples"):
-            self._add_list_section(pdf, "Examples Mentioned", data["examples"])
-            
-        # Footer
+
+    def _add_footer(self, pdf: _NotesPDF, text: str):
         pdf.set_y(-25)
-        pdf.set_font("Helvetica", "I", 8)
-        pdf.set_text_color(149, 165, 166)
-        pdf.cell(0, 10, "Note: These notes were automatically generated from lecture audio.", align="C")
-        
-        pdf.output(output_path)
-        return output_path
+        pdf.use_style("footer")
+        pdf.cell(0, 10, text, align="C")
+
+    def _add_heading(self, pdf: _NotesPDF, title: str):
+        pdf.use_style("heading")
+        pdf.cell(0, 10, title, **NEXT_LINE)
+        pdf.use_style("body")
 
     def _add_section(self, pdf, title, content):
-        pdf.set_font("Helvetica", "B", 14)
-        pdf.set_text_color(52, 73, 94)
-        pdf.cell(0, 10, title, ln=True)
-        pdf.set_font("Helvetica", "", 11)
-        pdf.set_text_color(0, 0, 0)
+        self._add_heading(pdf, title)
         try:
             # Truncate very long content to prevent layout issues
-            if len(content) > 5000:
-                content = content[:5000] + "... [truncated]"
-            pdf.multi_cell(0, 7, content)
+            if len(content) > MAX_SECTION_CHARS:
+                content = content[:MAX_SECTION_CHARS] + "... [truncated]"
+            pdf.multi_cell(0, 7, content, **NEXT_LINE)
         except Exception as e:
             print(f"PDF Rendering Error in section '{title}': {e}")
-            pdf.cell(0, 7, "[Content rendering error]", ln=True)
+            pdf.cell(0, 7, "[Content rendering error]", **NEXT_LINE)
         pdf.ln(5)
 
-    def _add_list_section(self, pdf, title, items):
-        pdf.set_font("Helvetica", "B", 14)
-        pdf.set_text_color(52, 73, 94)
-        pdf.cell(0, 10, title, ln=True)
-        pdf.set_font("Helvetica", "", 11)
-        pdf.set_text_color(0, 0, 0)
+    def _add_list_section(self, pdf, title, items: List[Any]):
+        self._add_heading(pdf, title)
         for item in items:
             try:
-                item_text = str(item)[:500]  # Limit item length
-                pdf.multi_cell(0, 7, f"- {item_text}")
+                item_text = str(item)[:MAX_ITEM_CHARS]  # Limit item length
+                pdf.multi_cell(0, 7, f"- {item_text}", **NEXT_LINE)
             except Exception as e:
                 print(f"PDF Rendering Error for list item: {e}")
-                pdf.cell(0, 7, "- [Item rendering error]", ln=True)
+                pdf.cell(0, 7, "- [Item rendering error]", **NEXT_LINE)
         pdf.ln(5)
 
-    def _add_dict_section(self, pdf, title, items):
-        pdf.set_font("Helvetica", "B", 14)
-        pdf.set_text_color(52, 73, 94)
-        pdf.cell(0, 10, title, ln=True)
-        pdf.set_font("Helvetica", "", 11)
-        pdf.set_text_color(0, 0, 0)
+    def _add_dict_section(self, pdf, title, items: Dict[str, Any]):
+        self._add_heading(pdf, title)
         for term, definition in items.items():
-            pdf.set_font("Helvetica", "B", 11)
+            pdf.use_style("term")
             pdf.write(7, f"{term}: ")
-            pdf.set_font("Helvetica", "", 11)
+            pdf.use_style("body")
             pdf.write(7, f"{definition}\n")
         pdf.ln(5)
 
-    def _clean_text(self, text: str) -> str:
-        """Nuclear Option: Strip ALL non-ASCII characters to save PDF generation."""
+    def _clean_text(self, text: str, unicode_fonts: bool = False) -> str:
+        """
+        With the embedded Unicode fonts, keep everything they can draw.
+        Otherwise strip ALL non-ASCII characters so the core fonts can encode the text.
+        """
         if not isinstance(text, str):
             return str(text)
-        
-        # 1. Common character mapping
-        replacements = {
-            "\u2022": "-", "\u2013": "-", "\u2014": "--",
-            "\u2018": "'", "\u2019": "'", "\u201c": '"', "\u201d": '"',
-            "\u2026": "..."
-        }
-        for old, new in replacements.items():
-            text = text.replace(old, new)
-        
-        # 2. Regex to remove ANY remaining non-ASCII character
-        # This prevents the "Character \uXXXX is outside the range" error
-        return re.sub(r'[^\x00-\x7f]', r'', text)
-
-    def _sanitize_data(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        if text.isascii():
+            return text
+        if unicode_fonts:
+            return font_cache.filter_supported(text)
+        return _NON_ASCII.sub('', text.translate(_TRANSLATION))
+
+    def _sanitize_data(self, data: Dict[str, Any], unicode_fonts: bool = False) -> Dict[str, Any]:
         """Deeply sanitize dictionaries and lists for PDF safety."""
         if isinstance(data, str):
-            return self._clean_text(data)
+            return self._clean_text(data, unicode_fonts)
         if isinstance(data, list):
-            return [self._sanitize_data(item) for item in data]
+            return [self._sanitize_data(item, unicode_fonts) for item in data]
         if isinstance(data, dict):
-            return {self._clean_text(k): self._sanitize_data(v) for k, v in data.items()}
+            return {self._clean_text(k, unicode_fonts): self._sanitize_data(v, unicode_fonts) for k, v in data.items()}
         return data
 
-pdf_service = PDFService()
+pdf_service = container.lazy("pdf_service")
@@ -0,0 +1,255 @@
+import os
+import sys
+import hmac
+import asyncio
+import time
+import uuid
+import tempfile
+import threading
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+# On-demand profiling. Disabled unless PROFILING_TOKEN is set; the token is what makes a caller an admin.
+PROFILING_TOKEN = os.environ.get("PROFILING_TOKEN")
+PROFILE_DIR = os.environ.get("PROFILE_DIR", os.path.join(tempfile.gettempdir(), "mentorai-profiles"))
+PROFILE_INTERVAL_MS = float(os.environ.get("PROFILE_INTERVAL_MS", 5))
+PROFILE_MAX_SECONDS = int(os.environ.get("PROFILE_MAX_SECONDS", 300))
+PROFILE_KEEP = int(os.environ.get("PROFILE_KEEP", 50))
+
+# Header only: a query parameter would put the token in access logs and proxy logs
+PROFILE_HEADER = "x-profile-token"
+# The admin endpoints authenticate with the same header; never profile them
+ADMIN_PATH_PREFIX = "/admin/profiling"
+
+_BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Leaf frames of threads that are parked, not working. Dropping them keeps the flamegraph about CPU time.
+_IDLE_FRAMES = {
+    ("selectors.py", "select"),
+    ("threading.py", "wait"),
+    ("threading.py", "_wait_for_tstate_lock"),
+    ("queue.py", "get"),
+    ("thread.py", "_worker"),
+    ("socketserver.py", "serve_forever"),
+}
+
+
+def _frame_label(code) -> str:
+    path = code.co_filename
+    if path.startswith(_BACKEND_DIR):
+        path = os.path.relpath(path, _BACKEND_DIR)
+    elif "site-packages" in path:
+        path = path.split("site-packages" + os.sep, 1)[1]
+    else:
+        path = os.path.basename(path)
+    return f"{code.co_name} ({path})"
+
+
+class SamplingProfiler:
+    """
+    Wall-clock stack sampler: a daemon thread snapshots every other thread's Python
+    stack each interval and counts identical stacks. Output is the collapsed-stack
+    format read by flamegraph.pl, speedscope and inferno.
+    """
+
+    def __init__(self, interval_ms: float = PROFILE_INTERVAL_MS, max_seconds: int = PROFILE_MAX_SECONDS):
+        self.interval = interval_ms / 1000
+        self.max_seconds = max_seconds
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self.started_at = 0.0
+        self.duration = 0.0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+
+    def start(self) -> "SamplingProfiler":
+        self.started_at = time.time()
+        self._thread.start()
+        return self
+
+    def stop(self) -> "SamplingProfiler":
+        self._stop.set()
+        if self._thread.is_alive() and threading.current_thread() is not self._thread:
+            self._thread.join()
+        return self
+
+    def _run(self):
+        own = threading.get_ident()
+        deadline = time.monotonic() + self.max_seconds
+        while not self._stop.wait(self.interval) and time.monotonic() < deadline:
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own:
+                    continue
+                code = frame.f_code
+                if (os.path.basename(code.co_filename), code.co_name) in _IDLE_FRAMES:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(_frame_label(frame.f_code))
+                    frame = frame.f_back
+                self.stacks[";".join(reversed(stack))] += 1
+            self.samples += 1
+        self.duration = time.time() - self.started_at
+
+    def collapsed(self) -> str:
+        return "\n".join(f"{stack} {count}" for stack, count in self.stacks.most_common()) + "\n"
+
+
+class ProfilingService:
+    """
+    Runs at most one profile per worker at a time and stores results as .collapsed files.
+
+    Concurrent requests on the same worker share the sampled threads, so a
+    per-request profile can include their frames too; reproduce on a quiet worker
+    when that matters.
+    """
+
+    def __init__(self, token: Optional[str] = PROFILING_TOKEN, profile_dir: str = PROFILE_DIR, keep: int = PROFILE_KEEP):
+        self.token = token
+        self.profile_dir = profile_dir
+        self.keep = keep
+        self._active: Optional[SamplingProfiler] = None
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.token)
+
+    def authorized(self, token: Optional[str]) -> bool:
+        return self.enabled and token is not None and hmac.compare_digest(token, self.token)
+
+    def begin(self) -> Optional[SamplingProfiler]:
+        """Start sampling, or return None if this worker is already profiling."""
+        with self._lock:
+            if self._active is not None:
+                return None
+            self._active = SamplingProfiler().start()
+            return self._active
+
+    def finish(self, profiler: SamplingProfiler, profile_id: str, label: str) -> str:
+        profiler.stop()
+        with self._lock:
+            if self._active is profiler:
+                self._active = None
+        return self._save(profile_id, label, profiler)
+
+    def start_window(self, seconds: int) -> Optional[str]:
+        """Profile the whole worker for a time window. Returns the id the profile will be stored under."""
+        profiler = self.begin()
+        if profiler is None:
+            return None
+        profile_id = uuid.uuid4().hex[:12]
+        seconds = max(1, min(seconds, PROFILE_MAX_SECONDS))
+        timer = threading.Timer(seconds, self.finish, args=(profiler, profile_id, f"window-{seconds}s"))
+        timer.daemon = True
+        timer.start()
+        return profile_id
+
+    def _save(self, profile_id: str, label: str, profiler: SamplingProfiler) -> str:
+        os.makedirs(self.profile_dir, exist_ok=True)
+        safe_label = "".join(c if c.isalnum() or c in "-_" else "_" for c in label)[:80]
+        path = os.path.join(self.profile_dir, f"{int(profiler.started_at)}_{profile_id}_{safe_label}.collapsed")
+        with open(path, "w") as f:
+            f.write(profiler.collapsed())
+        print(f"Profile {profile_id} saved: {profiler.samples} samples over {profiler.duration:.2f}s -> {path}")
+        self._prune()
+        return path
+
+    def _prune(self):
+        profiles = [path for _, path, _ in sorted(self._stat_files())]
+        for path in profiles[: max(0, len(profiles) - self.keep)]:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                continue  # Another worker pruned it first
+
+    def _files(self) -> List[str]:
+        if not os.path.isdir(self.profile_dir):
+            return []
+        return [os.path.join(self.profile_dir, f) for f in os.listdir(self.profile_dir) if f.endswith(".collapsed")]
+
+    def _stat_files(self) -> List[Tuple[float, str, int]]:
+        """(mtime, path, size) of each profile. PROFILE_DIR is shared by all workers, so files can vanish mid-listing."""
+        files = []
+        for path in self._files():
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            files.append((stat.st_mtime, path, stat.st_size))
+        return files
+
+    def list_profiles(self) -> List[Dict[str, object]]:
+        profiles = []
+        for _, path, size in sorted(self._stat_files(), reverse=True):
+            started, profile_id, label = os.path.basename(path)[: -len(".collapsed")].split("_", 2)
+            profiles.append({"id": profile_id, "label": label, "started_at": int(started), "bytes": size})
+        return profiles
+
+    def read_profile(self, profile_id: str) -> Optional[str]:
+        for path in self._files():
+            if os.path.basename(path).split("_", 2)[1] == profile_id:
+                try:
+                    with open(path) as f:
+                        return f.read()
+                except FileNotFoundError:
+                    return None
+        return None
+
+    @property
+    def active(self) -> bool:
+        return self._active is not None
+
+
+class ProfilingMiddleware:
+    """
+    Profiles a single request when it carries the admin token in the X-Profile-Token
+    header. The response gets an X-Profile-Id header; fetch the flamegraph from
+    /admin/profiling/profiles/<id> once it completes.
+
+    Only added to the app when profiling is enabled, and it keeps no profiler
+    state between requests.
+    """
+
+    def __init__(self, app, profiling: "ProfilingService" = None):
+        self.app = app
+        self.profiling = profiling or profiling_service
+
+    def _requested_token(self, scope) -> Optional[str]:
+        for name, value in scope.get("headers", ()):
+            if name == PROFILE_HEADER.encode():
+                return value.decode()
+        return None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"].startswith(ADMIN_PATH_PREFIX):
+            await self.app(scope, receive, send)
+            return
+        token = self._requested_token(scope)
+        if token is None or not self.profiling.authorized(token):
+            await self.app(scope, receive, send)
+            return
+
+        profiler = self.profiling.begin()
+        profile_id = uuid.uuid4().hex[:12]
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                if profiler is None:
+                    headers.append((b"x-profile-status", b"busy"))
+                else:
+                    headers.append((b"x-profile-id", profile_id.encode()))
+                message = dict(message, headers=headers)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            if profiler is not None:
+                # Joining the sampler thread and writing the file block; keep them off the event loop
+                await asyncio.to_thread(self.profiling.finish, profiler, profile_id,
+                                        f"{scope['method']}-{scope['path'].strip('/')}")
+
+
+profiling_service = ProfilingService()
@@ -0,0 +1,147 @@
+import os
+import re
+import math
+from typing import Callable, Dict, Optional, Tuple
+
+# Prompt budgeting. LLM_CONTEXT_BUDGET caps prompt + completion per call below the model's
+# context window (Groq's per-minute token limits bite long before a 128k window does).
+LLM_CONTEXT_BUDGET = int(os.environ.get("LLM_CONTEXT_BUDGET", 12000))
+
+# Context window and maximum completion length per model
+MODEL_LIMITS: Dict[str, Tuple[int, int]] = {
+    "llama-3.3-70b-versatile": (131072, 32768),
+    "llama-3.1-8b-instant": (131072, 131072),
+    "gemma2-9b-it": (8192, 8192),
+}
+DEFAULT_MODEL_LIMITS = (8192, 4096)
+
+# Chat templates wrap each message in role/header tokens
+MESSAGE_OVERHEAD_TOKENS = 8
+# Estimates are deliberately pessimistic; this margin covers what the heuristic still misses
+SAFETY_MARGIN = 1.1
+
+TRUNCATION_MARKER = "\n[... content truncated to fit the model's context ...]"
+
+# Approximates the Llama 3 / cl100k pre-tokenizer: contractions, letter runs with an optional
+# leading space, numbers in groups of up to three digits, punctuation runs, whitespace runs
+_PIECES = re.compile(
+    r"'(?:s|t|re|ve|m|ll|d)"
+    r"| ?[^\W\d_]+"
+    r"| ?\d{1,3}"
+    r"| ?[^\s\w]+[\r\n]*"
+    r"|\s*[\r\n]+"
+    r"|\s+",
+    re.IGNORECASE,
+)
+
+
+def _piece_tokens(piece: str) -> int:
+    stripped = piece.strip()
+    if not stripped:
+        return 1
+    if stripped[0].isalpha():
+        if not stripped.isascii():
+            # Non-Latin scripts get far fewer merges: roughly one token per two characters
+            return math.ceil(len(stripped) / 2)
+        # Common words are a single token; longer or rarer ones split into ~4-character chunks
+        return 1 if len(stripped) <= 6 else math.ceil(len(stripped) / 4)
+    if stripped.isdigit():
+        return 1
+    return math.ceil(len(stripped) / 2)
+
+
+def count_tokens(text: str) -> int:
+    """Local approximation of the model tokenizer. Errs on the high side for English and JSON."""
+    if not text:
+        return 0
+    return sum(_piece_tokens(m.group()) for m in _PIECES.finditer(text))
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> Tuple[str, bool]:
+    """
+    Cut text to at most max_tokens (estimated), preferring a paragraph or sentence
+    boundary near the cut. Returns (text, was_truncated).
+    """
+    if max_tokens <= 0:
+        return "", bool(text)
+    used = 0
+    cut = None
+    for match in _PIECES.finditer(text):
+        used += _piece_tokens(match.group())
+        if used > max_tokens:
+            cut = match.start()
+            break
+    if cut is None:
+        return text, False
+
+    # Back off to a natural boundary if one is close (within the last 10% of what we keep)
+    window_start = int(cut * 0.9)
+    for boundary in ("\n\n", "\n", ". ", "; ", ", ", " "):
+        position = text.rfind(boundary, window_start, cut)
+        if position != -1:
+            cut = position + len(boundary.rstrip())
+            break
+    return text[:cut].rstrip(), True
+
+
+class BuiltPrompt:
+    def __init__(self, system: str, user: str, prompt_tokens: int, max_output_tokens: int,
+                 truncated: bool, content_tokens: int, content_budget: int):
+        self.system = system
+        self.user = user
+        self.prompt_tokens = prompt_tokens
+        self.max_output_tokens = max_output_tokens
+        self.truncated = truncated
+        self.content_tokens = content_tokens
+        self.content_budget = content_budget
+
+    def messages(self):
+        return [
+            {"role": "system", "content": self.system},
+            {"role": "user", "content": self.user},
+        ]
+
+
+class PromptBuilder:
+    """
+    Packs variable content (syllabus text, transcripts, summaries) into a prompt template
+    so that prompt + reserved completion fits the model's budget.
+
+    Templates are callables taking the content string, so the fixed part can be measured
+    by rendering with empty content, and the content cut to whatever is left.
+    """
+
+    def __init__(self, model: str, context_budget: int = LLM_CONTEXT_BUDGET):
+        context_window, max_completion = MODEL_LIMITS.get(model, DEFAULT_MODEL_LIMITS)
+        self.model = model
+        self.context_tokens = min(context_window, context_budget)
+        self.max_completion_tokens = max_completion
+
+    def build(self, template: Callable[[str], str], content: str = "", system_prompt: str = "",
+              output_tokens: int = 1024, max_content_tokens: Optional[int] = None) -> BuiltPrompt:
+        """
+        Render template(content), truncating content so the whole call fits.
+        output_tokens is the completion length to reserve (and request as max_tokens).
+        max_content_tokens optionally caps the content below what the budget allows.
+        """
+        output_tokens = min(output_tokens, self.max_completion_tokens, self.context_tokens // 2)
+        fixed = count_tokens(template("")) + count_tokens(system_prompt) + 2 * MESSAGE_OVERHEAD_TOKENS
+        available = int((self.context_tokens - output_tokens) / SAFETY_MARGIN) - fixed
+        if max_content_tokens is not None:
+            available = min(available, max_content_tokens)
+
+        content_tokens = count_tokens(content)
+        truncated = False
+        if content_tokens > available:
+            content, truncated = truncate_to_tokens(content, max(0, available - count_tokens(TRUNCATION_MARKER)))
+            content += TRUNCATION_MARKER
+        user = template(content)
+        return BuiltPrompt(
+            system=system_prompt,
+            user=user,
+            prompt_tokens=count_tokens(user) + count_tokens(system_prompt) + 2 * MESSAGE_OVERHEAD_TOKENS,
+            max_output_tokens=output_tokens,
+            truncated=truncated,
+            content_tokens=content_tokens,
+            content_budget=max(0, available),
+        )
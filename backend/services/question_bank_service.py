@@ -0,0 +1,214 @@
+import os
+import time
+import random
+import asyncio
+import threading
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Set, Tuple
+from services.supabase_service import supabase_service
+from services.question_service import BLOOM_LEVELS, QUESTION_SIMILARITY_THRESHOLD, keywords, shingles, similarity
+
+# Reuse stored questions before asking the LLM for new ones
+QUESTION_BANK_ENABLED = os.environ.get("QUESTION_BANK_ENABLED", "true").lower() == "true"
+# Seconds between incremental refreshes from the assessments table
+QUESTION_BANK_TTL = float(os.environ.get("QUESTION_BANK_TTL", 300))
+# "all" shares every stored question across teachers; "teacher" only reuses a teacher's own
+QUESTION_BANK_SCOPE = os.environ.get("QUESTION_BANK_SCOPE", "all")
+QUESTION_BANK_PAGE_SIZE = int(os.environ.get("QUESTION_BANK_PAGE_SIZE", 500))
+
+# Assessments stored before difficulty was recorded were generated with the request default
+DEFAULT_DIFFICULTY = "Medium"
+# Share of a unit's words a question must match to stand in when the exact unit runs short
+RELATED_UNIT_OVERLAP = 0.5
+
+
+def _norm(value: Any) -> str:
+    return " ".join(str(value or "").lower().split())
+
+
+class QuestionBankService:
+    """
+    In-memory inverted index over the questions stored in assessments.data.
+
+    Each question is indexed under subject, unit, difficulty, Bloom level, teacher and
+    the keywords of its text and unit. The index is loaded on first use and then
+    refreshed incrementally (rows newer than the last load) every QUESTION_BANK_TTL
+    seconds, in the background while requests keep picking from the current index;
+    assessments stored by this worker are added as soon as they are saved.
+    Sample questions from failed generations are never indexed.
+    """
+
+    def __init__(self, enabled: bool = QUESTION_BANK_ENABLED, ttl: float = QUESTION_BANK_TTL,
+                 scope: str = QUESTION_BANK_SCOPE, page_size: int = QUESTION_BANK_PAGE_SIZE):
+        self.enabled = enabled
+        self.ttl = ttl
+        self.scope = scope
+        self.page_size = page_size
+        self.entries: Dict[str, Dict[str, Any]] = {}
+        self.index: Dict[Tuple[str, str], Set[str]] = defaultdict(set)
+        self._rows: Set[str] = set()
+        # Papers filled from the bank are stored again; their questions are indexed once
+        self._texts: Set[Tuple[str, str, str]] = set()
+        self._loaded_until: Optional[str] = None
+        self._refreshed_at = 0.0
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._background_refresh: Optional[asyncio.Future] = None
+        self.lookups = 0
+        self.requested = 0
+        self.served = 0
+
+    def add_assessment(self, row: Dict[str, Any]) -> int:
+        """Index the questions of one assessments row. Returns how many were added."""
+        data = row.get("data") or {}
+        row_id = str(row.get("id") or "")
+        if not row_id or not isinstance(data, dict) or "note" in data:
+            return 0
+        with self._lock:
+            if row_id in self._rows:
+                return 0
+            self._rows.add(row_id)
+            subject, unit = _norm(row.get("subject")), _norm(row.get("unit"))
+            difficulty = _norm(data.get("difficulty") or DEFAULT_DIFFICULTY)
+            unit_words = keywords(unit)
+            added = 0
+            for position, question in enumerate(data.get("questions") or []):
+                if not isinstance(question, dict) or not question.get("question_text"):
+                    continue
+                text = str(question["question_text"])
+                fingerprint = (subject, unit, _norm(text))
+                if fingerprint in self._texts:
+                    continue
+                self._texts.add(fingerprint)
+                entry_id = f"{row_id}:{position}"
+                words = keywords(text)
+                self.entries[entry_id] = {
+                    "question": {k: v for k, v in question.items() if k != "question_number"},
+                    "bloom": _norm(question.get("bloom_level")),
+                    "keywords": words | unit_words,
+                    "shingles": shingles(text),
+                }
+                for key in (("subject", subject), ("unit", unit), ("difficulty", difficulty),
+                            ("bloom", _norm(question.get("bloom_level"))), ("teacher", str(row.get("teacher_id") or ""))):
+                    self.index[key].add(entry_id)
+                for word in words | unit_words:
+                    self.index[("keyword", word)].add(entry_id)
+                added += 1
+            return added
+
+    def refresh(self, force: bool = False):
+        """Load assessments stored since the last refresh (everything, the first time)."""
+        if not force and time.monotonic() - self._refreshed_at < self.ttl:
+            return
+        with self._refresh_lock:
+            # Another request may have refreshed while this one waited
+            if force or time.monotonic() - self._refreshed_at >= self.ttl:
+                self._load_new_rows()
+
+    def _load_new_rows(self):
+        client = supabase_service.get_client()
+        cursor, newest = None, self._loaded_until
+        while True:
+            query = client.table("assessments").select("id,teacher_id,subject,unit,data,created_at")
+            if cursor:
+                # Next page: (created_at, id) > last row, so rows sharing a timestamp are read exactly once
+                created_at, row_id = cursor
+                query = query.gte("created_at", created_at) \
+                    .or_(f'created_at.gt."{created_at}",and(created_at.eq."{created_at}",id.gt.{row_id})')
+            elif self._loaded_until:
+                # gte, not gt: rows sharing the boundary timestamp are skipped by id instead of lost
+                query = query.gte("created_at", self._loaded_until)
+            rows = query.order("created_at").order("id").limit(self.page_size).execute().data or []
+            for row in rows:
+                self.add_assessment(row)
+                newest = max(newest or "", row.get("created_at") or "")
+            if len(rows) < self.page_size:
+                break
+            cursor = (rows[-1]["created_at"], rows[-1]["id"])
+        self._loaded_until = newest
+        self._refreshed_at = time.monotonic()
+
+    def _candidates(self, subject: str, unit: str, difficulty: str, teacher_id: Optional[str]) -> List[str]:
+        pool = self.index.get(("subject", _norm(subject)), set()) & self.index.get(("difficulty", _norm(difficulty)), set())
+        if self.scope == "teacher":
+            pool = pool & self.index.get(("teacher", str(teacher_id or "")), set())
+        exact = pool & self.index.get(("unit", _norm(unit)), set())
+
+        # Same subject, differently worded unit ("Quadratics" vs "Quadratic Equations"): rank by shared words
+        unit_words = keywords(unit)
+        related: Dict[str, int] = defaultdict(int)
+        for word in unit_words:
+            for entry_id in self.index.get(("keyword", word), set()) & pool:
+                if entry_id not in exact:
+                    related[entry_id] += 1
+        needed = max(1, int(len(unit_words) * RELATED_UNIT_OVERLAP + 0.5)) if unit_words else None
+        close = [e for e, hits in sorted(related.items(), key=lambda item: -item[1]) if needed and hits >= needed]
+        return list(exact) + close
+
+    def pick(self, subject: str, unit: str, difficulty: str, count: int, teacher_id: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Up to count stored questions for this subject/unit/difficulty, spread across Bloom
+        levels, shuffled so repeated requests don't return the same paper, near-duplicates removed.
+        """
+        with self._lock:
+            candidates = self._candidates(subject, unit, difficulty, teacher_id)
+            by_level: Dict[str, List[str]] = defaultdict(list)
+            for entry_id in candidates:
+                by_level[self.entries[entry_id]["bloom"]].append(entry_id)
+            for entry_ids in by_level.values():
+                random.shuffle(entry_ids)
+            order = [_norm(level) for level in BLOOM_LEVELS]
+            levels = sorted(by_level, key=lambda level: order.index(level) if level in order else len(order))
+
+            picked: List[Dict[str, Any]] = []
+            seen = []
+            while len(picked) < count and any(by_level.values()):
+                for level in levels:
+                    if not by_level[level] or len(picked) >= count:
+                        continue
+                    entry = self.entries[by_level[level].pop()]
+                    if any(similarity(entry["shingles"], other) >= QUESTION_SIMILARITY_THRESHOLD for other in seen):
+                        continue
+                    seen.append(entry["shingles"])
+                    picked.append(dict(entry["question"]))
+            return picked
+
+    async def select(self, subject: str, unit: str, difficulty: str, count: int,
+                     teacher_id: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Pick from the bank (loaded on first use, refreshed in the background when due).
+        Never raises: a bank failure just means everything is generated.
+        """
+        if not self.enabled or count <= 0:
+            return []
+        try:
+            if not self._refreshed_at:
+                # First use: there is nothing to pick from until the bank is loaded
+                await asyncio.to_thread(self.refresh)
+            elif time.monotonic() - self._refreshed_at >= self.ttl and self._background_refresh is None:
+                self._background_refresh = asyncio.ensure_future(asyncio.to_thread(self.refresh))
+                self._background_refresh.add_done_callback(self._background_refresh_done)
+            questions = self.pick(subject, unit, difficulty, count, teacher_id)
+        except Exception as e:
+            print(f"Question bank lookup failed: {str(e)}")
+            questions = []
+        self.lookups += 1
+        self.requested += count
+        self.served += len(questions)
+        return questions
+
+    def _background_refresh_done(self, task: asyncio.Future):
+        self._background_refresh = None
+        if not task.cancelled() and task.exception() is not None:
+            print(f"Question bank refresh failed: {str(task.exception())}")
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "indexed_questions": len(self.entries),
+            "lookups": self.lookups,
+            "requested": self.requested,
+            "served": self.served,
+        }
+
+
+question_bank_service = QuestionBankService()
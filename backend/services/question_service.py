@@ -0,0 +1,101 @@
+import os
+import re
+from typing import Any, Callable, Dict, FrozenSet, List, Optional
+from models.schemas import AssessmentQuestion
+
+# Questions whose word-bigram Jaccard similarity reaches this are treated as the same question
+QUESTION_SIMILARITY_THRESHOLD = float(os.environ.get("QUESTION_SIMILARITY_THRESHOLD", 0.6))
+
+BLOOM_LEVELS = ["Remember", "Understand", "Apply", "Analyze", "Evaluate", "Create"]
+
+_WORD = re.compile(r"[a-z0-9]+")
+_STOPWORDS = frozenset("""
+a an and are as at be by can do does for from has have how i if in into is it its of on or that the their
+then there these this to was what when where which who why will with you your based following material
+""".split())
+
+
+def keywords(text: str) -> FrozenSet[str]:
+    """Content words of text: lower-cased, no stopwords, at least three characters."""
+    return frozenset(w for w in _WORD.findall(text.lower()) if len(w) > 2 and w not in _STOPWORDS)
+
+
+def shingles(text: str) -> FrozenSet[str]:
+    """Word bigrams over the content words (single words for very short texts)."""
+    words = [w for w in _WORD.findall(text.lower()) if w not in _STOPWORDS]
+    if len(words) < 3:
+        return frozenset(words)
+    return frozenset(f"{a} {b}" for a, b in zip(words, words[1:]))
+
+
+def similarity(a: FrozenSet[str], b: FrozenSet[str]) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+class QuestionCollector:
+    """
+    Gathers questions from one or more LLM replies in arrival order. Each offered item is
+    validated, dropped if it is a near-duplicate of one already accepted, numbered, and
+    passed to on_question; nothing is accepted past limit.
+    """
+
+    def __init__(self, limit: int, on_question: Optional[Callable[[Dict[str, Any]], None]] = None,
+                 threshold: float = QUESTION_SIMILARITY_THRESHOLD):
+        self.limit = limit
+        self.on_question = on_question
+        self.threshold = threshold
+        self.questions: List[Dict[str, Any]] = []
+        self.duplicates = 0
+        self._shingles: List[FrozenSet[str]] = []
+        self._offered = set()
+
+    @property
+    def full(self) -> bool:
+        return len(self.questions) >= self.limit
+
+    def offer(self, item: Any) -> bool:
+        if self.full:
+            return False
+        try:
+            question = AssessmentQuestion.model_validate(item)
+        except ValueError:
+            return False
+        if question.question_text in self._offered:
+            return False  # the same item again, e.g. from the final reply after streaming
+        self._offered.add(question.question_text)
+        candidate = shingles(question.question_text)
+        if any(similarity(candidate, seen) >= self.threshold for seen in self._shingles):
+            self.duplicates += 1
+            return False
+        question.question_number = len(self.questions) + 1
+        data = question.model_dump(exclude_none=True)
+        self.questions.append(data)
+        self._shingles.append(candidate)
+        if self.on_question:
+            self.on_question(data)
+        return True
+
+
+def shard_plan(num_questions: int, shard_size: int) -> List[Dict[str, Any]]:
+    """
+    Split a paper into shards of at most shard_size questions, each focused on a slice of
+    Bloom's levels (and, past six shards, on one question type) so parallel replies overlap less.
+    """
+    shards = max(1, -(-num_questions // shard_size))
+    if shards == 1:
+        return [{"count": num_questions, "focus": ""}]
+    base, extra = divmod(num_questions, shards)
+    plan = []
+    for i in range(shards):
+        if shards <= len(BLOOM_LEVELS):
+            levels = BLOOM_LEVELS[i * len(BLOOM_LEVELS) // shards:(i + 1) * len(BLOOM_LEVELS) // shards]
+            focus = (f"For this part of the paper, use only the {' and '.join(levels)} "
+                     f"level{'s' if len(levels) > 1 else ''} of Bloom's Taxonomy.")
+        else:
+            level = BLOOM_LEVELS[i % len(BLOOM_LEVELS)]
+            kind = ("Multiple Choice (MCQ)", "Short Answer")[(i // len(BLOOM_LEVELS)) % 2]
+            focus = f"For this part of the paper, write only {kind} questions at the {level} level of Bloom's Taxonomy."
+        plan.append({"count": base + (1 if i < extra else 0), "focus": focus})
+    return plan
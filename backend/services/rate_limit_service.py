@@ -0,0 +1,181 @@
+import os
+import time
+import threading
+from typing import Dict, Optional, Tuple
+
+# Login throttle configuration: bucket capacity (burst) and refill window in seconds
+LOGIN_IP_BURST = int(os.environ.get("LOGIN_IP_BURST", 20))
+LOGIN_IP_WINDOW = float(os.environ.get("LOGIN_IP_WINDOW", 60))
+LOGIN_ACCOUNT_BURST = int(os.environ.get("LOGIN_ACCOUNT_BURST", 5))
+LOGIN_ACCOUNT_WINDOW = float(os.environ.get("LOGIN_ACCOUNT_WINDOW", 300))
+RATE_LIMIT_MAX_KEYS = int(os.environ.get("RATE_LIMIT_MAX_KEYS", 100000))
+RATE_LIMIT_REDIS_URL = os.environ.get("RATE_LIMIT_REDIS_URL")
+
+
+class InMemoryBucketBackend:
+    """
+    Per-process token buckets. Used by default and as the local stand-in for the shared backend.
+    """
+
+    def __init__(self, max_keys: int = RATE_LIMIT_MAX_KEYS):
+        self.max_keys = max_keys
+        self._buckets: Dict[str, Tuple[float, float]] = {}  # key -> (tokens, last_refill)
+        self._lock = threading.Lock()
+
+    def take(self, key: str, capacity: int, refill_per_sec: float, now: float) -> Tuple[bool, float]:
+        """Consume one token. Returns (allowed, seconds until the next token is available)."""
+        with self._lock:
+            tokens, last = self._buckets.get(key, (float(capacity), now))
+            tokens = min(float(capacity), tokens + (now - last) * refill_per_sec)
+            if tokens >= 1:
+                self._buckets[key] = (tokens - 1, now)
+                allowed, retry_after = True, 0.0
+            else:
+                self._buckets[key] = (tokens, now)
+                allowed, retry_after = False, (1 - tokens) / refill_per_sec
+            if len(self._buckets) > self.max_keys:
+                self._evict(capacity, refill_per_sec, now)
+            return allowed, retry_after
+
+    def refund(self, key: str, capacity: int, refill_per_sec: float, now: float):
+        """Give back one token taken from key, up to capacity."""
+        with self._lock:
+            if key in self._buckets:
+                tokens, last = self._buckets[key]
+                tokens = min(float(capacity), tokens + (now - last) * refill_per_sec)
+                self._buckets[key] = (min(float(capacity), tokens + 1), now)
+
+    def _evict(self, capacity: int, refill_per_sec: float, now: float):
+        # Buckets that have refilled completely carry no state worth keeping
+        full_after = capacity / refill_per_sec
+        stale = [k for k, (_, last) in self._buckets.items() if now - last >= full_after]
+        for k in stale:
+            del self._buckets[k]
+        # Still over the limit under a spray of unique keys: drop the oldest half
+        if len(self._buckets) > self.max_keys:
+            oldest = sorted(self._buckets.items(), key=lambda item: item[1][1])
+            for k, _ in oldest[: len(oldest) // 2]:
+                del self._buckets[k]
+
+
+class RedisBucketBackend:
+    """
+    Token buckets shared across workers/hosts. The refill-and-take runs as a
+    single Lua script so concurrent attempts cannot both spend the last token.
+    """
+
+    _SCRIPT = """
+    local capacity = tonumber(ARGV[1])
+    local rate = tonumber(ARGV[2])
+    local now = tonumber(ARGV[3])
+    local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+    local tokens = tonumber(state[1]) or capacity
+    local ts = tonumber(state[2]) or now
+    tokens = math.min(capacity, tokens + (now - ts) * rate)
+    local allowed = 0
+    if tokens >= 1 then
+        tokens = tokens - 1
+        allowed = 1
+    end
+    redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+    redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate))
+    return {allowed, tostring(tokens)}
+    """
+
+    _REFUND_SCRIPT = """
+    local capacity = tonumber(ARGV[1])
+    local rate = tonumber(ARGV[2])
+    local now = tonumber(ARGV[3])
+    local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+    if not state[1] then
+        return 0
+    end
+    local tokens = math.min(capacity, tonumber(state[1]) + (now - tonumber(state[2])) * rate)
+    redis.call('HSET', KEYS[1], 'tokens', math.min(capacity, tokens + 1), 'ts', now)
+    return 1
+    """
+
+    def __init__(self, url: str):
+        import redis  # Optional dependency, only needed when RATE_LIMIT_REDIS_URL is set
+        self.client = redis.Redis.from_url(url)
+        self._take = self.client.register_script(self._SCRIPT)
+        self._refund = self.client.register_script(self._REFUND_SCRIPT)
+
+    def take(self, key: str, capacity: int, refill_per_sec: float, now: float) -> Tuple[bool, float]:
+        allowed, tokens = self._take(keys=[f"ratelimit:{key}"], args=[capacity, refill_per_sec, now])
+        if int(allowed):
+            return True, 0.0
+        return False, (1 - float(tokens)) / refill_per_sec
+
+    def refund(self, key: str, capacity: int, refill_per_sec: float, now: float):
+        self._refund(keys=[f"ratelimit:{key}"], args=[capacity, refill_per_sec, now])
+
+
+class RateLimitService:
+    def __init__(self, backend=None):
+        self.backend = backend or self._default_backend()
+        self.dropped: Dict[str, int] = {"ip": 0, "account": 0}
+        self.allowed = 0
+        self._counter_lock = threading.Lock()
+
+    @staticmethod
+    def _default_backend():
+        if RATE_LIMIT_REDIS_URL:
+            try:
+                return RedisBucketBackend(RATE_LIMIT_REDIS_URL)
+            except Exception as e:
+                print(f"Warning: Redis rate limit backend unavailable ({e}). Falling back to in-memory buckets.")
+        return InMemoryBucketBackend()
+
+    def check_login(self, client_ip: Optional[str], account: Optional[str]) -> Tuple[bool, float]:
+        """
+        Consume one attempt for the client IP and the target account.
+        Returns (allowed, retry_after_seconds). Cheap enough to run before any DB or hashing work.
+        """
+        now = time.time()
+        checks = (
+            ("ip", client_ip or "unknown", LOGIN_IP_BURST, LOGIN_IP_WINDOW),
+            ("account", (account or "").strip().lower(), LOGIN_ACCOUNT_BURST, LOGIN_ACCOUNT_WINDOW),
+        )
+        for scope, key, burst, window in checks:
+            if not key:
+                continue
+            try:
+                allowed, retry_after = self.backend.take(f"login:{scope}:{key}", burst, burst / window, now)
+            except Exception as e:
+                # Fail open: a limiter outage must not lock everyone out
+                print(f"Rate limiter error ({scope}): {str(e)}")
+                continue
+            if not allowed:
+                with self._counter_lock:
+                    self.dropped[scope] += 1
+                return False, retry_after
+        with self._counter_lock:
+            self.allowed += 1
+        return True, 0.0
+
+    def login_succeeded(self, account: Optional[str]):
+        """
+        Refund the account token of a successful login, so the account bucket only counts
+        failed attempts and nobody can lock an account out by logging in to it repeatedly.
+        The IP bucket keeps counting every attempt.
+        """
+        key = (account or "").strip().lower()
+        if not key:
+            return
+        try:
+            self.backend.refund(f"login:account:{key}", LOGIN_ACCOUNT_BURST,
+                                LOGIN_ACCOUNT_BURST / LOGIN_ACCOUNT_WINDOW, time.time())
+        except Exception as e:
+            print(f"Rate limiter error (account refund): {str(e)}")
+
+    def stats(self) -> Dict[str, int]:
+        with self._counter_lock:
+            return {
+                "allowed": self.allowed,
+                "dropped_ip": self.dropped["ip"],
+                "dropped_account": self.dropped["account"],
+            }
+
+
+rate_limit_service = RateLimitService()
@@ -0,0 +1,280 @@
+import json
+from typing import Any, Dict, List, Optional, Tuple, Type
+from pydantic import BaseModel, ValidationError
+
+# LLM replies are validated against a Pydantic model per response shape. Replies that
+# don't parse are repaired locally first; only what repair can't fix is re-prompted.
+
+_OPEN_QUOTES = {'"': '"', "'": "'", "“": "”", "‘": "’"}
+_CLOSERS = {"{": "}", "[": "]"}
+_VALID_ESCAPES = set('"\\/bfnrtu')
+_LITERALS = {"true": "true", "false": "false", "null": "null", "True": "true", "False": "false",
+             "None": "null", "NaN": "null", "undefined": "null"}
+_DELIMITERS = set(",:{}[]\"'") | {"“", "”", "‘", "’"}
+
+
+class LLMResponseError(ValueError):
+    """A reply that is still unusable after local repair. Keeps the raw text for re-prompting and logs."""
+
+    def __init__(self, message: str, raw: str):
+        super().__init__(message)
+        self.raw = raw
+
+
+def _can_follow_string(text: str, j: int) -> bool:
+    """Whether text[j:] (j at the first non-space character after a quote) can follow a closed string."""
+    n = len(text)
+    if j >= n or text[j] in ":}]":
+        return True
+    if text[j] != ",":
+        return False
+    # After a comma: the next member or element, i.e. a string, container, number, literal or unquoted key
+    k = j + 1
+    while k < n and text[k] in " \t\r\n":
+        k += 1
+    if k >= n or text[k] in _OPEN_QUOTES or text[k] in "{[]}-/" or text[k].isdigit():
+        return True
+    end = k
+    while end < n and text[end] not in _DELIMITERS and text[end] not in "\r\n":
+        end += 1
+    word = text[k:end].strip()
+    return word in _LITERALS or (end < n and text[end] == ":" and word.isidentifier())
+
+
+def _read_string(text: str, i: int, quote: str) -> Tuple[str, int]:
+    """
+    Read a string literal starting after its opening quote. Returns (json literal, index after it).
+    A quote only closes the string when what follows can follow a JSON string, so unescaped
+    quotes inside text ("What is "x"?", "He said "stop", then left") survive. Raw control
+    characters are escaped. Text that itself reads like the end of a string and the start of
+    the next member ("He said "stop", "go" then") is still split there: the reply loses
+    those words, or fails validation and is re-prompted.
+    """
+    closing = _OPEN_QUOTES[quote]
+    chars: List[str] = []
+    n = len(text)
+    while i < n:
+        c = text[i]
+        if c == "\\" and i + 1 < n:
+            nxt = text[i + 1]
+            if nxt in _VALID_ESCAPES:
+                chars.append(c + nxt)
+            else:
+                # \' and friends: keep the character, drop the invalid escape
+                chars.append(json.dumps(nxt)[1:-1])
+            i += 2
+            continue
+        if c == closing or (quote == '"' and c in "”"):
+            j = i + 1
+            while j < n and text[j] in " \t\r\n":
+                j += 1
+            if _can_follow_string(text, j):
+                return '"' + "".join(chars) + '"', i + 1
+        if c == '"':
+            chars.append('\\"')
+        elif c < " ":
+            chars.append(json.dumps(c)[1:-1])
+        else:
+            chars.append(c)
+        i += 1
+    raise EOFError
+
+
+def repair_json(text: str) -> str:
+    """
+    Rewrite an almost-JSON LLM reply into valid JSON. Handles markdown fences and prose
+    around the value, single or curly quotes, unquoted keys, Python literals, comments,
+    trailing commas, unescaped quotes and newlines in strings, and output cut off by the
+    token limit (incomplete members are dropped and open brackets closed).
+    """
+    start = min((i for i in (text.find("{"), text.find("[")) if i != -1), default=-1)
+    if start == -1:
+        raise ValueError("no JSON object in reply")
+    text = text[start:]
+
+    out: List[str] = []
+    # Open containers: [bracket, expecting_key, len(out) after the last complete member]
+    stack: List[list] = []
+
+    def value_done():
+        if stack:
+            stack[-1][2] = len(out)
+
+    i, n = 0, len(text)
+    while i < n:
+        c = text[i]
+        if c in " \t\r\n":
+            i += 1
+        elif c in "{[":
+            out.append(c)
+            stack.append([c, c == "{", len(out)])
+            i += 1
+        elif c in "}]":
+            if not stack:
+                break
+            if out and out[-1] == ",":
+                out.pop()
+            bracket = stack.pop()[0]
+            out.append(_CLOSERS[bracket])
+            i += 1
+            if not stack:
+                break
+            value_done()
+        elif c == ",":
+            if out and out[-1] not in ",{[":
+                out.append(",")
+            if stack and stack[-1][0] == "{":
+                stack[-1][1] = True
+            i += 1
+        elif c == ":":
+            out.append(":")
+            if stack:
+                stack[-1][1] = False
+            i += 1
+        elif c in _OPEN_QUOTES:
+            try:
+                literal, i = _read_string(text, i + 1, c)
+            except EOFError:
+                break
+            out.append(literal)
+            if stack and stack[-1][0] == "{" and stack[-1][1]:
+                continue  # a key, not a finished member
+            value_done()
+        elif c == "/" and text.startswith("//", i):
+            end = text.find("\n", i)
+            i = n if end == -1 else end
+        elif c == "/" and text.startswith("/*", i):
+            end = text.find("*/", i)
+            i = n if end == -1 else end + 2
+        else:
+            j = i
+            while j < n and text[j] not in _DELIMITERS and text[j] not in "\r\n" and not text.startswith("//", j):
+                j += 1
+            token = text[i:j].strip()
+            i = max(j, i + 1)
+            if not token:
+                continue
+            if stack and stack[-1][0] == "{" and stack[-1][1]:
+                out.append(json.dumps(token))  # unquoted key
+                continue
+            if token in _LITERALS:
+                out.append(_LITERALS[token])
+            else:
+                try:
+                    json.loads(token)
+                    out.append(token)
+                except ValueError:
+                    # Template residue like 0-100 or "total estimate": keep it as text
+                    out.append(json.dumps(token))
+            if j >= n:
+                break  # a number cut off mid-way can't be trusted
+            value_done()
+
+    if stack:
+        # Truncated reply: drop the member in progress (and containers it leaves empty), then
+        # close everything still open
+        del out[stack[-1][2]:]
+        while len(stack) > 1 and out[-1] == stack[-1][0]:
+            stack.pop()
+            del out[stack[-1][2]:]
+        while out and out[-1] == ",":
+            out.pop()
+        for bracket, _, _ in reversed(stack):
+            out.append(_CLOSERS[bracket])
+    return "".join(out)
+
+
+def load_json(text: str) -> Tuple[Any, bool]:
+    """Parse a reply, repairing it if needed. Returns (value, was_repaired)."""
+    try:
+        return json.loads(text), False
+    except ValueError:
+        pass
+    try:
+        return json.loads(repair_json(text)), True
+    except ValueError as e:
+        raise LLMResponseError(f"Reply is not valid JSON: {e}", text)
+
+
+def parse_response(text: str, model: Type[BaseModel]) -> Tuple[Dict[str, Any], bool]:
+    """
+    Parse and validate a complete reply against model. Returns (data, was_repaired) where
+    data is the validated model dumped back to a dict, so callers keep working with dicts.
+    """
+    data, repaired = load_json(text)
+    if isinstance(data, list) and "questions" in model.model_fields:
+        data = {"questions": data}
+    try:
+        return model.model_validate(data).model_dump(exclude_none=True), repaired
+    except ValidationError as e:
+        errors = "; ".join(f"{'.'.join(str(p) for p in err['loc']) or 'reply'}: {err['msg']}" for err in e.errors()[:5])
+        raise LLMResponseError(f"Reply does not match {model.__name__}: {errors}", text)
+
+
+class StreamingJSONParser:
+    """
+    Incremental scanner over a streamed reply. feed() returns the elements of the top-level
+    array under array_key (e.g. "questions") that completed in that chunk, so callers can
+    use each item before the rest of the reply has been generated. The full text is kept
+    for parse_response() at the end.
+    """
+
+    def __init__(self, array_key: Optional[str] = None):
+        self.array_key = array_key
+        self.text = ""
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._string_start = 0
+        self._last_key: Optional[str] = None
+        self._array_depth: Optional[int] = None
+        self._item_start: Optional[int] = None
+        self.items_emitted = 0
+
+    def feed(self, chunk: str) -> List[Any]:
+        self.text += chunk
+        items = []
+        text = self.text
+        for i in range(self._pos, len(text)):
+            c = text[i]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif c == "\\":
+                    self._escape = True
+                elif c == '"':
+                    self._in_string = False
+                    if self._depth == 1:
+                        self._last_key = text[self._string_start + 1:i]
+                continue
+            if c == '"':
+                self._in_string = True
+                self._string_start = i
+            elif c in "{[":
+                self._depth += 1
+                if c == "[" and self._depth == 2 and self._last_key == self.array_key and self.array_key:
+                    self._array_depth = 2
+                elif self._array_depth is not None and self._depth == self._array_depth + 1 and self._item_start is None:
+                    self._item_start = i
+            elif c in "}]":
+                if self._item_start is not None and self._depth == self._array_depth + 1:
+                    item = self._parse_item(text[self._item_start:i + 1])
+                    self._item_start = None
+                    if item is not None:
+                        items.append(item)
+                        self.items_emitted += 1
+                if self._array_depth is not None and self._depth == self._array_depth:
+                    self._array_depth = None
+                self._depth -= 1
+            elif c == "," and self._depth == 1:
+                self._last_key = None
+        self._pos = len(text)
+        return items
+
+    @staticmethod
+    def _parse_item(fragment: str) -> Optional[Any]:
+        try:
+            return load_json(fragment)[0]
+        except LLMResponseError:
+            return None
@@ -0,0 +1,128 @@
+import os
+import threading
+from typing import Any, Dict, Iterable, Optional
+from services.prompt_service import PromptBuilder
+from services.template_service import LOCAL_GENERATORS
+
+# Model tiers. "default" is the large model every call used to go to; "fast" is a smaller hosted
+# model (optionally on its own OpenAI-compatible endpoint, e.g. a self-hosted server); "local"
+# answers from a rule-based template without any network call (see template_service).
+LLM_MODEL = os.environ.get("LLM_MODEL", "llama-3.3-70b-versatile")
+LLM_FAST_MODEL = os.environ.get("LLM_FAST_MODEL", "llama-3.1-8b-instant")
+LLM_FAST_BASE_URL = os.environ.get("LLM_FAST_BASE_URL")
+LLM_FAST_API_KEY = os.environ.get("LLM_FAST_API_KEY")
+# Per-method overrides, e.g. "generate_feedback=local,analyze_syllabus=default". "*=default" sends
+# everything to the large model (routing off); "*=local" uses a template wherever there is one
+# and the fast model elsewhere. Later entries win.
+LLM_ROUTES = os.environ.get("LLM_ROUTES", "")
+
+DEFAULT, FAST, LOCAL = "default", "fast", "local"
+TIERS = (DEFAULT, FAST, LOCAL)
+
+# AIService call purposes -> tier. Everything stays on the large model except the attendance summary,
+# which follows from two counts; moving a method to the fast model changes its output quality, so that
+# is an explicit LLM_ROUTES choice. A method routed to local whose input the template can't handle
+# (e.g. learning gaps without per-topic scores) is sent to the fast tier instead.
+DEFAULT_ROUTES: Dict[str, str] = {
+    "analyze_marks": DEFAULT,
+    "generate_assessment": DEFAULT,
+    "generate_assessment_from_content": DEFAULT,
+    "generate_feedback": DEFAULT,
+    "generate_feedback_batch": DEFAULT,
+    "analyze_syllabus": DEFAULT,
+    "analyze_attendance": LOCAL,
+    "analyze_lecture": DEFAULT,
+    "detect_learning_gaps": DEFAULT,
+    "parse_attendance_text": DEFAULT,
+    "analyze_engagement": DEFAULT,
+}
+LOCAL_FALLBACK = FAST
+
+
+class ModelTier:
+    def __init__(self, name: str, model: str, client: Any):
+        self.name = name
+        self.model = model
+        self.client = client
+        # Each model gets prompts packed for its own context window
+        self.prompts = PromptBuilder(model)
+
+
+def parse_routes(spec: str, local_purposes: Iterable[str] = ()) -> Dict[str, str]:
+    """DEFAULT_ROUTES with the "purpose=tier,..." overrides in spec applied. Raises ValueError on a bad entry."""
+    routes = dict(DEFAULT_ROUTES)
+    local_purposes = set(local_purposes)
+    for entry in (e.strip() for e in spec.split(",")):
+        if not entry:
+            continue
+        purpose, _, tier = (part.strip() for part in entry.partition("="))
+        if tier not in TIERS:
+            raise ValueError(f"LLM_ROUTES: unknown tier '{tier}' in '{entry}'. Tiers: {', '.join(TIERS)}")
+        if purpose == "*":
+            routes = {p: tier if tier != LOCAL or p in local_purposes else LOCAL_FALLBACK for p in routes}
+            continue
+        if purpose not in DEFAULT_ROUTES:
+            raise ValueError(f"LLM_ROUTES: unknown method '{purpose}'. Methods: {', '.join(DEFAULT_ROUTES)}")
+        if tier == LOCAL and purpose not in local_purposes:
+            raise ValueError(f"LLM_ROUTES: {purpose} has no local template. Local: {', '.join(sorted(local_purposes))}")
+        routes[purpose] = tier
+    return routes
+
+
+# Parsed at import so a bad LLM_ROUTES stops the worker at startup (main imports this module)
+# instead of failing every AI request once ai_service is first built
+ROUTES = parse_routes(LLM_ROUTES, LOCAL_GENERATORS)
+
+
+class ModelRouter:
+    """
+    Decides which tier answers each AIService call and keeps per-method, per-tier totals of
+    calls, wall time and tokens, so the effect of a routing change can be read off directly
+    (stats(), the benchmarks) as well as from the Prometheus series.
+    """
+
+    def __init__(self, tiers: Dict[str, ModelTier], spec: Optional[str] = None,
+                 local_purposes: Iterable[str] = LOCAL_GENERATORS):
+        self.tiers = tiers
+        self.local_purposes = frozenset(local_purposes)
+        self.routes = dict(ROUTES) if spec is None else parse_routes(spec, self.local_purposes)
+        # purpose -> tier -> totals
+        self._totals: Dict[str, Dict[str, Dict[str, float]]] = {}
+        self._lock = threading.Lock()
+
+    def route(self, purpose: str) -> str:
+        """Tier name for a purpose; purposes outside DEFAULT_ROUTES (e.g. plain completions) use the default tier."""
+        return self.routes.get(purpose, DEFAULT)
+
+    def hosted(self, purpose: str) -> ModelTier:
+        """The model tier that answers purpose when it goes over the network."""
+        tier = self.route(purpose)
+        return self.tiers[LOCAL_FALLBACK if tier == LOCAL else tier]
+
+    def record_call(self, purpose: str, tier: str, seconds: float):
+        with self._lock:
+            totals = self._entry(purpose, tier)
+            totals["calls"] += 1
+            totals["seconds"] += seconds
+
+    def record_tokens(self, purpose: str, tier: str, prompt: Optional[int], completion: Optional[int]):
+        with self._lock:
+            totals = self._entry(purpose, tier)
+            totals["requests"] += 1
+            totals["prompt_tokens"] += prompt or 0
+            totals["completion_tokens"] += completion or 0
+
+    def _entry(self, purpose: str, tier: str) -> Dict[str, float]:
+        return self._totals.setdefault(purpose, {}).setdefault(
+            tier, {"calls": 0, "seconds": 0.0, "requests": 0, "prompt_tokens": 0, "completion_tokens": 0})
+
+    def stats(self) -> Dict[str, Dict[str, Dict[str, float]]]:
+        """
+        purpose -> tier -> {"calls", "seconds", "requests", "prompt_tokens", "completion_tokens"}.
+        A call is one structured answer (per shard or pack for assessments and bulk feedback);
+        requests counts the model round trips behind them, re-prompts included, so local calls
+        have no requests.
+        """
+        with self._lock:
+            return {purpose: {tier: dict(totals) for tier, totals in tiers.items()}
+                    for purpose, tiers in self._totals.items()}
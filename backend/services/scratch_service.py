@@ -0,0 +1,162 @@
+import os
+import time
+import shutil
+import tempfile
+import threading
+from typing import BinaryIO, Dict, Optional
+from services.metrics_service import metrics_service
+
+# Scratch space configuration
+SCRATCH_DIR = os.environ.get("SCRATCH_DIR", os.path.join(tempfile.gettempdir(), "mentorai-scratch"))
+SCRATCH_QUOTA_MB = int(os.environ.get("SCRATCH_QUOTA_MB", 2048))
+# Usage is counted per process, so each uvicorn worker gets its share of SCRATCH_QUOTA_MB
+# (serve.py sets this from --workers); a single process gets all of it
+SCRATCH_WORKER_QUOTA_MB = int(os.environ.get("SCRATCH_WORKER_QUOTA_MB", SCRATCH_QUOTA_MB))
+# Directories still on disk after this long are treated as abandoned and may be reaped even if never released
+SCRATCH_MAX_AGE_SECONDS = int(os.environ.get("SCRATCH_MAX_AGE_SECONDS", 3600))
+
+COPY_CHUNK_SIZE = 1024 * 1024
+
+
+class ScratchQuotaExceeded(Exception):
+    """Raised when a write would push scratch usage over the worker's disk quota."""
+
+
+class ScratchDir:
+    def __init__(self, path: str):
+        self.path = path
+        self.bytes = 0
+        self.created_at = time.time()
+        self.last_used = self.created_at
+
+    def file_path(self, filename: str) -> str:
+        # Never trust client-supplied names as paths
+        return os.path.join(self.path, os.path.basename(filename) or "upload")
+
+
+class ScratchService:
+    """
+    Per-request scratch directories under one root with a byte quota.
+
+    The quota covers the directories this process created: workers sharing the root each
+    get a share of the total (SCRATCH_WORKER_QUOTA_MB). When a write would exceed it,
+    directories idle for longer than max_age_seconds (leaked by crashed or abandoned
+    requests) are reaped least-recently-used first, until enough bytes are freed, before
+    the write is rejected.
+    """
+
+    def __init__(self, root: str = SCRATCH_DIR, quota_bytes: int = SCRATCH_WORKER_QUOTA_MB * 1024 * 1024,
+                 max_age_seconds: int = SCRATCH_MAX_AGE_SECONDS):
+        self.root = root
+        self.quota_bytes = quota_bytes
+        self.max_age_seconds = max_age_seconds
+        self._dirs: Dict[str, ScratchDir] = {}
+        self._bytes_in_use = 0
+        self._lock = threading.Lock()
+        self._swept = False
+        self.reaped_dirs = 0
+        self.quota_rejections = 0
+
+    def _sweep_orphans(self):
+        """Remove stale directories left behind by previous processes (crashes, restarts)."""
+        os.makedirs(self.root, exist_ok=True)
+        cutoff = time.time() - self.max_age_seconds
+        for name in os.listdir(self.root):
+            path = os.path.join(self.root, name)
+            # Other workers share the root, so only touch directories nobody has used recently
+            try:
+                if path not in self._dirs and os.path.getmtime(path) < cutoff:
+                    shutil.rmtree(path, ignore_errors=True)
+            except OSError:
+                continue
+
+    def create(self) -> ScratchDir:
+        with self._lock:
+            if not self._swept:
+                self._sweep_orphans()
+                self._swept = True
+            scratch = ScratchDir(tempfile.mkdtemp(dir=self.root))
+            self._dirs[scratch.path] = scratch
+            return scratch
+
+    def reserve(self, scratch: ScratchDir, num_bytes: int):
+        """Account for bytes about to be written, reaping LRU directories if needed."""
+        with self._lock:
+            if self._bytes_in_use + num_bytes > self.quota_bytes:
+                self._reap(self._bytes_in_use + num_bytes - self.quota_bytes)
+            if self._bytes_in_use + num_bytes > self.quota_bytes:
+                self.quota_rejections += 1
+                raise ScratchQuotaExceeded(
+                    f"Server scratch space is full ({self._bytes_in_use // (1024 * 1024)} MB of "
+                    f"{self.quota_bytes // (1024 * 1024)} MB in use). Please try again shortly."
+                )
+            self._bytes_in_use += num_bytes
+            scratch.bytes += num_bytes
+            scratch.last_used = time.time()
+
+    @metrics_service.timed("scratch_service.save_upload")
+    def save_upload(self, scratch: ScratchDir, upload: BinaryIO, filename: str, size_hint: Optional[int] = None) -> str:
+        """Stream an upload into the scratch dir, failing fast if it cannot fit."""
+        reserved = 0
+        if size_hint:
+            self.reserve(scratch, size_hint)
+            reserved = size_hint
+        path = scratch.file_path(filename)
+        written = 0
+        with open(path, "wb") as buffer:
+            while True:
+                chunk = upload.read(COPY_CHUNK_SIZE)
+                if not chunk:
+                    break
+                written += len(chunk)
+                if written > reserved:
+                    self.reserve(scratch, written - reserved)
+                    reserved = written
+                buffer.write(chunk)
+        if reserved > written:
+            self._unreserve(scratch, reserved - written)
+        return path
+
+    def _unreserve(self, scratch: ScratchDir, num_bytes: int):
+        with self._lock:
+            if scratch.path in self._dirs:
+                self._bytes_in_use -= num_bytes
+            scratch.bytes -= num_bytes
+
+    def track_file(self, scratch: ScratchDir, path: str):
+        """Account for a file generated inside the scratch dir (e.g. a rendered PDF)."""
+        self.reserve(scratch, os.path.getsize(path))
+
+    def release(self, scratch: ScratchDir):
+        """Delete the directory. Meant to run as a background task once the response has been sent."""
+        with self._lock:
+            self._remove(scratch)
+
+    def _remove(self, scratch: ScratchDir):
+        shutil.rmtree(scratch.path, ignore_errors=True)
+        if self._dirs.pop(scratch.path, None) is not None:
+            self._bytes_in_use -= scratch.bytes
+
+    def _reap(self, needed: int):
+        cutoff = time.time() - self.max_age_seconds
+        idle = sorted((s for s in self._dirs.values() if s.last_used < cutoff), key=lambda s: s.last_used)
+        freed = 0
+        for scratch in idle:
+            if freed >= needed:
+                break
+            freed += scratch.bytes
+            self._remove(scratch)
+            self.reaped_dirs += 1
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "bytes_in_use": self._bytes_in_use,
+                "quota_bytes": self.quota_bytes,
+                "active_dirs": len(self._dirs),
+                "reaped_dirs": self.reaped_dirs,
+                "quota_rejections": self.quota_rejections,
+            }
+
+
+scratch_service = ScratchService()
@@ -0,0 +1,213 @@
+import os
+import re
+import time
+import asyncio
+import threading
+import unicodedata
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+from services.supabase_service import supabase_service
+from services.data_service import data_service
+
+# Seconds the students directory (used to place names seen for the first time) is reused
+STUDENT_DIRECTORY_TTL = float(os.environ.get("STUDENT_DIRECTORY_TTL", 300))
+STUDENT_DIRECTORY_PAGE_SIZE = int(os.environ.get("STUDENT_DIRECTORY_PAGE_SIZE", 1000))
+# Resolved (teacher, alias) pairs kept in memory per worker
+STUDENT_ALIAS_CACHE_SIZE = int(os.environ.get("STUDENT_ALIAS_CACHE_SIZE", 50000))
+# Keys per in.(...) filter, so lookups stay well under URL length limits
+_IN_CHUNK = 100
+
+_WORD = re.compile(r"[^\W_]+")
+
+
+def alias_key(name: Any) -> str:
+    """
+    Canonical form of a student name as written in an upload. Case, accents, punctuation,
+    spacing and word order don't matter ("SMITH, John" and "john  smith" share a key).
+    An email address is its own key.
+    """
+    text = unicodedata.normalize("NFKD", str(name or "").strip().casefold())
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    if "@" in text and " " not in text:
+        return text
+    return " ".join(sorted(_WORD.findall(text)))
+
+
+class StudentService:
+    """
+    Maps the free-text student names in attendance sheets, marks and feedback to students.id.
+
+    A name is resolved once per teacher and remembered in student_aliases (and in memory), so
+    ingested rows carry student_id and reads become indexed lookups on it. A name seen for the
+    first time is matched against the students directory by canonical name or email; a name
+    that matches no student, or several, stays unresolved (student_id NULL) and is retried
+    on the next upload instead of being guessed.
+    """
+
+    def __init__(self, directory_ttl: float = STUDENT_DIRECTORY_TTL, page_size: int = STUDENT_DIRECTORY_PAGE_SIZE,
+                 cache_size: int = STUDENT_ALIAS_CACHE_SIZE):
+        self.directory_ttl = directory_ttl
+        self.page_size = page_size
+        self.cache_size = cache_size
+        # (teacher id, alias key) -> student id
+        self._aliases: Dict[Tuple[str, str], str] = {}
+        # alias key of a student's name or email -> ids of the students it fits
+        self._directory: Dict[str, Set[str]] = {}
+        self._directory_at: Optional[float] = None
+        self._lock = threading.Lock()
+        self._directory_lock = threading.Lock()
+        self.lookups = 0
+        self.alias_hits = 0
+        self.resolved = 0
+        self.unresolved = 0
+
+    async def resolve(self, names: Iterable[str], teacher_id: Optional[str]) -> Dict[str, Optional[str]]:
+        """student_id (None if unresolved) for each distinct name. Never raises: rows just keep their names."""
+        keys = {name: alias_key(name) for name in set(names) if name}
+        scope = teacher_id or ""
+        with self._lock:
+            found = {key: self._aliases[(scope, key)] for key in set(keys.values()) if (scope, key) in self._aliases}
+        self.lookups += len(keys)
+        self.alias_hits += sum(1 for key in keys.values() if key in found)
+        missing = {key for key in keys.values() if key and key not in found}
+        if missing:
+            try:
+                found.update(await asyncio.to_thread(self._resolve_keys, teacher_id, missing))
+            except Exception as e:
+                print(f"Student resolution failed for {len(missing)} names: {str(e)}")
+        result = {name: found.get(key) for name, key in keys.items()}
+        self.resolved += sum(1 for key in missing if key in found)
+        self.unresolved += sum(1 for key in missing if key not in found)
+        return result
+
+    async def resolve_one(self, name: str, teacher_id: Optional[str]) -> Optional[str]:
+        return (await self.resolve([name], teacher_id)).get(name)
+
+    async def get_students(self, student_ids: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+        """id -> {"id", "name", "email"} for the given students, in concurrent queries of 100 ids."""
+        ids = sorted(set(student_ids))
+        queries = [data_service.table("students").select("id, name, email").in_("id", ids[i:i + _IN_CHUNK])
+                   for i in range(0, len(ids), _IN_CHUNK)]
+        results = await data_service.gather(*queries)
+        return {row["id"]: row for result in results for row in result.data or []}
+
+    async def claim_unresolved(self, table: str, student_id: str) -> int:
+        """
+        Link the rows of table (feedback, attendance) that were stored with student_id NULL
+        under this student's name or email, e.g. because they registered after the upload or
+        on another worker within the directory TTL. A name another student shares is left
+        alone, as at ingestion. Returns how many rows were linked.
+        """
+        students = await data_service.table("students").select("id, name, email").eq("id", student_id).execute()
+        if not students.data:
+            return 0
+        student = students.data[0]
+        keys = {alias_key(student.get("name")), alias_key(student.get("email"))} - {""}
+        words = _WORD.findall(str(student.get("name") or ""))
+        if not keys or not words:
+            return 0
+        # Candidates by the longest name word (trigram index), then the exact canonical-name check
+        word = max(words, key=len)
+        email = str(student.get("email") or "").replace('"', "")
+        candidates = await data_service.table(table).select("id, student_name, teacher_id").is_("student_id", "null") \
+            .or_(f'student_name.ilike."%{word}%",student_name.ilike."{email}"').execute()
+        rows = [row for row in candidates.data or [] if alias_key(row["student_name"]) in keys]
+        if not rows:
+            return 0
+        namesakes = await data_service.table("students").select("id, name").ilike("name", f"%{word}%") \
+            .neq("id", student_id).execute()
+        shared = {alias_key(other.get("name")) for other in namesakes.data or []}
+        rows = [row for row in rows if alias_key(row["student_name"]) not in shared]
+        if not rows:
+            return 0
+        await data_service.table(table).update({"student_id": student_id}) \
+            .in_("id", [row["id"] for row in rows]).is_("student_id", "null").execute()
+        aliases = {(row["teacher_id"], alias_key(row["student_name"])) for row in rows if row.get("teacher_id")}
+        if aliases:
+            try:
+                await data_service.table("student_aliases").upsert(
+                    [{"teacher_id": teacher, "alias_key": key, "student_id": student_id} for teacher, key in aliases],
+                    on_conflict="teacher_id,alias_key", ignore_duplicates=True).execute()
+            except Exception as e:
+                print(f"Storing {len(aliases)} student aliases failed: {str(e)}")
+            with self._lock:
+                self._aliases.update({alias: student_id for alias in aliases})
+        self.resolved += len(rows)
+        return len(rows)
+
+    def add_student(self, row: Dict[str, Any]):
+        """Make a just-registered student resolvable by this worker before the next directory reload."""
+        if self._directory_at is not None and row.get("id"):
+            with self._lock:
+                self._add_to_directory(row)
+
+    def _resolve_keys(self, teacher_id: Optional[str], keys: Set[str]) -> Dict[str, str]:
+        found: Dict[str, str] = {}
+        client = supabase_service.get_client()
+        ordered = sorted(keys)
+        if teacher_id:
+            for i in range(0, len(ordered), _IN_CHUNK):
+                rows = client.table("student_aliases").select("alias_key, student_id") \
+                    .eq("teacher_id", teacher_id).in_("alias_key", ordered[i:i + _IN_CHUNK]).execute().data or []
+                found.update({row["alias_key"]: row["student_id"] for row in rows})
+
+        new_aliases = []
+        remaining = keys - found.keys()
+        if remaining:
+            self._load_directory()
+            with self._lock:
+                for key in remaining:
+                    matches = self._directory.get(key, set())
+                    if len(matches) == 1:
+                        found[key] = next(iter(matches))
+                        new_aliases.append({"teacher_id": teacher_id, "alias_key": key, "student_id": found[key]})
+        if new_aliases and teacher_id:
+            try:
+                client.table("student_aliases").upsert(
+                    new_aliases, on_conflict="teacher_id,alias_key", ignore_duplicates=True).execute()
+            except Exception as e:
+                print(f"Storing {len(new_aliases)} student aliases failed: {str(e)}")
+
+        with self._lock:
+            if len(self._aliases) + len(found) > self.cache_size:
+                self._aliases.clear()
+            self._aliases.update({(teacher_id or "", key): student_id for key, student_id in found.items()})
+        return found
+
+    def _load_directory(self):
+        """(Re)load the students directory when it is older than directory_ttl."""
+        with self._directory_lock:
+            if self._directory_at is not None and time.monotonic() - self._directory_at < self.directory_ttl:
+                return
+            client = supabase_service.get_client()
+            rows: List[Dict[str, Any]] = []
+            offset = 0
+            while True:
+                page = client.table("students").select("id, name, email").order("id") \
+                    .range(offset, offset + self.page_size - 1).execute().data or []
+                rows.extend(page)
+                if len(page) < self.page_size:
+                    break
+                offset += self.page_size
+            with self._lock:
+                self._directory = {}
+                for row in rows:
+                    self._add_to_directory(row)
+            self._directory_at = time.monotonic()
+
+    def _add_to_directory(self, row: Dict[str, Any]):
+        for key in {alias_key(row.get("name")), alias_key(row.get("email"))}:
+            if key:
+                self._directory.setdefault(key, set()).add(row["id"])
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "cached_aliases": len(self._aliases),
+            "directory_keys": len(self._directory),
+            "lookups": self.lookups,
+            "alias_hits": self.alias_hits,
+            "resolved": self.resolved,
+            "unresolved": self.unresolved,
+        }
+
+
+student_service = StudentService()
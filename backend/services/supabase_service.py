@@ -1,8 +1,88 @@
 import os
-from supabase import create_client, Client
-from dotenv import load_dotenv
+import time
+from typing import Any, Optional
+from services.container import container
+from services.metrics_service import metrics_service
+
+# Builder methods that decide what kind of query a chain runs
+_OPERATIONS = {"select", "insert", "update", "upsert", "delete"}
+
+# Async client: connections shared by every request in the worker, and the per-request timeout in seconds
+SUPABASE_POOL_SIZE = int(os.environ.get("SUPABASE_POOL_SIZE", 20))
+SUPABASE_TIMEOUT = float(os.environ.get("SUPABASE_TIMEOUT", 30))
+
+
+class _TimedQuery:
+    """Wraps a PostgREST request builder so .execute() is recorded per table and operation."""
+
+    __slots__ = ("_builder", "_table", "_operation")
+
+    def __init__(self, builder: Any, table: str, operation: Optional[str] = None):
+        self._builder = builder
+        self._table = table
+        self._operation = operation
+
+    def execute(self, *args, **kwargs):
+        start = time.perf_counter()
+        outcome = "error"
+        try:
+            result = self._builder.execute(*args, **kwargs)
+            outcome = "ok"
+            return result
+        finally:
+            metrics_service.observe_supabase(self._table, self._operation or "select",
+                                             time.perf_counter() - start, outcome)
+
+    def __getattr__(self, name: str) -> Any:
+        attr = getattr(self._builder, name)
+        if not callable(attr):
+            return attr
+
+        def chained(*args, **kwargs):
+            result = attr(*args, **kwargs)
+            if hasattr(result, "execute"):
+                operation = self._operation or (name if name in _OPERATIONS else None)
+                return type(self)(result, self._table, operation)
+            return result
+        return chained
+
+
+class _TimedAsyncQuery(_TimedQuery):
+    """_TimedQuery for the async PostgREST client, whose .execute() is awaited."""
+
+    __slots__ = ()
+
+    async def execute(self, *args, **kwargs):
+        start = time.perf_counter()
+        outcome = "error"
+        try:
+            result = await self._builder.execute(*args, **kwargs)
+            outcome = "ok"
+            return result
+        finally:
+            metrics_service.observe_supabase(self._table, self._operation or "select",
+                                             time.perf_counter() - start, outcome)
+
+
+class _TimedClient:
+    """Supabase client whose table()/from_()/rpc() queries are timed; everything else passes through."""
+
+    def __init__(self, client: Any, query_class: type = _TimedQuery):
+        self._client = client
+        self._query_class = query_class
+
+    def table(self, table_name: str) -> _TimedQuery:
+        return self._query_class(self._client.table(table_name), table_name)
+
+    def from_(self, table_name: str) -> _TimedQuery:
+        return self._query_class(self._client.from_(table_name), table_name)
+
+    def rpc(self, fn: str, *args, **kwargs) -> _TimedQuery:
+        return self._query_class(self._client.rpc(fn, *args, **kwargs), fn, "rpc")
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._client, name)
 
-load_dotenv()
 
 class SupabaseService:
     def __init__(self):
@@ -10,9 +90,30 @@ class SupabaseService:
         key: str = os.environ.get("SUPABASE_SERVICE_ROLE_KEY")
         if not url or not key:
             raise ValueError("SUPABASE_URL and SUPABASE_SERVICE_ROLE_KEY must be set")
-        self.client: Client = create_client(url, key)
+        from supabase import create_client  # Deferred: pulls in the whole Supabase SDK
+        self.url = url
+        self.key = key
+        self.raw_client = create_client(url, key)
+        self.client = _TimedClient(self.raw_client) if metrics_service.enabled else self.raw_client
 
-    def get_client(self) -> Client:
+    def get_client(self) -> Any:
         return self.client
 
-supabase_service = SupabaseService()
+    def create_async_client(self, pool_size: int = SUPABASE_POOL_SIZE, timeout: float = SUPABASE_TIMEOUT) -> Any:
+        """
+        PostgREST client for async code, on one pooled httpx connection pool. Its connections belong
+        to the event loop that first uses them: create one per loop and aclose() it when done.
+        """
+        import httpx
+        from postgrest import AsyncPostgrestClient
+
+        headers = {"apikey": self.key, "Authorization": f"Bearer {self.key}",
+                   "Accept": "application/json", "Content-Type": "application/json"}
+        rest_url = f"{self.url.rstrip('/')}/rest/v1"
+        http_client = httpx.AsyncClient(
+            base_url=rest_url, headers=headers, timeout=timeout, follow_redirects=True,
+            limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size))
+        client = AsyncPostgrestClient(rest_url, headers=headers, http_client=http_client)
+        return _TimedClient(client, _TimedAsyncQuery) if metrics_service.enabled else client
+
+supabase_service = container.lazy("supabase_service")
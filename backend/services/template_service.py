@@ -0,0 +1,90 @@
+from typing import Any, Callable, Dict, List, Optional
+
+# Local stand-ins for LLM calls whose answer follows from a few numbers. Each returns a dict in the
+# shape of the method's response model, or None when the input is outside what the template covers
+# (the call then goes to a hosted model instead). Nothing here touches the network.
+
+# Absence rate (%) from which a class's attendance is a concern, and from which it is serious
+ABSENCE_WATCH_PERCENT = 10
+ABSENCE_RISK_PERCENT = 20
+
+
+def _join(items: List[str]) -> str:
+    items = [str(item) for item in items if str(item).strip()]
+    if len(items) <= 1:
+        return "".join(items)
+    return ", ".join(items[:-1]) + " and " + items[-1]
+
+
+def attendance_analysis(total_records: Optional[int], absent_count: Optional[int]) -> Optional[Dict[str, Any]]:
+    if not total_records or absent_count is None:
+        return None
+    rate = 100 * absent_count / total_records
+    if rate >= ABSENCE_RISK_PERCENT:
+        risk = (f"Attendance is a serious concern: {absent_count} of {total_records} records ({rate:.0f}%) are absences. "
+                "At this level missed lessons are likely to show up in assessment results.")
+        suggestions = ["Identify the students behind most absences and contact them or their guardians",
+                       "Share notes or recordings of missed lessons",
+                       "Schedule catch-up sessions before the next assessment"]
+    elif rate >= ABSENCE_WATCH_PERCENT:
+        risk = (f"Attendance needs watching: {absent_count} of {total_records} records ({rate:.0f}%) are absences. "
+                "A few students may be starting to fall behind.")
+        suggestions = ["Check whether the absences are concentrated in a few students",
+                       "Share notes of missed lessons",
+                       "Follow up individually with students absent more than once"]
+    else:
+        risk = (f"Attendance is healthy: {absent_count} of {total_records} records ({rate:.0f}%) are absences, "
+                "with no sign of a class-wide problem.")
+        suggestions = ["Keep recording attendance to spot emerging patterns early",
+                       "Acknowledge consistent attendance"]
+    return {"risk_analysis": risk, "engagement_score": round(100 - rate), "suggestions": suggestions}
+
+
+def feedback(student_name: str, score: float, weak_topics: List[str]) -> Optional[Dict[str, Any]]:
+    if not 0 <= score <= 100:
+        return None  # Not a percentage; the wording below would be wrong
+    topics = _join(weak_topics)
+    if score >= 85:
+        strengths = f"{student_name} has an excellent command of the material, scoring {score:g}."
+        message = "Outstanding work - keep challenging yourself!"
+    elif score >= 60:
+        strengths = f"{student_name} has a solid grasp of most of the material, scoring {score:g}."
+        message = "Good progress - a little focused practice will take you further."
+    elif score >= 40:
+        strengths = f"{student_name} understands the basics, scoring {score:g}, and has a foundation to build on."
+        message = "You are getting there - steady practice will make the difference."
+    else:
+        strengths = f"{student_name} has made a start, scoring {score:g}, and can improve quickly with support."
+        message = "Don't be discouraged - every step of practice counts, and help is available."
+    if topics:
+        weak_areas = f"Needs more practice with {topics}."
+        plan = (f"Review the notes on {topics}, work through two practice problems on each every day, "
+                "and check the worked solutions before the next assessment.")
+    else:
+        weak_areas = "No specific weak topics were identified."
+        plan = "Keep up regular revision and try harder problems to extend your understanding."
+    return {"strengths": strengths, "weak_areas": weak_areas, "improvement_plan": plan, "motivational_message": message}
+
+
+def learning_gap_advice(topic_results: Optional[List[Dict[str, Any]]]) -> Optional[Dict[str, Any]]:
+    if not topic_results or not any(t["score"] is not None for t in topic_results):
+        return None  # Only an overall score: judging the gaps needs the model
+    at_risk = [t["topic"] for t in topic_results if t["status"] == "at risk"]
+    gaps = [t["topic"] for t in topic_results if t["status"] == "gap"]
+    advice = []
+    if at_risk:
+        advice.append(f"Reteach {_join(at_risk)} from the fundamentals with worked examples and a short diagnostic quiz.")
+    if gaps:
+        advice.append(f"Revisit {_join(gaps)} with targeted practice and check understanding before moving on.")
+    if not advice:
+        advice.append("The class is on track across the assessed topics; add enrichment problems or move on to "
+                      "more advanced material.")
+    return {"detected_gaps": at_risk + gaps, "pedagogical_advice": " ".join(advice), "at_risk_topics": at_risk}
+
+
+# AIService purpose -> template; these are the methods that can be routed to the local tier
+LOCAL_GENERATORS: Dict[str, Callable[..., Optional[Dict[str, Any]]]] = {
+    "analyze_attendance": attendance_analysis,
+    "generate_feedback": feedback,
+    "detect_learning_gaps": learning_gap_advice,
+}
@@ -1,11 +1,14 @@
 import httpx
 import os
 from typing import Optional
+from services.container import container
+from services.metrics_service import metrics_service
 
 class WhisperService:
     def __init__(self):
         self.endpoint = os.getenv("WHISPER_ENDPOINT", "http://localhost:9000/transcribe")
 
+    @metrics_service.timed("whisper_service.transcribe")
     async def transcribe(self, file_path: str) -> Optional[str]:
         """
         Send audio file to self-hosted Whisper service and return transcript.
@@ -27,4 +30,4 @@ class WhisperService:
             print(f"Whisper Connection Error: {str(e)}")
             return None
 
-whisper_service = WhisperService()
+whisper_service = container.lazy("whisper_service")
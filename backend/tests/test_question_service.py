@@ -0,0 +1,92 @@
+import pytest
+
+from services.question_service import BLOOM_LEVELS, QuestionCollector, shard_plan, shingles, similarity
+
+
+def question(text, **fields):
+    return {"question_text": text, "question_type": "Short Answer", **fields}
+
+
+def test_near_duplicates_are_rejected():
+    collector = QuestionCollector(limit=10)
+    assert collector.offer(question("Solve the quadratic equation x^2 - 5x + 6 = 0 by factoring."))
+    assert not collector.offer(question("Solve the quadratic equation x^2 - 5x + 6 = 0 using factoring."))
+    assert collector.offer(question("Explain what the discriminant tells you about the roots of a quadratic."))
+    assert collector.duplicates == 1
+    assert len(collector.questions) == 2
+
+
+def test_threshold_decides_what_counts_as_duplicate():
+    a = "Define a polynomial of degree two and give an example"
+    b = "Define a polynomial of degree three and give an example"
+    assert 0 < similarity(shingles(a), shingles(b)) < 1
+    strict = QuestionCollector(limit=5, threshold=0.3)
+    loose = QuestionCollector(limit=5, threshold=0.95)
+    for collector in (strict, loose):
+        collector.offer(question(a))
+    assert not strict.offer(question(b))
+    assert loose.offer(question(b))
+
+
+def test_the_same_item_offered_twice_is_not_counted_as_duplicate():
+    collector = QuestionCollector(limit=5)
+    item = question("What is a sequence?")
+    assert collector.offer(item)
+    assert not collector.offer(item)
+    assert collector.duplicates == 0
+
+
+def test_invalid_items_are_skipped():
+    collector = QuestionCollector(limit=5)
+    assert not collector.offer({"question_type": "MCQ"})
+    assert not collector.offer("not a question")
+    assert collector.questions == []
+
+
+def test_questions_are_renumbered_across_shards():
+    seen = []
+    collector = QuestionCollector(limit=10, on_question=seen.append)
+    shard_one = [question("Factorise x^2 + 3x + 2.", question_number=1),
+                 question("State the quadratic formula.", question_number=2)]
+    shard_two = [question("Find the 10th term of the arithmetic sequence 3, 7, 11.", question_number=1),
+                 question("Sketch the parabola y = x^2 - 4.", question_number=2)]
+    for item in shard_two + shard_one:
+        collector.offer(item)
+    assert [q["question_number"] for q in collector.questions] == [1, 2, 3, 4]
+    assert collector.questions[0]["question_text"].startswith("Find the 10th term")
+    assert seen == collector.questions
+
+
+def test_nothing_is_accepted_past_limit():
+    collector = QuestionCollector(limit=2)
+    texts = ["Define a function.", "Define a matrix determinant.", "Define an integral of a curve."]
+    assert [collector.offer(question(t)) for t in texts] == [True, True, False]
+    assert collector.full
+    assert len(collector.questions) == 2
+
+
+@pytest.mark.parametrize("num_questions, shard_size", [(1, 5), (5, 5), (6, 5), (13, 4), (20, 3), (50, 5), (7, 1)])
+def test_shard_counts_sum_to_num_questions(num_questions, shard_size):
+    plan = shard_plan(num_questions, shard_size)
+    counts = [shard["count"] for shard in plan]
+    assert sum(counts) == num_questions
+    assert max(counts) <= shard_size
+    assert max(counts) - min(counts) <= 1
+
+
+def test_single_shard_has_no_focus():
+    assert shard_plan(4, 10) == [{"count": 4, "focus": ""}]
+
+
+def test_bloom_levels_are_split_across_shards():
+    plan = shard_plan(12, 4)
+    assert len(plan) == 3
+    named = [[level for level in BLOOM_LEVELS if level in shard["focus"]] for shard in plan]
+    assert named == [["Remember", "Understand"], ["Apply", "Analyze"], ["Evaluate", "Create"]]
+
+
+def test_past_six_shards_each_shard_gets_one_level_and_type():
+    plan = shard_plan(16, 2)
+    assert len(plan) == 8
+    assert all(sum(level in shard["focus"] for level in BLOOM_LEVELS) == 1 for shard in plan)
+    assert "Multiple Choice" in plan[0]["focus"] and "Short Answer" in plan[6]["focus"]
@@ -0,0 +1,75 @@
+import json
+
+import pytest
+
+from models.schemas import AssessmentResponse, FeedbackResponse
+from services.response_service import LLMResponseError, StreamingJSONParser, load_json, parse_response, repair_json
+
+
+def repaired(text):
+    return json.loads(repair_json(text))
+
+
+@pytest.mark.parametrize("text, expected", [
+    ('```json\n{"a": 1}\n```', {"a": 1}),
+    ('Here is the analysis:\n{"a": 1}\nLet me know if you need more.', {"a": 1}),
+    ("{'a': 'it\\'s'}", {"a": "it's"}),
+    ('{“a”: “b”}', {"a": "b"}),
+    ('{a: 1, b_c: "x"}', {"a": 1, "b_c": "x"}),
+    ('{"a": True, "b": None, "c": NaN}', {"a": True, "b": None, "c": None}),
+    ('{"a": 1, // score\n /* note */ "b": 2}', {"a": 1, "b": 2}),
+    ('{"a": [1, 2,], "b": 3,}', {"a": [1, 2], "b": 3}),
+    ('{"a": "line one\nline two"}', {"a": "line one\nline two"}),
+    ('{"q": "What is "x"?", "n": 2}', {"q": 'What is "x"?', "n": 2}),
+    ('{"text": "He said "stop", then left"}', {"text": 'He said "stop", then left'}),
+    ('{"score": 0-100}', {"score": "0-100"}),
+])
+def test_repair_json_defects(text, expected):
+    assert repaired(text) == expected
+
+
+def test_quote_before_next_member_still_closes_the_string():
+    assert repaired('{"a": "x", b: 1, "c": ["p", "q", true, -3]}') == {"a": "x", "b": 1, "c": ["p", "q", True, -3]}
+
+
+def test_truncated_reply_keeps_complete_members():
+    assert repaired('{"a": 1, "b": [1, 2], "c": "cut of') == {"a": 1, "b": [1, 2]}
+    assert repaired('{"questions": [{"q": 1}, {"q": 2}, {"q"') == {"questions": [{"q": 1}, {"q": 2}]}
+
+
+def test_repair_json_without_json_raises():
+    with pytest.raises(ValueError):
+        repair_json("Sorry, I can't help with that.")
+
+
+def test_load_json_reports_repair():
+    assert load_json('{"a": 1}') == ({"a": 1}, False)
+    assert load_json('{"a": 1,}') == ({"a": 1}, True)
+
+
+def test_parse_response_validates_and_coerces():
+    data, was_repaired = parse_response('[{"question_text": "2+2?", "marks": "5%"}, {"bad": 1}]', AssessmentResponse)
+    assert not was_repaired
+    assert data["total_questions"] == 1
+    assert data["questions"][0]["question_number"] == 1
+    assert data["questions"][0]["marks"] == 5
+
+
+def test_parse_response_rejects_wrong_shape():
+    with pytest.raises(LLMResponseError) as error:
+        parse_response('{"strengths": "good"}', FeedbackResponse)
+    assert error.value.raw == '{"strengths": "good"}'
+
+
+def test_streaming_parser_emits_items_as_they_close():
+    reply = '{"assessment_title": "Quiz", "questions": [{"q": "a [b]"}, {"q": "c \\" }"}, {"q": "d"}]}'
+    parser = StreamingJSONParser("questions")
+    emitted = [parser.feed(reply[i:i + 7]) for i in range(0, len(reply), 7)]
+    assert [item for chunk in emitted for item in chunk] == [{"q": "a [b]"}, {"q": 'c " }'}, {"q": "d"}]
+    assert parser.items_emitted == 3
+    assert parser.text == reply
+
+
+def test_streaming_parser_ignores_other_arrays_and_bad_items():
+    parser = StreamingJSONParser("questions")
+    assert parser.feed('{"topics": [{"x": 1}], "questions": [{"q": 1}, {"q": }]}') == [{"q": 1}]
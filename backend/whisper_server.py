@@ -87,11 +87,12 @@ async def transcribe(file: UploadFile = File(...)):
     """
     Receives an audio file and returns the transcribed text.
     """
+    temp_path = None
     try:
         # Create a temporary file to save the upload
         with tempfile.NamedTemporaryFile(delete=False, suffix=os.path.splitext(file.filename)[1]) as temp_audio:
-            shutil.copyfileobj(file.file, temp_audio)
             temp_path = temp_audio.name
+            shutil.copyfileobj(file.file, temp_audio)
 
         # Transcribe using Whisper
         print(f"Transcribing: {file.filename}...")
@@ -99,9 +100,6 @@ async def transcribe(file: UploadFile = File(...)):
         result = model.transcribe(temp_path, fp16=False)
         print(f"✅ Transcription complete for: {file.filename}")
         
-        # Cleanup temp file
-        os.remove(temp_path)
-        
         if result and "text" in result:
             return {"text": result["text"]}
         else:
@@ -114,6 +112,10 @@ async def transcribe(file: UploadFile = File(...)):
         print(error_msg)
         traceback.print_exc() # Show exactly where it failed in the terminal
         raise HTTPException(status_code=500, detail=error_msg)
+    finally:
+        # Cleanup temp file on success and failure alike
+        if temp_path and os.path.exists(temp_path):
+            os.remove(temp_path)
 
 if __name__ == "__main__":
     # Run on port 9000 as expected by the main backend